@@ -0,0 +1,92 @@
+"""
+Адаптивные интервалы опроса источников: как часто проверять канал или ленту,
+исходя из того, как часто там появляются посты и сколько из них релевантны
+"""
+
+from datetime import datetime
+from typing import Dict, Optional
+
+from config import config
+
+# Нижняя граница прошедшего времени при оценке скорости (1 минута в сутках)
+_MIN_ELAPSED_DAYS = 1 / 1440
+# Насколько активность часа может ускорить или замедлить опрос
+_HOUR_FACTOR_BOUNDS = (0.25, 4.0)
+
+
+def _ewma(previous: Optional[float], observed: float, alpha: float) -> float:
+    if previous is None:
+        return observed
+    return alpha * observed + (1 - alpha) * previous
+
+
+def observe(state: Dict, new_items: Optional[int], matched: int, now: datetime):
+    """
+    Обновляет в состоянии источника сглаженную скорость публикаций (постов в сутки)
+    и долю релевантных постов по результату очередной проверки.
+    new_items = None - проверка не показательна (первый запуск, догрузка истории).
+    """
+    if new_items is None:
+        return
+    alpha = config.ADAPTIVE_EWMA_ALPHA
+
+    last_check = state.get('last_check')
+    if last_check:
+        previous = datetime.fromisoformat(last_check)
+        if previous.tzinfo is None:
+            previous = previous.replace(tzinfo=now.tzinfo)
+        elapsed_days = max((now - previous).total_seconds() / 86400, _MIN_ELAPSED_DAYS)
+        state['post_rate'] = _ewma(state.get('post_rate'), new_items / elapsed_days, alpha)
+
+    if new_items:
+        state['match_yield'] = _ewma(state.get('match_yield'), min(1.0, matched / new_items), alpha)
+
+
+def _hour_factor(stats: Optional[Dict], hour: int) -> float:
+    """Во сколько раз текущий час активнее среднего часа канала (по channel_stats)"""
+    hours = (stats or {}).get('activity_hours')
+    if not isinstance(hours, dict):
+        return 1.0
+    total = sum(hours.values())
+    if not total:
+        return 1.0
+    factor = hours.get(str(hour), 0) / total * 24
+    low, high = _HOUR_FACTOR_BOUNDS
+    return min(high, max(low, factor))
+
+
+def next_interval_minutes(state: Dict, stats: Optional[Dict], min_minutes: float,
+                          now: datetime) -> float:
+    """
+    Интервал до следующей проверки источника в минутах.
+
+    Ждем примерно столько, сколько нужно для появления ADAPTIVE_POSTS_PER_CHECK новых постов:
+    • скорость публикаций - сглаженная наблюдаемая, до первых наблюдений - avg_posts_per_day
+      из channel_stats;
+    • в активные для канала часы опрашиваем чаще, в тихие - реже;
+    • источники с высокой долей релевантных постов опрашиваются до 2 раз чаще;
+    • после ошибок интервал растет экспоненциально.
+    Результат ограничен [min_minutes, ADAPTIVE_MAX_INTERVAL_MINUTES].
+    """
+    max_minutes = max(min_minutes, config.ADAPTIVE_MAX_INTERVAL_MINUTES)
+
+    rate = state.get('post_rate')
+    if rate is None and stats:
+        rate = stats.get('avg_posts_per_day') or None
+    if rate is None:
+        interval = min_minutes
+    else:
+        rate *= _hour_factor(stats, now.astimezone().hour)
+        interval = config.ADAPTIVE_POSTS_PER_CHECK * 1440 / max(rate, 1e-6)
+
+        match_yield = state.get('match_yield')
+        if match_yield is None and stats and stats.get('total_posts'):
+            match_yield = stats.get('matched_posts', 0) / stats['total_posts']
+        if match_yield:
+            interval *= 1 - 0.5 * min(1.0, match_yield)
+
+    errors = state.get('error_count') or 0
+    if errors:
+        interval *= 2 ** min(errors, 5)
+
+    return min(max_minutes, max(min_minutes, interval))
@@ -0,0 +1,240 @@
+"""
+Догрузка истории Telegram каналов: постранично, с контрольной точкой после
+каждой страницы и собственным лимитом запросов, отдельно от живого мониторинга
+"""
+
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from config import config, ADMIN_USERS
+from content_monitor import content_monitor, CUTOFF_DATE
+from database import db
+from outbound_queue import TokenBucket, outbound_queue
+from telethon_governor import telethon_governor, RequestDeferred
+
+logger = logging.getLogger(__name__)
+
+NEWEST_FIRST = 'newest_first'
+OLDEST_FIRST = 'oldest_first'
+
+# Ошибок подряд, после которых задача останавливается до /force_monitor
+_MAX_ERRORS = 5
+# Повтор, если Telethon недоступен
+_RETRY_SECONDS = 60
+
+
+class BackfillManager:
+    """
+    Задачи догрузки истории (таблица backfill_jobs), по одной на канал.
+
+    • при старте задачи запоминается последний ID канала (high_id): живой мониторинг
+      продолжает с него, а догрузка идет по истории до него;
+    • newest_first - от high_id к старым сообщениям до CUTOFF_DATE (или stop_id),
+      oldest_first - от первого сообщения после CUTOFF_DATE к high_id;
+    • в памяти только одна страница, после каждой страницы задача сохраняется в БД,
+      поэтому после перезапуска продолжает с того же места;
+    • страницы запрашиваются по своему ведру токенов (BACKFILL_PAGES_PER_MINUTE),
+      каналы обслуживаются по кругу.
+    """
+
+    def __init__(self):
+        self.jobs: Dict[str, Dict] = {}
+        self._loaded = False
+        self._bucket = TokenBucket(config.BACKFILL_PAGES_PER_MINUTE / 60, config.BACKFILL_BURST)
+        self._retry_at = 0.0
+
+    async def load(self):
+        """Незавершенные задачи прошлого запуска (один раз)"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            for job in await db.get_backfill_jobs():
+                self.jobs[job['channel']] = job
+            active = len(self.active_jobs())
+            if active:
+                logger.info(f"Догрузка истории: продолжаем {active} задач")
+        except Exception as e:
+            logger.error(f"Ошибка загрузки задач догрузки: {e}")
+
+    def active_jobs(self) -> List[Dict]:
+        return [job for job in self.jobs.values() if job['status'] in ('pending', 'active')]
+
+    def is_pending(self, channel: str) -> bool:
+        """Задача создана, но еще не выставила контрольную точку живому мониторингу"""
+        job = self.jobs.get(channel)
+        return job is not None and job['status'] == 'pending'
+
+    async def start_jobs(self, channels: List[str], direction: str = None, stop_id: int = 0):
+        """Создает (или начинает заново) задачи догрузки для каналов"""
+        await self.load()
+        direction = direction or config.BACKFILL_DIRECTION
+        if direction not in (NEWEST_FIRST, OLDEST_FIRST):
+            direction = NEWEST_FIRST
+        for channel in channels:
+            job = {
+                'channel': channel,
+                'direction': direction,
+                'status': 'pending',
+                'cursor_id': None,
+                'high_id': None,
+                'stop_id': stop_id,
+                'pages': 0,
+                'fetched': 0,
+                'added': 0,
+                'error_count': 0,
+                'error': None,
+                'started_at': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+            }
+            self.jobs[channel] = job
+            await db.save_backfill_job(job)
+        logger.info(f"Догрузка истории запланирована для {len(channels)} каналов ({direction})")
+
+    async def resume_failed(self) -> int:
+        """Возобновляет задачи, остановленные из-за ошибок"""
+        await self.load()
+        resumed = 0
+        for job in self.jobs.values():
+            if job['status'] == 'error':
+                job['status'] = 'active' if job.get('high_id') is not None else 'pending'
+                job['error_count'] = 0
+                await db.save_backfill_job(job)
+                resumed += 1
+        self._retry_at = 0.0
+        return resumed
+
+    def next_run_time(self, now: float) -> Optional[float]:
+        """Когда снова запускать задачу планировщика (None - догружать нечего)"""
+        if self._loaded and not self.active_jobs():
+            return None
+        return max(now, self._retry_at, now + self._bucket.delay())
+
+    async def run_batch(self):
+        """Обрабатывает страницы, пока есть токены, по одной на канал по кругу"""
+        await self.load()
+        if not self.active_jobs() or time.time() < self._retry_at:
+            return
+        if not await content_monitor.ensure_telethon():
+            self._retry_at = time.time() + _RETRY_SECONDS
+            return
+
+        while self._bucket.delay() <= 0:
+            jobs = self.active_jobs()
+            if not jobs:
+                return
+            # Первым идет канал, дольше всех ждавший своей страницы
+            job = min(jobs, key=lambda j: j.get('_last_page_at', 0.0))
+            job['_last_page_at'] = time.monotonic()
+            self._bucket.consume()
+            if not await self._step(job):
+                return
+
+    async def _step(self, job: Dict) -> bool:
+        """Одна страница задачи. False - прервать пакет (flood wait)"""
+        channel = job['channel']
+        try:
+            entity = await telethon_governor.get_entity(content_monitor.tg_client, channel)
+            if job['status'] == 'pending':
+                await self._init_job(job, entity)
+            else:
+                await self._process_page(job, entity)
+            job['error_count'] = 0
+            job['error'] = None
+        except RequestDeferred as e:
+            # Лимит Telegram: страница не потеряна, задача продолжит после паузы
+            logger.warning(f"Догрузка {channel}: {e}")
+            self._retry_at = time.time() + e.retry_after
+            return False
+        except Exception as e:
+            job['error_count'] = (job.get('error_count') or 0) + 1
+            job['error'] = str(e)[:500]
+            logger.error(f"Ошибка догрузки канала {channel}: {e}")
+            if job['error_count'] >= _MAX_ERRORS:
+                job['status'] = 'error'
+                logger.error(f"Догрузка {channel} остановлена после {_MAX_ERRORS} ошибок подряд")
+        await db.save_backfill_job(job)
+        if job['status'] == 'done':
+            await self._notify_done(job)
+        return True
+
+    async def _init_job(self, job: Dict, entity):
+        """Запоминает последний ID канала и передает его живому мониторингу"""
+        channel = job['channel']
+        latest = await telethon_governor.get_messages(content_monitor.tg_client, entity, limit=1)
+        high_id = latest[0].id if latest else 0
+        job['high_id'] = high_id
+
+        source_key = f"tg_{channel}"
+        await content_monitor._advance_last_message_id(source_key, high_id)
+        await content_monitor.flush_source_states([source_key])
+
+        if job['direction'] == OLDEST_FIRST:
+            first = await telethon_governor.get_messages(
+                content_monitor.tg_client, entity, limit=1, offset_date=CUTOFF_DATE, reverse=True
+            )
+            start = first[0].id - 1 if first else high_id
+            job['cursor_id'] = max(start, job.get('stop_id') or 0)
+            finished = job['cursor_id'] >= high_id
+        else:
+            job['cursor_id'] = high_id + 1
+            finished = high_id <= (job.get('stop_id') or 0)
+        job['status'] = 'done' if finished else 'active'
+        logger.info(f"Догрузка {channel}: старт {job['direction']}, последний ID {high_id}")
+
+    async def _process_page(self, job: Dict, entity):
+        """Следующая страница истории, затем контрольная точка"""
+        page_size = max(1, config.BACKFILL_PAGE_SIZE)
+        stop_id = job.get('stop_id') or 0
+        if job['direction'] == OLDEST_FIRST:
+            page = await telethon_governor.get_messages(
+                content_monitor.tg_client, entity, limit=page_size, min_id=job['cursor_id'], reverse=True
+            )
+            messages = [m for m in page if m.id <= job['high_id']]
+            finished = (not page or len(page) < page_size
+                        or max(m.id for m in page) >= job['high_id'])
+            if page:
+                job['cursor_id'] = max(m.id for m in page)
+        else:
+            page = await telethon_governor.get_messages(
+                content_monitor.tg_client, entity, limit=page_size, offset_id=job['cursor_id']
+            )
+            messages = [m for m in page if m.id > stop_id]
+            finished = (not page or len(page) < page_size
+                        or min(m.id for m in page) <= stop_id
+                        or min(m.date for m in page) < CUTOFF_DATE)
+            if page:
+                job['cursor_id'] = min(m.id for m in page)
+
+        added, _ = await content_monitor.process_message_page(job['channel'], messages, live=False)
+        job['pages'] += 1
+        job['fetched'] += len(messages)
+        job['added'] += added
+        if config.BACKFILL_MAX_MESSAGES and job['fetched'] >= config.BACKFILL_MAX_MESSAGES:
+            finished = True
+        if finished:
+            job['status'] = 'done'
+        logger.debug(f"Догрузка {job['channel']}: страница {job['pages']}, "
+                     f"сообщений {len(messages)}, новых черновиков {added}")
+
+    async def _notify_done(self, job: Dict):
+        logger.info(f"Догрузка {job['channel']} завершена: {job['fetched']} сообщений, "
+                    f"{job['added']} черновиков")
+        text = (f"📥 <b>Догрузка истории завершена</b>\n\n"
+                f"💬 <b>Канал:</b> {job['channel']}\n"
+                f"📄 Страниц: {job['pages']}, сообщений: {job['fetched']}\n"
+                f"📝 Новых черновиков: {job['added']}")
+        try:
+            await outbound_queue.enqueue_many([{'chat_id': user_id, 'text': text} for user_id in ADMIN_USERS])
+        except Exception as e:
+            logger.error(f"Ошибка уведомления о догрузке: {e}")
+
+    def get_stats(self) -> List[Dict]:
+        """Задачи для /backfill: сначала незавершенные"""
+        order = {'active': 0, 'pending': 1, 'error': 2, 'done': 3}
+        return sorted(self.jobs.values(), key=lambda job: (order.get(job['status'], 4), job['channel']))
+
+
+# Глобальный менеджер догрузки
+backfill_manager = BackfillManager()
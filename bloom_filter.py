@@ -0,0 +1,108 @@
+"""
+Масштабируемый фильтр Блума: быстрый ответ "точно не встречалось" без обращения к БД
+"""
+
+import hashlib
+import math
+from typing import Dict, List
+
+
+class BloomFilter:
+    """Классический фильтр Блума на bytearray с двойным хэшированием"""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(1, capacity)
+        self.error_rate = error_rate
+        bits = math.ceil(-self.capacity * math.log(error_rate) / (math.log(2) ** 2))
+        self.num_bits = max(8, bits)
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, digest: bytes):
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        for i in range(self.num_hashes):
+            yield (first + i * second) % self.num_bits
+
+    def add(self, digest: bytes):
+        for position in self._positions(digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def contains(self, digest: bytes) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(digest))
+
+    @property
+    def is_full(self) -> bool:
+        return self.count >= self.capacity
+
+    def estimated_error_rate(self) -> float:
+        """Вероятность ложного срабатывания при текущем заполнении"""
+        return (1 - math.exp(-self.num_hashes * self.count / self.num_bits)) ** self.num_hashes
+
+
+class ScalableBloomFilter:
+    """
+    Фильтр Блума, растущий вместе с числом элементов: когда очередной слой заполнен,
+    добавляется новый вдвое больше и с вдвое меньшей долей ошибок,
+    так что общая вероятность ложного срабатывания остается около error_rate.
+    """
+
+    _GROWTH = 2
+    _TIGHTENING = 0.5
+
+    def __init__(self, initial_capacity: int = 100000, error_rate: float = 0.001):
+        self.initial_capacity = initial_capacity
+        self.error_rate = error_rate
+        self.filters: List[BloomFilter] = []
+        self._add_layer()
+
+    def _add_layer(self):
+        layer = len(self.filters)
+        self.filters.append(BloomFilter(
+            self.initial_capacity * self._GROWTH ** layer,
+            self.error_rate * (1 - self._TIGHTENING) * self._TIGHTENING ** layer
+        ))
+
+    @staticmethod
+    def _digest(key: str) -> bytes:
+        return hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+
+    def add(self, key: str):
+        digest = self._digest(key)
+        if any(layer.contains(digest) for layer in self.filters):
+            return
+        if self.filters[-1].is_full:
+            self._add_layer()
+        self.filters[-1].add(digest)
+
+    def __contains__(self, key: str) -> bool:
+        digest = self._digest(key)
+        return any(layer.contains(digest) for layer in self.filters)
+
+    def __len__(self) -> int:
+        return sum(layer.count for layer in self.filters)
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(len(layer.bits) for layer in self.filters)
+
+    def estimated_error_rate(self) -> float:
+        """Вероятность ложного срабатывания по всем слоям"""
+        miss = 1.0
+        for layer in self.filters:
+            miss *= 1 - layer.estimated_error_rate()
+        return 1 - miss
+
+    def clear(self):
+        self.filters = []
+        self._add_layer()
+
+    def get_stats(self) -> Dict:
+        return {
+            'items': len(self),
+            'layers': len(self.filters),
+            'memory_bytes': self.memory_bytes,
+            'estimated_error_rate': self.estimated_error_rate(),
+        }
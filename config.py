@@ -140,6 +140,96 @@ class Config:
     RSS_CHECK_INTERVAL_MINUTES = int(os.getenv('RSS_CHECK_INTERVAL_MINUTES', 3))    # RSS проверяем чаще
     TG_CHECK_INTERVAL_MINUTES = int(os.getenv('TG_CHECK_INTERVAL_MINUTES', 7))      # Telegram чуть реже
     
+    # Инкрементальная загрузка истории Telegram
+    TG_FETCH_PAGE_SIZE = int(os.getenv('TG_FETCH_PAGE_SIZE', 100))                  # Сообщений за один запрос
+    TG_FIRST_RUN_BACKFILL = int(os.getenv('TG_FIRST_RUN_BACKFILL', 100))            # Глубина первой проверки канала
+    
+    # Догрузка истории каналов (/add_tg, /reset_ids): отдельная задача со своим лимитом
+    BACKFILL_DIRECTION = os.getenv('BACKFILL_DIRECTION', 'newest_first')            # newest_first / oldest_first
+    BACKFILL_PAGE_SIZE = int(os.getenv('BACKFILL_PAGE_SIZE', 100))                  # Сообщений за один запрос
+    BACKFILL_PAGES_PER_MINUTE = float(os.getenv('BACKFILL_PAGES_PER_MINUTE', 20))   # Лимит запросов догрузки
+    BACKFILL_BURST = int(os.getenv('BACKFILL_BURST', 3))                            # Страниц подряд за один запуск
+    BACKFILL_MAX_MESSAGES = int(os.getenv('BACKFILL_MAX_MESSAGES', 0))              # 0 - до CUTOFF_DATE
+    BACKFILL_NOTIFY = os.getenv('BACKFILL_NOTIFY', 'false').lower() == 'true'       # Уведомлять о постах из истории
+    
+    # Лимиты запросов к Telegram API (FloodWait): на каждый метод отдельно
+    TG_GET_MESSAGES_PER_MINUTE = float(os.getenv('TG_GET_MESSAGES_PER_MINUTE', 30)) # messages.getHistory
+    TG_GET_ENTITY_PER_MINUTE = float(os.getenv('TG_GET_ENTITY_PER_MINUTE', 10))     # Resolve username - самый строгий
+    TG_REQUESTS_PER_MINUTE = float(os.getenv('TG_REQUESTS_PER_MINUTE', 20))         # Остальные методы
+    TG_REQUEST_BURST = int(os.getenv('TG_REQUEST_BURST', 3))                        # Запросов подряд без паузы
+    TG_MAX_INLINE_WAIT_SECONDS = int(os.getenv('TG_MAX_INLINE_WAIT_SECONDS', 30))   # Дольше - перенос проверки
+    TG_ENTITY_CACHE_HOURS = float(os.getenv('TG_ENTITY_CACHE_HOURS', 24))           # Кэш сущностей каналов
+    
+    # Параллельная обработка источников
+    TG_CHANNEL_WORKERS = int(os.getenv('TG_CHANNEL_WORKERS', 4))                    # Каналов одновременно (один Telethon клиент)
+    RSS_FETCH_CONCURRENCY = int(os.getenv('RSS_FETCH_CONCURRENCY', 8))              # RSS лент одновременно
+    SOURCE_TIMEOUT_SECONDS = int(os.getenv('SOURCE_TIMEOUT_SECONDS', 120))          # Таймаут на один источник
+    RSS_MAX_BODY_BYTES = int(os.getenv('RSS_MAX_BODY_BYTES', 5 * 1024 * 1024))      # Максимальный размер RSS ответа
+    
+    # CPU-работа мониторинга (разбор RSS, очистка текста, ключевые слова) вне event loop
+    INGEST_EXECUTOR = os.getenv('INGEST_EXECUTOR', 'thread')                        # thread / process / none
+    INGEST_WORKERS = int(os.getenv('INGEST_WORKERS', 2))                            # Размер пула
+    INGEST_LOOP_BUDGET_MS = float(os.getenv('INGEST_LOOP_BUDGET_MS', 20))           # Непрерывная работа в event loop
+    LOOP_LAG_SAMPLE_SECONDS = float(os.getenv('LOOP_LAG_SAMPLE_SECONDS', 1))        # Период замера задержки event loop
+    
+    # Адаптивные интервалы: каждый источник опрашивается по своей активности
+    # (нижняя граница - RSS_CHECK_INTERVAL_MINUTES / TG_CHECK_INTERVAL_MINUTES)
+    ADAPTIVE_POLLING_ENABLED = os.getenv('ADAPTIVE_POLLING_ENABLED', 'true').lower() == 'true'
+    ADAPTIVE_MAX_INTERVAL_MINUTES = int(os.getenv('ADAPTIVE_MAX_INTERVAL_MINUTES', 180))  # Самый редкий опрос
+    ADAPTIVE_POSTS_PER_CHECK = float(os.getenv('ADAPTIVE_POSTS_PER_CHECK', 1))      # Ожидаемых новых постов на проверку
+    ADAPTIVE_EWMA_ALPHA = float(os.getenv('ADAPTIVE_EWMA_ALPHA', 0.3))              # Вес нового наблюдения
+    
+    # Потоковый режим: новые посты приходят через события Telethon
+    TG_STREAMING_ENABLED = os.getenv('TG_STREAMING_ENABLED', 'false').lower() == 'true'
+    TG_GAP_FILL_INTERVAL_MINUTES = int(os.getenv('TG_GAP_FILL_INTERVAL_MINUTES', 30))  # Досбор пропущенного опросом
+    
+    # Постоянные соединения (Telethon и HTTP пул живут весь процесс)
+    TG_HEALTHCHECK_INTERVAL_SECONDS = int(os.getenv('TG_HEALTHCHECK_INTERVAL_SECONDS', 300))
+    TG_RECONNECT_ATTEMPTS = int(os.getenv('TG_RECONNECT_ATTEMPTS', 5))
+    TG_RECONNECT_MAX_DELAY_SECONDS = int(os.getenv('TG_RECONNECT_MAX_DELAY_SECONDS', 60))
+    HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 20))                           # Максимум HTTP соединений в пуле
+    
+    # Очередь исходящих сообщений (лимиты Telegram Bot API)
+    OUTBOUND_CHAT_RATE = float(os.getenv('OUTBOUND_CHAT_RATE', 1))                  # Сообщений в секунду в один чат
+    OUTBOUND_CHAT_BURST = int(os.getenv('OUTBOUND_CHAT_BURST', 3))                  # Допустимая пачка в один чат
+    OUTBOUND_GLOBAL_RATE = float(os.getenv('OUTBOUND_GLOBAL_RATE', 25))             # Сообщений в секунду всего
+    OUTBOUND_MAX_ATTEMPTS = int(os.getenv('OUTBOUND_MAX_ATTEMPTS', 5))              # Попыток при сетевых ошибках
+    
+    # Группировка уведомлений: посты, найденные в пределах окна, приходят одной сводкой
+    NOTIFY_COALESCE_WINDOW_SECONDS = int(os.getenv('NOTIFY_COALESCE_WINDOW_SECONDS', 30))  # 0 - без группировки
+    NOTIFY_COALESCE_MIN_DRAFTS = int(os.getenv('NOTIFY_COALESCE_MIN_DRAFTS', 3))    # Меньше - отдельные уведомления
+    NOTIFY_SUMMARY_PAGE_SIZE = int(os.getenv('NOTIFY_SUMMARY_PAGE_SIZE', 5))        # Постов на странице сводки
+    NOTIFY_RELEVANCE_THRESHOLD = int(os.getenv('NOTIFY_RELEVANCE_THRESHOLD', 3))    # Разных ключевых слов для отдельного уведомления
+    NOTIFY_BATCH_RETENTION_HOURS = int(os.getenv('NOTIFY_BATCH_RETENTION_HOURS', 72))  # Сколько хранить состав сводок для листания
+    
+    # Полнотекстовый поиск по черновикам и публикациям (/search)
+    SEARCH_PAGE_SIZE = int(os.getenv('SEARCH_PAGE_SIZE', 5))                        # Результатов на странице /search
+    
+    # Почти одинаковые посты (репосты одной новости): MinHash/LSH
+    NEAR_DUP_ENABLED = os.getenv('NEAR_DUP_ENABLED', 'true').lower() == 'true'
+    NEAR_DUP_THRESHOLD = float(os.getenv('NEAR_DUP_THRESHOLD', 0.6))                # Сходство текстов для объединения
+    NEAR_DUP_WINDOW_HOURS = float(os.getenv('NEAR_DUP_WINDOW_HOURS', 72))           # Окно поиска похожих черновиков
+    
+    # Фильтр Блума известных адресов постов перед проверкой в БД
+    SEEN_SOURCES_CAPACITY = int(os.getenv('SEEN_SOURCES_CAPACITY', 100000))         # Адресов в первом слое фильтра
+    SEEN_SOURCES_ERROR_RATE = float(os.getenv('SEEN_SOURCES_ERROR_RATE', 0.001))    # Допустимая доля ложных срабатываний
+    
+    # Сюжеты: группировка постов разных каналов и тревога о "горячих" новостях
+    STORY_TRACKING_ENABLED = os.getenv('STORY_TRACKING_ENABLED', 'true').lower() == 'true'
+    STORY_WINDOW_MINUTES = int(os.getenv('STORY_WINDOW_MINUTES', 180))               # Окно жизни сюжета
+    STORY_SIMILARITY = float(os.getenv('STORY_SIMILARITY', 0.3))                    # Доля веса общих слов для попадания в сюжет
+    STORY_ALERT_SOURCES = int(os.getenv('STORY_ALERT_SOURCES', 4))                  # Источников за окно для тревоги
+    STORY_VELOCITY_MINUTES = int(os.getenv('STORY_VELOCITY_MINUTES', 15))           # Короткое окно скорости
+    STORY_VELOCITY_SOURCES = int(os.getenv('STORY_VELOCITY_SOURCES', 3))            # Источников за короткое окно для тревоги
+    
+    # SQLite: пул соединений (одно на запись + несколько на чтение) и PRAGMA
+    DB_READ_POOL_SIZE = int(os.getenv('DB_READ_POOL_SIZE', 4))                      # Соединений на чтение
+    DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', 20000))                    # Кэш страниц на соединение
+    DB_MMAP_SIZE_MB = int(os.getenv('DB_MMAP_SIZE_MB', 128))                        # Отображение файла БД в память
+    DB_BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', 5000))                 # Ожидание блокировки файла
+    SETTINGS_CACHE_TTL_SECONDS = int(os.getenv('SETTINGS_CACHE_TTL_SECONDS', 0))    # 0 - настройки в памяти без срока
+    SETTINGS_FLUSH_DELAY_MS = int(os.getenv('SETTINGS_FLUSH_DELAY_MS', 500))        # Запись настроек пачкой; 0 - сразу
+    
     # AI настройки
     AUTO_REWRITE_ENABLED = False  # Отключено - только ручной режим с промптами
     MANUAL_MODE_ONLY = True  # Только ручной режим с советами и промптами
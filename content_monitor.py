@@ -1,24 +1,40 @@
 import asyncio
 import logging
-import feedparser
 import aiohttp
 from datetime import datetime, timedelta, timezone
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import re
-from bs4 import BeautifulSoup
 import os
 import time
+import html
+import math
+import hashlib
 
 try:
-    from telethon import TelegramClient
+    from telethon import TelegramClient, events, utils
     from telethon.errors import SessionPasswordNeededError
     TELETHON_AVAILABLE = True
 except ImportError:
     TELETHON_AVAILABLE = False
     logging.warning("Telethon не установлен. Мониторинг Telegram каналов недоступен.")
 
+try:
+    # aiohttp распаковывает brotli (Content-Encoding: br) только при установленном пакете
+    import brotli  # noqa: F401
+    BROTLI_AVAILABLE = True
+except ImportError:
+    BROTLI_AVAILABLE = False
+
 from config import config, ADMIN_USERS
 from database import db
+from keyword_matcher import KeywordMatcher
+from near_duplicates import near_duplicate_index, minhash_signatures
+from story_tracker import story_tracker
+from ingest_executor import ingest_executor, parse_feed, match_texts, run_with_budget
+import adaptive_polling
+from outbound_queue import outbound_queue
+from telethon_governor import telethon_governor, RequestDeferred
+from text_normalizer import clean_text as normalize_text
 
 logger = logging.getLogger(__name__)
 
@@ -39,6 +55,31 @@ class ContentMonitor:
         self.keywords = config.KEYWORDS
         self.last_check = {}
         self.bot_instance = None
+        # Потоковый режим
+        self.streaming = False
+        self._stream_channels = {}
+        self._stream_handlers = []
+        self._last_tg_poll = None
+        self._gap_fill_requested = False
+        self._stream_client = None
+        # ID сообщений, уже обработанных из потока с последнего опроса (по каналам)
+        self._streamed_ids: Dict[str, set] = {}
+        # Постоянные соединения
+        self._tg_lock = asyncio.Lock()
+        self._tg_health_checked = 0.0
+        # Состояние источников: кэш таблицы source_state
+        self._source_states: Dict[str, Dict] = {}
+        self._dirty_sources = set()
+        self._source_states_loaded = False
+        # Статистика каналов (channel_stats) для адаптивных интервалов
+        self._channel_stats: Dict[str, Dict] = {}
+        # Группировка уведомлений в сводку
+        self._pending_notifications: List[Dict] = []
+        self._notify_flush_task: Optional[asyncio.Task] = None
+        self._batches_pruned_at: Optional[float] = None
+        # Почти одинаковые посты: LSH-индекс черновиков и порядок добавления
+        self._ingest_lock = asyncio.Lock()
+        self._near_dup_loaded = False
         
     async def safe_send_message(self, chat_id: int, text: str, parse_mode: str = "HTML"):
         """Безопасная отправка сообщения без задержек"""
@@ -77,10 +118,13 @@ class ContentMonitor:
                 if var in os.environ:
                     del os.environ[var]
             
+            # flood_sleep_threshold=0: Telethon не спит на FloodWait сам, каждая ошибка
+            # доходит до telethon_governor и превращается в перенос работы
             self.tg_client = TelegramClient(
                 'content_monitor_session', 
                 config.API_ID, 
-                config.API_HASH
+                config.API_HASH,
+                flood_sleep_threshold=0
             )
             
             await self.tg_client.start(phone=config.PHONE_NUMBER)
@@ -95,235 +139,540 @@ class ContentMonitor:
             return False
     
     async def init_session(self):
-        """Инициализация HTTP сессии"""
+        """Инициализация HTTP сессии (один пул соединений на весь процесс)"""
+        if self.session and not self.session.closed:
+            return
+        
         # Очищаем переменные окружения перед созданием сессии
         proxy_vars = ['HTTP_PROXY', 'HTTPS_PROXY', 'ALL_PROXY', 'NO_PROXY']
         for var in proxy_vars:
             if var in os.environ:
                 del os.environ[var]
         
+        connector = aiohttp.TCPConnector(
+            limit=config.HTTP_POOL_SIZE,
+            ttl_dns_cache=300,
+            keepalive_timeout=60
+        )
         self.session = aiohttp.ClientSession(
+            connector=connector,
             timeout=aiohttp.ClientTimeout(total=30),
             headers={'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'}
         )
+        logger.info("HTTP сессия создана")
+    
+    async def ensure_telethon(self) -> bool:
+        """
+        Возвращает живой Telethon клиент: проверяет соединение (не чаще
+        TG_HEALTHCHECK_INTERVAL_SECONDS) и при необходимости переподключается с backoff.
+        """
+        if not TELETHON_AVAILABLE:
+            return False
+        try:
+            config.validate_telethon()
+        except ValueError:
+            return False
+        
+        async with self._tg_lock:
+            if self.tg_client and self.tg_client.is_connected():
+                if time.monotonic() - self._tg_health_checked < config.TG_HEALTHCHECK_INTERVAL_SECONDS:
+                    return True
+                try:
+                    await asyncio.wait_for(self.tg_client.get_me(), timeout=30)
+                    self._tg_health_checked = time.monotonic()
+                    return True
+                except Exception as e:
+                    logger.warning(f"Telethon: проверка соединения не прошла: {e}")
+                    try:
+                        await self.tg_client.disconnect()
+                    except Exception:
+                        pass
+            
+            reconnecting = self.tg_client is not None
+            delay = 1
+            for attempt in range(1, config.TG_RECONNECT_ATTEMPTS + 1):
+                try:
+                    if self.tg_client:
+                        await self.tg_client.connect()
+                        connected = await self.tg_client.is_user_authorized()
+                        if not connected:
+                            await self.tg_client.start(phone=config.PHONE_NUMBER)
+                            connected = True
+                    else:
+                        connected = await self.init_telethon()
+                    if connected:
+                        self._tg_health_checked = time.monotonic()
+                        if reconnecting:
+                            # Пока не было соединения, посты могли пройти мимо
+                            self._gap_fill_requested = True
+                            logger.info(f"Telethon переподключен (попытка {attempt})")
+                        return True
+                except Exception as e:
+                    logger.warning(f"Telethon: попытка подключения {attempt} не удалась: {e}")
+                
+                if attempt < config.TG_RECONNECT_ATTEMPTS:
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, config.TG_RECONNECT_MAX_DELAY_SECONDS)
+            
+            logger.error("Telethon: не удалось подключиться")
+            return False
+    
+    async def ensure_connections(self) -> bool:
+        """
+        Поднимает HTTP пул и Telethon клиент, если их еще нет или они отвалились.
+        Возвращает True, если Telethon готов к работе.
+        """
+        await self.init_session()
+        return await self.ensure_telethon()
     
     async def close(self):
-        """Закрытие соединений"""
+        """Закрытие соединений (вызывается один раз при остановке бота)"""
+        await self.stop_streaming()
+        # Накопленные уведомления уходят в очередь отправки (она сохраняет их в БД)
+        if self._notify_flush_task and not self._notify_flush_task.done():
+            self._notify_flush_task.cancel()
+        await self.flush_notifications()
         if self.session:
             await self.session.close()
+            self.session = None
         if self.tg_client:
             await self.tg_client.disconnect()
+            self.tg_client = None
+        logger.info("Соединения content_monitor закрыты")
     
-    def check_keywords(self, text: str) -> List[str]:
+    async def start_streaming(self) -> bool:
         """
-        Проверяет наличие ключевых слов в тексте с умным поиском похожих слов
+        Подписывается на новые и отредактированные сообщения отслеживаемых каналов.
+        Каждое событие сразу проходит через тот же конвейер, что и опрос.
         """
-        found_keywords = []
-        text_lower = text.lower()
+        if not TELETHON_AVAILABLE or not config.TG_STREAMING_ENABLED:
+            return False
+        if not await self.ensure_telethon():
+            return False
+        # Обработчики остаются на клиенте и после переподключения
+        if self.streaming and self._stream_client is self.tg_client:
+            return True
+        if self.streaming:
+            await self.stop_streaming()
+            self._gap_fill_requested = True
         
-        for keyword in self.keywords:
-            keyword_lower = keyword.lower()
-            if self._keyword_matches(text_lower, keyword_lower):
-                found_keywords.append(keyword)
+        channels = {}
+        entities = []
+        for channel in config.TG_CHANNELS:
+            try:
+                entity = await telethon_governor.get_entity(self.tg_client, channel)
+                channels[utils.get_peer_id(entity)] = channel
+                entities.append(entity)
+            except Exception as e:
+                logger.error(f"Потоковый режим: не удалось получить канал {channel}: {e}")
+        
+        if not entities:
+            logger.warning("Потоковый режим: нет доступных каналов")
+            return False
+        
+        self._stream_channels = channels
+        self._stream_handlers = [
+            (self._on_new_message, events.NewMessage(chats=entities)),
+            (self._on_edited_message, events.MessageEdited(chats=entities)),
+        ]
+        for callback, event in self._stream_handlers:
+            self.tg_client.add_event_handler(callback, event)
         
-        return found_keywords
+        self._stream_client = self.tg_client
+        self.streaming = True
+        logger.info(f"Потоковый режим включен: {len(entities)} каналов")
+        return True
     
-    def _keyword_matches(self, text: str, keyword: str) -> bool:
+    async def stop_streaming(self):
+        """Отписывается от событий Telethon"""
+        if self._stream_client:
+            for callback, event in self._stream_handlers:
+                self._stream_client.remove_event_handler(callback, event)
+        self._stream_handlers = []
+        self._stream_channels = {}
+        self._stream_client = None
+        self.streaming = False
+    
+    async def _on_new_message(self, event):
         """
-        Проверяет соответствие ключевого слова тексту
+        Обработчик нового сообщения в отслеживаемом канале.
+        Контрольную точку опроса (last_message_id) событие не сдвигает: после разрыва
+        соединения (нашего или внутреннего переподключения Telethon) первое событие
+        перепрыгнуло бы пропущенные сообщения, и досбор их бы не запросил.
         """
-        if ' ' in keyword:
-            return keyword in text
-        if len(keyword) >= 5:
-            return keyword in text
-        import re
-        words = re.findall(r'\b\w+\b', text, re.UNICODE)
-        return keyword in words
+        channel = self._stream_channels.get(event.chat_id)
+        if not channel:
+            return
+        try:
+            await self._handle_telegram_message(channel, event.message)
+            self._streamed_ids.setdefault(channel, set()).add(event.message.id)
+        except Exception as e:
+            logger.error(f"Потоковый режим: ошибка обработки сообщения {channel}/{event.message.id}: {e}")
+    
+    async def _on_edited_message(self, event):
+        """Обработчик отредактированного сообщения: в черновик попадет, если теперь подходит"""
+        channel = self._stream_channels.get(event.chat_id)
+        if not channel:
+            return
+        try:
+            await self._handle_telegram_message(channel, event.message)
+        except Exception as e:
+            logger.error(f"Потоковый режим: ошибка обработки правки {channel}/{event.message.id}: {e}")
+    
+    def _telegram_poll_due(self) -> bool:
+        """В потоковом режиме опрос каналов нужен только для досбора пропусков"""
+        if not self.streaming or self._gap_fill_requested or self._last_tg_poll is None:
+            return True
+        elapsed = time.monotonic() - self._last_tg_poll
+        return elapsed >= config.TG_GAP_FILL_INTERVAL_MINUTES * 60
+    
+    @property
+    def keywords(self) -> List[str]:
+        return self._keywords
+    
+    @keywords.setter
+    def keywords(self, value: List[str]):
+        """При смене набора ключевых слов заново собираем автомат"""
+        self._keywords = list(value)
+        self._keyword_matcher = KeywordMatcher(self._keywords)
+    
+    def check_keywords(self, text: str) -> List[str]:
+        """
+        Проверяет наличие ключевых слов в тексте с умным поиском похожих слов
+        """
+        return self._keyword_matcher.find_all(text)
     
     def clean_text(self, text: str) -> str:
         """
         Очищает текст, преобразуя Markdown-форматирование Telegram в HTML
         и сохраняя существующее HTML-форматирование
         """
-        if not text:
-            return ""
-        try:
-            urls = {}
-            def save_url(match):
-                url_id = f"__URL_{len(urls)}__"
-                urls[url_id] = match.group(2)
-                return f"[{match.group(1)}]({url_id})"
-            text = re.sub(r'\[([^\]]+)\]\(([^)]+)\)', save_url, text)
-            text = text.replace('<', '&lt;').replace('>', '&gt;')
-            text = re.sub(r'`([^`]+)`', r'<code>\1</code>', text)
-            text = re.sub(r'\|\|([^|]+)\|\|', r'<span class="tg-spoiler">\1</span>', text)
-            text = re.sub(r'\*\*([^*]+)\*\*', r'<b>\1</b>', text)
-            text = re.sub(r'__([^_]+)__', r'<i>\1</i>', text)
-            text = re.sub(r'_([^_]+)_', r'<i>\1</i>', text)
-            text = re.sub(r'~~([^~]+)~~', r'<s>\1</s>', text)
-            text = re.sub(r'(?m)^>\s*(.+)$', r'<blockquote>\1</blockquote>', text)
-            for url_id, url in urls.items():
-                text = text.replace(f']({url_id})', f'</a>')
-                text = text.replace(f'[', f'<a href="{url}">')
-            soup = BeautifulSoup(text, 'html.parser')
-            def process_node(node):
-                if node.name == 'b' or node.name == 'strong':
-                    return f"<b>{node.get_text()}</b>"
-                elif node.name == 'i' or node.name == 'em':
-                    return f"<i>{node.get_text()}</i>"
-                elif node.name == 'u':
-                    return f"<u>{node.get_text()}</u>"
-                elif node.name == 's' or node.name == 'strike' or node.name == 'del':
-                    return f"<s>{node.get_text()}</s>"
-                elif node.name == 'code':
-                    return f"<code>{node.get_text()}</code>"
-                elif node.name == 'pre':
-                    return f"<pre>{node.get_text()}</pre>"
-                elif node.name == 'blockquote':
-                    return f"<blockquote>{node.get_text()}</blockquote>"
-                elif node.name == 'span' and 'tg-spoiler' in node.get('class', []):
-                    return f'<span class="tg-spoiler">{node.get_text()}</span>'
-                elif node.name == 'a' and node.get('href'):
-                    return f"<a href=\"{node['href']}\">{node.get_text()}</a>"
-                elif node.name == 'br':
-                    return '\n'
-                elif node.name is None:
-                    return node.string or ''
-                else:
-                    return ''.join(process_node(child) for child in node.children)
-            formatted_text = ''.join(process_node(child) for child in soup.children)
-            formatted_text = re.sub(r'\n{3,}', '\n\n', formatted_text)
-            formatted_text = re.sub(r' +', ' ', formatted_text)
-            formatted_text = re.sub(r' *\n *', '\n', formatted_text)
-            return formatted_text.strip()
-        except Exception as e:
-            logger.error(f"Ошибка при очистке текста: {e}")
-            return soup.get_text(' ', strip=True)
+        return normalize_text(text)
     
-    async def monitor_rss_sources(self):
+    async def _run_sources(self, sources: List[str], handler, concurrency: int, kind: str, key_prefix: str):
+        """
+        Обрабатывает источники параллельно с ограничением числа одновременных задач.
+        У каждого источника свой таймаут, ошибка одного не влияет на остальные.
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        timeout = config.SOURCE_TIMEOUT_SECONDS
+        
+        async def worker(source: str):
+            async with semaphore:
+                started = time.monotonic()
+                try:
+                    await asyncio.wait_for(handler(source), timeout=timeout)
+                except asyncio.TimeoutError:
+                    logger.error(f"{kind} {source}: превышен таймаут {timeout} сек")
+                    self._record_source_error(f"{key_prefix}_{source}")
+                except Exception as e:
+                    logger.error(f"Ошибка обработки {kind} {source}: {e}")
+                    self._record_source_error(f"{key_prefix}_{source}")
+                finally:
+                    logger.debug(f"{kind} {source}: {time.monotonic() - started:.1f} сек")
+        
+        started = time.monotonic()
+        await asyncio.gather(*(worker(source) for source in sources))
+        logger.info(f"{kind}: {len(sources)} источников обработано за {time.monotonic() - started:.1f} сек")
+    
+    async def monitor_rss_sources(self, force: bool = False):
         """Мониторинг RSS источников"""
-        logger.info("Начинаем мониторинг RSS источников")
-        for rss_url in config.RSS_SOURCES:
-            try:
-                await self._process_rss_feed(rss_url)
-            except Exception as e:
-                logger.error(f"Ошибка обработки RSS {rss_url}: {e}")
+        sources = self._due_sources("rss", config.RSS_SOURCES, force)
+        logger.info(f"Начинаем мониторинг RSS источников: к проверке {len(sources)} из {len(config.RSS_SOURCES)}")
+        await self._run_sources(
+            sources, self._process_rss_feed, config.RSS_FETCH_CONCURRENCY, "RSS", "rss"
+        )
+    
+    async def _fetch_rss(self, rss_url: str) -> Optional[tuple]:
+        """
+        Загружает ленту условным запросом (If-None-Match / If-Modified-Since).
+        Возвращает (тело, Content-Type, хэш тела, валидаторы) или None, если лента не изменилась
+        (304 или тот же хэш содержимого у серверов, игнорирующих валидаторы).
+        Валидаторы (etag, last_modified) сохраняет вызывающий - только после успешной обработки,
+        иначе следующий запрос получит 304 и необработанные записи будут потеряны.
+        """
+        source_key = f"rss_{rss_url}"
+        state = self._source_state(source_key)
+        headers = {'Accept-Encoding': 'gzip, deflate, br' if BROTLI_AVAILABLE else 'gzip, deflate'}
+        if state.get('etag'):
+            headers['If-None-Match'] = state['etag']
+        if state.get('last_modified'):
+            headers['If-Modified-Since'] = state['last_modified']
+        
+        max_bytes = config.RSS_MAX_BODY_BYTES
+        async with self.session.get(rss_url, headers=headers) as response:
+            if response.status == 304:
+                logger.info(f"RSS {rss_url}: не изменилась (304)")
+                return None
+            if response.status != 200:
+                raise RuntimeError(f"RSS {rss_url} вернул статус {response.status}")
+            if response.content_length and response.content_length > max_bytes:
+                raise RuntimeError(f"RSS {rss_url}: ответ {response.content_length} байт больше лимита {max_bytes}")
+            
+            # Читаем по частям, чтобы не держать в памяти слишком большой ответ
+            chunks = []
+            size = 0
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise RuntimeError(f"RSS {rss_url}: ответ больше лимита {max_bytes} байт")
+                chunks.append(chunk)
+            body = b''.join(chunks)
+            
+            validators = {
+                'etag': response.headers.get('ETag'),
+                'last_modified': response.headers.get('Last-Modified'),
+            }
+            content_type = response.headers.get('Content-Type', '')
+        
+        content_hash = hashlib.sha256(body).hexdigest()
+        if content_hash == state.get('content_hash'):
+            logger.info(f"RSS {rss_url}: содержимое не изменилось")
+            return None
+        return body, content_type, content_hash, validators
     
     async def _process_rss_feed(self, rss_url: str):
         """Обрабатывает один RSS источник"""
         try:
             if not self.session:
                 await self.init_session()
-            async with self.session.get(rss_url) as response:
-                if response.status != 200:
-                    logger.warning(f"RSS {rss_url} вернул статус {response.status}")
-                    return
-                content = await response.text()
-            feed = feedparser.parse(content)
-            if not feed.entries:
-                logger.warning(f"RSS {rss_url} не содержит записей")
+            source_key = f"rss_{rss_url}"
+            fetched = await self._fetch_rss(rss_url)
+            if fetched is None:
+                # Лента не менялась: ни разбора, ни новых записей
+                self._record_source_success(source_key, 0 if await self._get_last_check_time(source_key) else None)
+                await self._update_last_check_time(source_key)
                 return
-            source_name = feed.feed.get('title', rss_url)
-            logger.info(f"Обрабатываем RSS: {source_name} ({len(feed.entries)} записей)")
+            body, content_type, content_hash, validators = fetched
             
             # Получаем время последней проверки из базы данных
             last_check_time = await self._get_last_check_time(f"rss_{rss_url}")
+            previous_check = last_check_time
             if not last_check_time:
                 # Если нет записи в БД, берем время 24 часа назад с UTC
                 last_check_time = datetime.now(timezone.utc) - timedelta(hours=24)
                 logger.info(f"RSS {rss_url}: нет записи в БД, берем время {last_check_time}")
             else:
-                # Убеждаемся, что last_check_time имеет часовой пояс
-                if last_check_time.tzinfo is None:
-                    last_check_time = last_check_time.replace(tzinfo=timezone.utc)
-                
                 # Добавляем буфер времени для компенсации разницы часовых поясов
                 # Отнимаем 6 часов от времени последней проверки, чтобы захватить больше записей
                 last_check_time = last_check_time - timedelta(hours=6)
                 logger.info(f"RSS {rss_url}: время последней проверки {last_check_time} (с буфером -6ч)")
             
-            new_entries = 0
-            for entry in feed.entries:
-                try:
-                    pub_date = None
-                    if hasattr(entry, 'published_parsed') and entry.published_parsed:
-                        # Создаем datetime с UTC
-                        pub_date = datetime(*entry.published_parsed[:6], tzinfo=timezone.utc)
-                    elif hasattr(entry, 'updated_parsed') and entry.updated_parsed:
-                        # Создаем datetime с UTC
-                        pub_date = datetime(*entry.updated_parsed[:6], tzinfo=timezone.utc)
-                    
-                    # Пропускаем старые записи
-                    if pub_date and pub_date <= last_check_time:
-                        logger.debug(f"Пропускаем старую RSS запись: {pub_date} <= {last_check_time}")
-                        continue
-                    
-                    # Проверяем, что запись не старше CUTOFF_DATE
-                    if pub_date and pub_date < CUTOFF_DATE:
-                        logger.debug(f"Пропускаем RSS запись старше {CUTOFF_DATE}: {pub_date}")
-                        continue
-                    
-                    title = entry.get('title', '')
-                    description = entry.get('description', '') or entry.get('summary', '')
-                    full_text = f"{title}\n\n{description}"
-                    clean_full_text = self.clean_text(full_text)
-                    matched_keywords = self.check_keywords(clean_full_text)
-                    logger.debug(f"RSS запись '{title}': найдены ключевые слова {matched_keywords}")
-                    
-                    if matched_keywords:
-                        entry_url = entry.get('link', '')
-                        if await db.check_content_exists('rss', entry_url):
-                            logger.debug(f"RSS пост уже существует: {entry_url}")
-                            continue
-                        
-                        logger.info(f"Добавляем новый RSS пост: {title[:50]}...")
-                        draft_id = await db.add_content_draft(
-                            source_type='rss',
-                            source_name=source_name,
-                            original_text=clean_full_text,
-                            source_url=entry_url,
-                            source_date=pub_date.isoformat() if pub_date else None,
-                            keywords_matched=matched_keywords
-                        )
-                        new_entries += 1
-                        logger.info(f"Добавлен RSS контент #{draft_id}: {title[:50]}...")
-                        
-                        # Проверяем, что бот доступен для уведомлений
-                        if self.bot_instance:
-                            logger.info(f"Отправляем уведомление о RSS посте #{draft_id}")
-                            await self._notify_admin_about_new_post(draft_id)
-                        else:
-                            logger.warning(f"Бот не доступен для уведомления о RSS посте #{draft_id}")
-                    else:
-                        logger.debug(f"RSS запись '{title}' не содержит ключевых слов")
-                        
-                except Exception as e:
-                    logger.error(f"Ошибка обработки RSS записи: {e}")
-                    continue
+            # Разбор, очистка и поиск ключевых слов - в исполнителе, не в event loop
+            parsed = await ingest_executor.run(
+                parse_feed, body, content_type, tuple(self.keywords),
+                last_check_time.isoformat(),
+                previous_check.isoformat() if previous_check else None,
+                CUTOFF_DATE.isoformat()
+            )
+            if not parsed['total']:
+                # Пустая лента - тоже успешная проверка: валидаторы и хэш сохраняются ниже,
+                # иначе неизменная пустая лента скачивалась бы и разбиралась каждый цикл
+                logger.warning(f"RSS {rss_url} не содержит записей")
+            source_name = parsed['title'] or rss_url
+            logger.info(f"Обрабатываем RSS: {source_name} ({parsed['total']} записей, подходящих {len(parsed['entries'])})")
+            
+            # Записи, появившиеся с прошлой проверки (без буфера) - для оценки активности ленты
+            fresh_entries = parsed['fresh']
+            drafts = [{
+                'source_type': 'rss',
+                'source_name': source_name,
+                'original_text': entry['text'],
+                'source_url': entry['link'],
+                'source_date': entry['pub_date'],
+                'keywords_matched': entry['keywords']
+            } for entry in parsed['entries']]
             
-            # Обновляем время последней проверки в БД
+            # Все подходящие записи ленты сохраняются одной транзакцией
+            new_entries = len(await self._ingest_drafts(drafts))
+            
+            # Хэш и валидаторы запоминаем только после успешной обработки ленты
+            self._set_source_state(source_key, content_hash=content_hash, **validators)
+            
+            # Оценка активности и время последней проверки (запишутся в БД в конце цикла)
+            self._record_source_success(
+                f"rss_{rss_url}", fresh_entries if previous_check else None, new_entries
+            )
             await self._update_last_check_time(f"rss_{rss_url}")
             logger.info(f"RSS {source_name}: добавлено {new_entries} новых записей")
         except Exception as e:
             logger.error(f"Ошибка обработки RSS {rss_url}: {e}")
+            self._record_source_error(f"rss_{rss_url}")
     
-    async def monitor_telegram_channels(self):
+    async def monitor_telegram_channels(self, force: bool = False):
         """Мониторинг Telegram каналов"""
         if not self.tg_client:
             logger.warning("Telethon клиент не инициализирован")
             return
-        logger.info("Начинаем мониторинг Telegram каналов")
-        for channel in config.TG_CHANNELS:
-            try:
-                await self._process_telegram_channel(channel)
-            except Exception as e:
-                logger.error(f"Ошибка обработки канала {channel}: {e}")
+        channels = self._due_sources("tg", config.TG_CHANNELS, force)
+        logger.info(f"Начинаем мониторинг Telegram каналов: к проверке {len(channels)} из {len(config.TG_CHANNELS)}")
+        await self._run_sources(
+            channels, self._process_telegram_channel, config.TG_CHANNEL_WORKERS, "Канал", "tg"
+        )
+    
+    # --- Состояние источников (таблица source_state, кэш в памяти) ---
+    
+    async def load_source_states(self):
+        """
+        Загружает состояние всех источников одним запросом.
+        Несохраненные изменения в памяти не перезаписываются.
+        """
+        try:
+            states = await db.get_all_source_states()
+            for key, state in states.items():
+                if key not in self._dirty_sources:
+                    self._source_states[key] = state
+            self._source_states_loaded = True
+        except Exception as e:
+            logger.error(f"Ошибка загрузки состояния источников: {e}")
+    
+    async def flush_source_states(self, source_keys: Optional[List[str]] = None):
+        """Сохраняет измененные состояния источников одной пакетной записью"""
+        keys = self._dirty_sources if source_keys is None else self._dirty_sources.intersection(source_keys)
+        keys = list(keys)
+        if not keys:
+            return
+        self._dirty_sources.difference_update(keys)
+        try:
+            await db.save_source_states([self._source_states[key] for key in keys])
+        except Exception as e:
+            # Вернем ключи в очередь на следующую запись
+            self._dirty_sources.update(keys)
+            logger.error(f"Ошибка сохранения состояния источников: {e}")
+    
+    async def _ensure_source_states(self):
+        if not self._source_states_loaded:
+            await self.load_source_states()
+    
+    def _source_state(self, source_key: str) -> Dict:
+        """Состояние источника из кэша (создается при первом обращении)"""
+        state = self._source_states.get(source_key)
+        if state is None:
+            state = db.new_source_state(source_key)
+            self._source_states[source_key] = state
+        return state
+    
+    def _set_source_state(self, source_key: str, **fields):
+        """Изменяет поля состояния источника и помечает его для сохранения"""
+        self._source_state(source_key).update(fields)
+        self._dirty_sources.add(source_key)
+    
+    def _record_source_error(self, source_key: str):
+        state = self._source_state(source_key)
+        self._set_source_state(source_key, error_count=(state.get('error_count') or 0) + 1)
+        self._schedule_source(source_key)
+    
+    def _defer_source(self, source_key: str, seconds: float):
+        """Переносит проверку источника (лимит Telegram) - это не ошибка источника"""
+        due = datetime.now(timezone.utc) + timedelta(seconds=seconds + 1)
+        current = self._source_due_at(source_key)
+        if current is None or current < due:
+            self._set_source_state(source_key, next_due_at=due.isoformat())
+    
+    def _record_source_success(self, source_key: str, new_items: Optional[int] = None, matched: int = 0):
+        """
+        Учитывает успешную проверку: сбрасывает ошибки, обновляет оценку активности
+        источника и назначает следующую проверку. Вызывается до обновления last_check.
+        """
+        state = self._source_state(source_key)
+        adaptive_polling.observe(state, new_items, matched, datetime.now(timezone.utc))
+        state['error_count'] = 0
+        self._dirty_sources.add(source_key)
+        self._schedule_source(source_key)
+    
+    # --- Адаптивные интервалы опроса ---
+    
+    async def _load_channel_stats(self):
+        """Статистика каналов одним запросом (для оценки активности до первых наблюдений)"""
+        try:
+            self._channel_stats = {
+                f"{row['source_type']}_{row['source_url']}": row for row in await db.get_channel_stats()
+            }
+        except Exception as e:
+            logger.error(f"Ошибка загрузки статистики каналов: {e}")
+    
+    def _min_interval_minutes(self, source_key: str) -> float:
+        if source_key.startswith('rss_'):
+            return config.RSS_CHECK_INTERVAL_MINUTES
+        return config.TG_CHECK_INTERVAL_MINUTES
+    
+    def _schedule_source(self, source_key: str):
+        """Назначает время следующей проверки источника"""
+        now = datetime.now(timezone.utc)
+        state = self._source_state(source_key)
+        min_minutes = self._min_interval_minutes(source_key)
+        if config.ADAPTIVE_POLLING_ENABLED:
+            minutes = adaptive_polling.next_interval_minutes(
+                state, self._channel_stats.get(source_key), min_minutes, now
+            )
+        else:
+            minutes = min_minutes
+        self._set_source_state(source_key, next_due_at=(now + timedelta(minutes=minutes)).isoformat())
+        logger.debug(f"{source_key}: следующая проверка через {minutes:.1f} мин")
+    
+    def _source_due_at(self, source_key: str) -> Optional[datetime]:
+        value = self._source_state(source_key).get('next_due_at')
+        if not value:
+            return None
+        due = datetime.fromisoformat(value)
+        return due if due.tzinfo else due.replace(tzinfo=timezone.utc)
+    
+    def _due_sources(self, key_prefix: str, sources: List[str], force: bool = False) -> List[str]:
+        """Источники, время проверки которых наступило (force - все)"""
+        if force:
+            return list(sources)
+        now = datetime.now(timezone.utc)
+        due = []
+        for source in sources:
+            due_at = self._source_due_at(f"{key_prefix}_{source}")
+            if due_at is None or due_at <= now:
+                due.append(source)
+        return due
+    
+    def next_due_time(self) -> Optional[float]:
+        """Timestamp ближайшей проверки среди всех источников (для планировщика)"""
+        if not self._source_states_loaded:
+            return None
+        keys = [f"rss_{url}" for url in config.RSS_SOURCES]
+        if self.tg_client:
+            keys += [f"tg_{channel}" for channel in config.TG_CHANNELS]
+        earliest = None
+        for key in keys:
+            due_at = self._source_due_at(key)
+            if due_at is None:
+                return time.time()
+            earliest = due_at.timestamp() if earliest is None else min(earliest, due_at.timestamp())
+        return earliest
+    
+    async def get_source_state(self, source_key: str) -> Dict:
+        """Текущее состояние источника (для админских команд)"""
+        await self._ensure_source_states()
+        return dict(self._source_state(source_key))
+    
+    async def reset_source_states(self, source_keys: List[str], reset_message_ids: bool = False,
+                                  last_check: Optional[datetime] = None):
+        """
+        Сбрасывает контрольные точки источников и сразу сохраняет их:
+        reset_message_ids - забыть ID последнего сообщения,
+        last_check - выставить время последней проверки.
+        """
+        await self._ensure_source_states()
+        for source_key in source_keys:
+            fields = {}
+            if reset_message_ids:
+                fields['last_message_id'] = None
+            if last_check is not None:
+                fields['last_check'] = last_check.isoformat()
+                # Иначе условный запрос вернет 304 и лента не будет перечитана
+                fields.update(etag=None, last_modified=None, content_hash=None)
+            self._set_source_state(source_key, **fields)
+        await self.flush_source_states(source_keys)
     
     async def _get_last_check_time(self, source_key: str) -> Optional[datetime]:
-        """Получает время последней проверки из базы данных"""
+        """Получает время последней проверки источника"""
         try:
-            # Получаем из БД время последней проверки
-            result = await db.get_setting(f"last_check_{source_key}")
+            await self._ensure_source_states()
+            result = self._source_state(source_key).get('last_check')
             if result:
                 dt = datetime.fromisoformat(result)
                 # Убеждаемся, что datetime имеет часовой пояс
@@ -335,230 +684,581 @@ class ContentMonitor:
         return None
     
     async def _update_last_check_time(self, source_key: str):
-        """Обновляет время последней проверки в базе данных"""
-        try:
-            # Сохраняем время с UTC
-            current_time = datetime.now(timezone.utc)
-            await db.set_setting(f"last_check_{source_key}", current_time.isoformat())
-        except Exception as e:
-            logger.error(f"Ошибка обновления времени последней проверки: {e}")
+        """Обновляет время последней проверки (сохраняется в конце цикла)"""
+        # Сохраняем время с UTC
+        self._set_source_state(source_key, last_check=datetime.now(timezone.utc).isoformat())
     
     async def _get_last_message_id(self, source_key: str) -> Optional[int]:
-        """Получает ID последнего обработанного сообщения из базы данных"""
+        """Получает ID последнего обработанного сообщения"""
+        await self._ensure_source_states()
+        return self._source_state(source_key).get('last_message_id')
+    
+    async def _update_last_message_id(self, source_key: str, message_id: int):
+        """Обновляет ID последнего обработанного сообщения (сохраняется в конце цикла)"""
+        self._set_source_state(source_key, last_message_id=message_id)
+    
+    async def _advance_last_message_id(self, source_key: str, message_id: int):
+        """Сдвигает ID последнего сообщения только вперед (опрос и догрузка истории идут параллельно)"""
+        current = await self._get_last_message_id(source_key)
+        if current is None or message_id > current:
+            await self._update_last_message_id(source_key, message_id)
+    
+    async def _iter_new_message_pages(self, entity, last_message_id: Optional[int]):
+        """
+        Постранично отдает сообщения канала новее last_message_id.
+        
+        Если ID уже известен, запрашиваем у Telegram только сообщения с id > last_message_id
+        (от старых к новым), поэтому стоимость проверки зависит от количества новых
+        сообщений, а не от возраста канала. При первой проверке берем ограниченное окно
+        последних TG_FIRST_RUN_BACKFILL сообщений.
+        """
+        page_size = max(1, config.TG_FETCH_PAGE_SIZE)
+        
+        if last_message_id is None:
+            remaining = max(1, config.TG_FIRST_RUN_BACKFILL)
+            offset_id = 0
+            while remaining > 0:
+                page = await telethon_governor.get_messages(
+                    self.tg_client,
+                    entity,
+                    limit=min(page_size, remaining),
+                    offset_id=offset_id
+                )
+                if not page:
+                    return
+                yield page
+                remaining -= len(page)
+                offset_id = min(m.id for m in page)
+                # Дальше CUTOFF_DATE история не нужна
+                if len(page) < page_size or min(m.date for m in page) < CUTOFF_DATE:
+                    return
+            return
+        
+        min_id = last_message_id
+        while True:
+            page = await telethon_governor.get_messages(
+                self.tg_client,
+                entity,
+                limit=page_size,
+                min_id=min_id,
+                reverse=True
+            )
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            min_id = max(m.id for m in page)
+    
+    def _build_telegram_draft(self, channel: str, message,
+                              matched_keywords: Optional[List[str]] = None) -> Optional[Dict]:
+        """
+        Прогоняет одно сообщение через фильтр ключевых слов.
+        Возвращает данные черновика или None, если сообщение не подходит.
+        matched_keywords - уже найденные ключевые слова (поиск пачкой в исполнителе).
+        """
+        if not message.text:
+            logger.debug(f"Пропускаем сообщение без текста: {message.id}")
+            return None
+        
+        # Проверяем, что сообщение не старше CUTOFF_DATE
+        if message.date < CUTOFF_DATE:
+            logger.debug(f"Пропускаем сообщение старше {CUTOFF_DATE}: {message.id} от {message.date}")
+            return None
+        
+        logger.debug(f"Обрабатываем новое сообщение {message.id}: {message.date}")
+        if matched_keywords is None:
+            matched_keywords = self.check_keywords(message.text)
+        logger.debug(f"Найдены ключевые слова: {matched_keywords}")
+        
+        if not matched_keywords:
+            logger.debug(f"Сообщение {message.id} не содержит ключевых слов")
+            return None
+        
+        return {
+            'source_type': 'telegram',
+            'source_name': channel,
+            'original_text': message.text,
+            'source_url': f"https://t.me/{channel.replace('@', '')}/{message.id}",
+            'source_date': message.date.isoformat(),
+            'keywords_matched': matched_keywords
+        }
+    
+    async def _ingest_drafts(self, drafts: List[Dict], live: bool = True) -> List[int]:
+        """
+        Сохраняет пачку черновиков одной транзакцией (дубликаты отсекает БД)
+        и уведомляет админов только о действительно новых.
+        live = False - посты из догрузки истории: без сюжетов и (по умолчанию) без уведомлений.
+        """
+        if not drafts:
+            return []
+        
+        # Уже известные посты (повторная выборка после /reset_ids, догрузка истории)
+        # отсекаются до поиска похожих: фильтр Блума + один запрос на возможные совпадения
+        known = await db.get_known_sources([(d['source_type'], d.get('source_url')) for d in drafts])
+        if known:
+            drafts = [d for d in drafts if (d['source_type'], d.get('source_url')) not in known]
+            logger.debug(f"Пропущено уже известных постов: {len(known)}")
+            if not drafts:
+                return []
+        
+        attached = []
+        if config.NEAR_DUP_ENABLED:
+            new_drafts, attached = await self._ingest_with_near_duplicates(drafts)
+        else:
+            ids = await db.add_content_drafts(drafts)
+            new_drafts = [{**draft, 'id': draft_id} for draft, draft_id in zip(drafts, ids) if draft_id]
+        if len(new_drafts) < len(drafts):
+            logger.debug(f"Пропущено существующих и похожих постов: {len(drafts) - len(new_drafts)}")
+        
+        if live and config.STORY_TRACKING_ENABLED:
+            await self._track_stories(new_drafts, attached)
+        if not live and not config.BACKFILL_NOTIFY:
+            return [draft['id'] for draft in new_drafts]
+        
+        # Уведомления только ставятся в очередь отправки, мониторинг не ждет Bot API
+        for draft in new_drafts:
+            logger.info(f"Добавлен контент #{draft['id']}")
+            await self._notify_admin_about_new_post(draft['id'], draft)
+        return [draft['id'] for draft in new_drafts]
+    
+    async def _load_near_duplicates(self):
+        """Заполняет LSH-индекс сигнатурами недавних черновиков (один раз)"""
+        if self._near_dup_loaded:
+            return
+        self._near_dup_loaded = True
         try:
-            result = await db.get_setting(f"last_message_id_{source_key}")
-            if result:
-                return int(result)
+            rows = await db.get_recent_draft_signatures(config.NEAR_DUP_WINDOW_HOURS)
+            for row in rows:
+                near_duplicate_index.add(row['id'], row['minhash'], row['created_ts'])
+            logger.info(f"Индекс похожих постов: загружено {len(rows)} черновиков")
         except Exception as e:
-            logger.error(f"Ошибка получения ID последнего сообщения: {e}")
-        return None
+            logger.error(f"Ошибка загрузки индекса похожих постов: {e}")
     
-    async def _update_last_message_id(self, source_key: str, message_id: int):
-        """Обновляет ID последнего обработанного сообщения в базе данных"""
+    async def _ingest_with_near_duplicates(self, drafts: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Сохраняет черновики, объединяя почти одинаковые тексты: репост новости,
+        уже попавшей в черновики, прикрепляется к ней дополнительным источником.
+        Возвращает действительно новые черновики (с ID) и прикрепленные источники.
+        """
+        await self._load_near_duplicates()
+        # Сигнатуры считаются в исполнителе вместе с остальной CPU-работой мониторинга
+        signatures = await ingest_executor.run(
+            minhash_signatures, [draft['original_text'] for draft in drafts]
+        )
+        
+        # Поиск и запись под одной блокировкой: параллельно обрабатываемые каналы
+        # не должны одновременно создать два черновика одной новости
+        async with self._ingest_lock:
+            fresh, attached = [], []
+            for index, (draft, signature) in enumerate(zip(drafts, signatures)):
+                draft['minhash'] = signature
+                match = near_duplicate_index.find(signature)
+                if match:
+                    attached.append((draft, *match))
+                else:
+                    # Временный ключ: похожие записи этой же пачки найдут черновик до его записи в БД
+                    near_duplicate_index.add(('new', index), signature)
+                    fresh.append(index)
+            
+            try:
+                async with db.transaction():
+                    ids = await db.add_content_drafts([drafts[index] for index in fresh])
+                    draft_ids = dict(zip((('new', index) for index in fresh), ids))
+                    sources = []
+                    for draft, key, score in attached:
+                        draft_id = draft_ids.get(key) if isinstance(key, tuple) else key
+                        if draft_id:
+                            sources.append({**draft, 'draft_id': draft_id, 'similarity': score})
+                    added_sources = await db.add_draft_sources(sources)
+            except Exception:
+                for index in fresh:
+                    near_duplicate_index.remove(('new', index))
+                raise
+            
+            new_drafts = []
+            for index, draft_id in zip(fresh, ids):
+                if draft_id:
+                    near_duplicate_index.replace_key(('new', index), draft_id)
+                    new_drafts.append({**drafts[index], 'id': draft_id})
+                else:
+                    near_duplicate_index.remove(('new', index))
+        
+        for source in sources:
+            logger.debug(f"Похожий пост {source['source_url']} -> черновик #{source['draft_id']} "
+                         f"(сходство {source['similarity']:.2f})")
+        if sources:
+            logger.info(f"Похожих постов прикреплено к существующим черновикам: {added_sources} из {len(sources)}")
+        return new_drafts, sources
+    
+    async def _track_stories(self, new_drafts: List[Dict], attached: List[Dict]):
+        """Учитывает посты в сюжетах и поднимает тревогу о "горячих" сюжетах"""
         try:
-            await db.set_setting(f"last_message_id_{source_key}", str(message_id))
+            hot = []
+            for item in new_drafts + attached:
+                story = story_tracker.observe(
+                    item['source_name'], item['original_text'], self._draft_keywords(item),
+                    item.get('id') or item.get('draft_id')
+                )
+                if story:
+                    hot.append(story)
+            for story in hot:
+                await self._send_story_alert(story)
         except Exception as e:
-            logger.error(f"Ошибка обновления ID последнего сообщения: {e}")
+            logger.error(f"Ошибка учета сюжетов: {e}")
+    
+    def _build_story_alert(self, story) -> str:
+        """Текст тревоги о сюжете, который подхватили несколько источников"""
+        from emoji_config import safe_html_with_emoji
+        
+        minutes = max(1, int((story.last_seen - story.first_seen) / 60))
+        sources = list(story.sources)
+        keywords = [keyword for keyword, _ in story.keywords.most_common(5)]
+        text = f"🔥 <b>Горячий сюжет</b>\n\n"
+        if story.headline:
+            text += f"<i>{safe_html_with_emoji(story.headline)}</i>\n\n"
+        text += f"📡 <b>Источников:</b> {len(sources)} за {minutes} мин\n"
+        text += f"• {safe_html_with_emoji(', '.join(sources[:10]))}\n"
+        if keywords:
+            text += f"🔍 <b>Ключевые слова:</b> {safe_html_with_emoji(', '.join(keywords))}\n"
+        if story.draft_ids:
+            text += f"📋 <b>Черновики:</b> {', '.join(f'#{draft_id}' for draft_id in story.draft_ids[:10])}\n"
+        return text
+    
+    async def _send_story_alert(self, story):
+        """Тревога админам вне очереди обычных уведомлений"""
+        from keyboards import get_new_post_keyboard
+        
+        text = self._build_story_alert(story)
+        markup = get_new_post_keyboard(story.draft_ids[0]) if story.draft_ids else None
+        messages = [
+            {'chat_id': user_id, 'text': text, 'reply_markup': markup}
+            for user_id in ADMIN_USERS
+        ]
+        await outbound_queue.enqueue_many(messages, priority=True)
+        logger.info(f"Горячий сюжет #{story.id}: {len(story.sources)} источников, тревога поставлена в очередь")
+    
+    async def _handle_telegram_message(self, channel: str, message) -> Optional[int]:
+        """Обрабатывает одно сообщение (потоковый режим). Возвращает ID нового черновика"""
+        draft = self._build_telegram_draft(channel, message)
+        if not draft:
+            return None
+        new_ids = await self._ingest_drafts([draft])
+        return new_ids[0] if new_ids else None
+    
+    async def process_message_page(self, channel: str, page: List, after_id: Optional[int] = None,
+                                   live: bool = True, skip_ids: Optional[set] = None) -> tuple:
+        """
+        Обрабатывает страницу сообщений канала: ключевые слова - в исполнителе одним вызовом,
+        сохранение - одной транзакцией. Сообщения с id <= after_id пропускаются,
+        skip_ids - уже обработанные из потока (учитываются только в максимальном ID).
+        Возвращает (число новых черновиков, максимальный ID сообщения страницы).
+        """
+        max_id = None
+        candidates = []
+        for message in page:
+            if after_id is not None and message.id <= after_id:
+                continue
+            # Записываем ID для обновления
+            max_id = message.id if max_id is None else max(max_id, message.id)
+            if skip_ids and message.id in skip_ids:
+                continue
+            if message.text and message.date >= CUTOFF_DATE:
+                candidates.append(message)
+        
+        matches = []
+        if candidates:
+            matches = await ingest_executor.run(
+                match_texts, [message.text for message in candidates], tuple(self.keywords)
+            )
+        
+        def build(item):
+            try:
+                return self._build_telegram_draft(channel, *item)
+            except Exception as e:
+                logger.error(f"Ошибка обработки сообщения: {e}")
+                return None
+        
+        # Сборка черновиков в event loop - с уступкой циклу по бюджету времени
+        built = await run_with_budget(list(zip(candidates, matches)), build)
+        drafts = [draft for draft in built if draft]
+        return len(await self._ingest_drafts(drafts, live=live)), max_id
     
     async def _process_telegram_channel(self, channel: str):
         """Обрабатывает один Telegram канал по ID сообщений"""
         try:
-            entity = await self.tg_client.get_entity(channel)
+            entity = await telethon_governor.get_entity(self.tg_client, channel)
             
             # Получаем ID последнего обработанного сообщения
             last_message_id = await self._get_last_message_id(f"tg_{channel}")
             logger.info(f"Канал {channel}: последний ID сообщения {last_message_id}")
             
-            # Получаем ВСЕ доступные сообщения без лимита
-            messages = await self.tg_client.get_messages(
-                entity, 
-                limit=None  # Убираем лимит - получаем все сообщения
-            )
+            if last_message_id is None:
+                from backfill import backfill_manager
+                if backfill_manager.is_pending(channel):
+                    # Контрольную точку выставит догрузка истории при старте
+                    logger.info(f"Канал {channel}: ожидает догрузки истории, пропускаем")
+                    return
             
-            if not messages:
-                logger.info(f"Канал {channel}: нет сообщений")
-                return
-                
-            logger.info(f"Обрабатываем канал {channel}: {len(messages)} сообщений")
+            new_entries = 0
+            fetched = 0
+            max_id = None
+            # Сообщения, пришедшие из потока, уже сохранены - повторно их не разбираем
+            streamed = self._streamed_ids.pop(channel, set())
             
-            # Сортируем сообщения по ID (новые первыми)
-            messages.sort(key=lambda m: m.id, reverse=True)
+            # Запрашиваем только новые сообщения и обрабатываем их по страницам
+            try:
+                async for page in self._iter_new_message_pages(entity, last_message_id):
+                    fetched += len(page)
+                    page_entries, page_max_id = await self.process_message_page(
+                        channel, page, last_message_id, skip_ids=streamed
+                    )
+                    new_entries += page_entries
+                    if page_max_id is not None:
+                        max_id = page_max_id if max_id is None else max(max_id, page_max_id)
+            except RequestDeferred as e:
+                # Обработанные страницы не теряем, остальное - после окончания лимита
+                if max_id is not None and last_message_id is not None:
+                    await self._advance_last_message_id(f"tg_{channel}", max_id)
+                self._streamed_ids.setdefault(channel, set()).update(streamed)
+                raise
             
-            new_entries = 0
-            processed_messages = []
+            # Первый запуск - догрузка истории, для оценки активности канала не годится
+            self._record_source_success(
+                f"tg_{channel}", fetched if last_message_id is not None else None, new_entries
+            )
+            await self._update_last_check_time(f"tg_{channel}")
             
-            for message in messages:
-                try:
-                    if not message.text:
-                        logger.debug(f"Пропускаем сообщение без текста: {message.id}")
-                        continue
-                    
-                    # Если это первая проверка (last_message_id = None), обрабатываем все сообщения
-                    if last_message_id is None:
-                        # При первой проверке обрабатываем все сообщения, но только после CUTOFF_DATE
-                        pass
-                    else:
-                        # Пропускаем сообщения с ID меньше или равным последнему обработанному
-                        if message.id <= last_message_id:
-                            logger.debug(f"Пропускаем уже обработанное сообщение {message.id} <= {last_message_id}")
-                            continue
-                    
-                    # Проверяем, что сообщение не старше CUTOFF_DATE
-                    if message.date < CUTOFF_DATE:
-                        logger.debug(f"Пропускаем сообщение старше {CUTOFF_DATE}: {message.id} от {message.date}")
-                        continue
-                    
-                    logger.debug(f"Обрабатываем новое сообщение {message.id}: {message.date}")
-                    matched_keywords = self.check_keywords(message.text)
-                    logger.debug(f"Найдены ключевые слова: {matched_keywords}")
-                    
-                    if matched_keywords:
-                        message_url = f"https://t.me/{channel.replace('@', '')}/{message.id}"
-                        if await db.check_content_exists('telegram', message_url):
-                            logger.debug(f"Пост уже существует: {message_url}")
-                            continue
-                        
-                        logger.info(f"Добавляем новый TG пост: {message.text[:50]}...")
-                        draft_id = await db.add_content_draft(
-                            source_type='telegram',
-                            source_name=channel,
-                            original_text=message.text,
-                            source_url=message_url,
-                            source_date=message.date.isoformat(),
-                            keywords_matched=matched_keywords
-                        )
-                        new_entries += 1
-                        logger.info(f"Добавлен TG контент #{draft_id}: {message.text[:50]}...")
-                        
-                        # Проверяем, что бот доступен для уведомлений
-                        if self.bot_instance:
-                            logger.info(f"Отправляем уведомление о посте #{draft_id}")
-                            await self._notify_admin_about_new_post(draft_id)
-                        else:
-                            logger.warning(f"Бот не доступен для уведомления о посте #{draft_id}")
-                    else:
-                        logger.debug(f"Сообщение {message.id} не содержит ключевых слов")
-                    
-                    # Записываем ID для обновления
-                    processed_messages.append(message.id)
-                        
-                except Exception as e:
-                    logger.error(f"Ошибка обработки сообщения: {e}")
-                    continue
+            if not fetched:
+                logger.info(f"Канал {channel}: нет новых сообщений")
+                return
+            
+            logger.info(f"Обработан канал {channel}: {fetched} новых сообщений")
             
             # Обновляем ID последнего обработанного сообщения
-            if processed_messages:
-                max_id = max(processed_messages)
-                await self._update_last_message_id(f"tg_{channel}", max_id)
+            if max_id is not None:
+                await self._advance_last_message_id(f"tg_{channel}", max_id)
                 logger.info(f"Канал {channel}: обновлен ID последнего сообщения до {max_id}")
             
             logger.info(f"Канал {channel}: добавлено {new_entries} новых записей")
+        except RequestDeferred as e:
+            logger.warning(f"Канал {channel}: {e}")
+            self._defer_source(f"tg_{channel}", e.retry_after)
         except Exception as e:
             logger.error(f"Ошибка обработки канала {channel}: {e}")
+            self._record_source_error(f"tg_{channel}")
     
-    async def run_monitoring_cycle(self):
+    async def run_monitoring_cycle(self, force: bool = False):
         """Запускает полный цикл мониторинга"""
         logger.info("=== Начинаем цикл мониторинга контента ===")
         try:
-            await self.init_session()
-            await self.init_telethon()
-            await self.monitor_rss_sources()
-            if self.tg_client:
-                await self.monitor_telegram_channels()
+            # Состояние всех источников одним запросом, запись - одним пакетом в конце
+            await self.load_source_states()
+            await self._load_channel_stats()
+            # Соединения живут между циклами, здесь только проверка/переподключение
+            tg_ready = await self.ensure_connections()
+            if tg_ready and config.TG_STREAMING_ENABLED:
+                await self.start_streaming()
+            # RSS и Telegram обрабатываются одновременно, у каждого свой лимит
+            monitors = [self.monitor_rss_sources(force)]
+            if tg_ready and (force or self._telegram_poll_due()):
+                self._gap_fill_requested = False
+                self._last_tg_poll = time.monotonic()
+                monitors.append(self.monitor_telegram_channels(force))
+            elif tg_ready:
+                logger.info("Потоковый режим: опрос Telegram каналов не требуется")
+            await asyncio.gather(*monitors)
+            await self.prune_notification_batches()
             logger.info("=== Цикл мониторинга завершен ===")
         except Exception as e:
             logger.error(f"Ошибка в цикле мониторинга: {e}")
         finally:
-            await self.close()
+            await self.flush_source_states()
 
+    @staticmethod
+    def _draft_keywords(post_data: Dict) -> List[str]:
+        """Ключевые слова черновика списком (в БД они хранятся строкой через запятую)"""
+        keywords = post_data.get('keywords_matched') or []
+        if isinstance(keywords, str):
+            keywords = [k for k in keywords.split(',') if k]
+        return keywords
+    
+    def _build_new_post_message(self, post_data: Dict) -> str:
+        """Текст уведомления о новом найденном посте"""
+        from emoji_config import get_emoji, safe_html_with_emoji
+        
+        keywords = self._draft_keywords(post_data)
+        
+        safe_text = post_data['original_text']
+        safe_source = safe_html_with_emoji(post_data.get('source_name', 'Неизвестно'))
+        safe_url = safe_html_with_emoji(post_data.get('source_url', ''))
+        safe_keywords = safe_html_with_emoji(', '.join(keywords))
+        source_emoji = "📡" if post_data.get('source_type') == 'rss' else "💬"
+        new_emoji = get_emoji("sparkle")
+        message_text = f"{new_emoji} <b>Новый пост найден!</b>\n\n"
+        message_text += f"{source_emoji} <b>Источник:</b> {safe_source}\n"
+        message_text += f"📅 <b>Дата:</b> {(post_data.get('source_date') or 'Неизвестно')[:19]}\n"
+        message_text += f"🔍 <b>Ключевые слова:</b> {safe_keywords}\n"
+        if safe_url:
+            message_text += f"🔗 <b>Ссылка:</b> {safe_url}\n"
+        message_text += f"\n📝 <b>Исходный текст:</b>\n{safe_text}\n\n"
+        from chatgpt_integration import chatgpt_rewriter
+        suggestions = chatgpt_rewriter.get_rewrite_suggestions(post_data['original_text'])
+        content_type = chatgpt_rewriter._detect_content_type(post_data['original_text'])
+        type_names = {
+            "news": "📰 Новость",
+            "update": "🔄 Обновление", 
+            "airdrop": "🎁 Airdrop",
+            "analysis": "📊 Аналитика"
+        }
+        message_text += f"🎯 <b>Тип:</b> {type_names.get(content_type, '📝 Общий')}\n"
+        if suggestions:
+            message_text += f"💡 <b>Нужно улучшить:</b>\n"
+            for suggestion in list(suggestions.values())[:3]:
+                message_text += f"• {suggestion}\n"
+        message_text += f"\n⚡ Выберите действие:"
+        return message_text
+    
+    def _new_post_messages(self, chat_id: int, post_data: Dict) -> List[Dict]:
+        """Сообщения уведомления для очереди: текст поста и отдельно клавиатура действий"""
+        from keyboards import get_new_post_keyboard
+        
+        return [
+            {'chat_id': chat_id, 'text': self._build_new_post_message(post_data)},
+            {
+                'chat_id': chat_id,
+                'text': "🎛 <b>Действия с постом:</b>",
+                'reply_markup': get_new_post_keyboard(post_data['id'])
+            },
+        ]
+    
     async def send_new_post_to_admin(self, bot, admin_id: int, post_data: Dict):
-        """Отправляет новый найденный пост админу с защитой от flood control"""
+        """Ставит новый найденный пост в очередь отправки админу (лимиты соблюдает очередь)"""
         try:
-            from emoji_config import get_emoji, safe_html_with_emoji
-            from keyboards import get_new_post_keyboard
-            
-            # Проверяем, что бот доступен
-            if not bot:
-                logger.error("Бот не доступен для отправки сообщения")
-                return
-                
-            safe_text = post_data['original_text']
-            safe_source = safe_html_with_emoji(post_data.get('source_name', 'Неизвестно'))
-            safe_url = safe_html_with_emoji(post_data.get('source_url', ''))
-            safe_keywords = safe_html_with_emoji(', '.join(post_data.get('keywords_matched', [])))
-            source_emoji = "📡" if post_data.get('source_type') == 'rss' else "💬"
-            new_emoji = get_emoji("sparkle")
-            message_text = f"{new_emoji} <b>Новый пост найден!</b>\n\n"
-            message_text += f"{source_emoji} <b>Источник:</b> {safe_source}\n"
-            message_text += f"📅 <b>Дата:</b> {post_data.get('source_date', 'Неизвестно')[:19]}\n"
-            message_text += f"🔍 <b>Ключевые слова:</b> {safe_keywords}\n"
-            if safe_url:
-                message_text += f"🔗 <b>Ссылка:</b> {safe_url}\n"
-            message_text += f"\n📝 <b>Исходный текст:</b>\n{safe_text}\n\n"
-            from chatgpt_integration import chatgpt_rewriter
-            suggestions = chatgpt_rewriter.get_rewrite_suggestions(post_data['original_text'])
-            content_type = chatgpt_rewriter._detect_content_type(post_data['original_text'])
-            type_names = {
-                "news": "📰 Новость",
-                "update": "🔄 Обновление", 
-                "airdrop": "🎁 Airdrop",
-                "analysis": "📊 Аналитика"
-            }
-            message_text += f"🎯 <b>Тип:</b> {type_names.get(content_type, '📝 Общий')}\n"
-            if suggestions:
-                message_text += f"💡 <b>Нужно улучшить:</b>\n"
-                for suggestion in list(suggestions.values())[:3]:
-                    message_text += f"• {suggestion}\n"
-            message_text += f"\n⚡ Выберите действие:"
-            
-            # Создаем клавиатуру с кнопками
-            keyboard = get_new_post_keyboard(post_data['id'])
-            
-            # Используем безопасную отправку с защитой от flood control
-            await self.safe_send_message(
-                chat_id=admin_id,
-                text=message_text,
-                parse_mode="HTML"
-            )
-            
-            # Отправляем клавиатуру отдельным сообщением
-            await bot.send_message(
-                chat_id=admin_id,
-                text="🎛 <b>Действия с постом:</b>",
-                parse_mode="HTML",
-                reply_markup=keyboard
-            )
-            
-            logger.info(f"Новый пост отправлен админу: {post_data['id']}")
+            await outbound_queue.enqueue_many(self._new_post_messages(admin_id, post_data))
+            logger.info(f"Новый пост поставлен в очередь для админа: {post_data['id']}")
         except Exception as e:
             logger.error(f"Ошибка отправки поста админу: {e}")
             # Дополнительная отладочная информация
             import traceback
             logger.error(f"Traceback: {traceback.format_exc()}")
 
-    async def _notify_admin_about_new_post(self, draft_id: int):
-        """Уведомляет всех админов о новом найденном посте без задержек"""
+    async def _notify_admin_about_new_post(self, draft_id: int, draft: Optional[Dict] = None):
+        """
+        Уведомляет админов о новом найденном посте.
+        При включенной группировке пост ждет окончания окна и может попасть в общую сводку.
+        """
         try:
-            logger.info(f"Начинаем уведомление о посте #{draft_id}")
-            draft = await db.get_draft_by_id(draft_id)
+            if draft is None:
+                draft = await db.get_draft_by_id(draft_id)
             if not draft:
                 logger.error(f"Черновик #{draft_id} не найден")
                 return
             
-            logger.info(f"Черновик #{draft_id} найден: {draft.get('original_text', '')[:50]}...")
+            window = config.NOTIFY_COALESCE_WINDOW_SECONDS
+            if window <= 0:
+                await self._enqueue_individual_notifications([draft])
+                return
             
-            # Отправляем уведомления всем админам без задержек
-            for user_id in ADMIN_USERS:
-                try:
-                    logger.info(f"Отправляем уведомление админу {user_id} о посте #{draft_id}")
-                    await self.send_new_post_to_admin(self.bot_instance, user_id, draft)
-                    logger.info(f"Уведомление о посте #{draft_id} отправлено админу {user_id}")
-                        
-                except Exception as e:
-                    logger.error(f"Ошибка отправки уведомления админу {user_id}: {e}")
+            self._pending_notifications.append(draft)
+            if not self._notify_flush_task or self._notify_flush_task.done():
+                self._notify_flush_task = asyncio.create_task(self._flush_notifications_later(window))
                     
         except Exception as e:
             logger.error(f"Ошибка отправки уведомления о посте #{draft_id}: {e}")
+    
+    async def _flush_notifications_later(self, window: int):
+        await asyncio.sleep(window)
+        await self.flush_notifications()
+    
+    def _draft_relevance(self, draft: Dict) -> int:
+        """Релевантность поста - число разных ключевых слов (без учета регистра)"""
+        return len({keyword.lower() for keyword in self._draft_keywords(draft)})
+    
+    async def _enqueue_individual_notifications(self, drafts: List[Dict]):
+        messages = []
+        for user_id in ADMIN_USERS:
+            for draft in drafts:
+                messages.extend(self._new_post_messages(user_id, draft))
+        await outbound_queue.enqueue_many(messages)
+        logger.info(f"Уведомления о {len(drafts)} постах поставлены в очередь для {len(ADMIN_USERS)} админов")
+    
+    async def flush_notifications(self):
+        """
+        Отправляет накопленные за окно уведомления.
+        Если постов мало - каждый отдельным сообщением, иначе отдельно только
+        самые релевантные, а остальные одной постраничной сводкой на админа.
+        """
+        drafts, self._pending_notifications = self._pending_notifications, []
+        if not drafts:
+            return
+        try:
+            if len(drafts) < config.NOTIFY_COALESCE_MIN_DRAFTS:
+                await self._enqueue_individual_notifications(drafts)
+                return
+            
+            threshold = config.NOTIFY_RELEVANCE_THRESHOLD
+            individual = [d for d in drafts if self._draft_relevance(d) >= threshold]
+            grouped = [d for d in drafts if self._draft_relevance(d) < threshold]
+            if individual:
+                await self._enqueue_individual_notifications(individual)
+            if not grouped:
+                return
+            
+            # Состав сводки хранится в БД, чтобы листать ее и после перезапуска
+            draft_ids = [draft['id'] for draft in grouped]
+            batch_id = await db.add_notification_batch(draft_ids)
+            text, markup = self.build_notification_summary(batch_id, len(draft_ids), grouped, 1)
+            await outbound_queue.enqueue_many([
+                {'chat_id': user_id, 'text': text, 'reply_markup': markup} for user_id in ADMIN_USERS
+            ])
+            logger.info(f"Сводка #{batch_id}: {len(grouped)} постов одной пачкой для {len(ADMIN_USERS)} админов")
+        except Exception as e:
+            logger.error(f"Ошибка отправки сводки уведомлений: {e}")
+    
+    async def get_notification_batch(self, batch_id: int) -> List[int]:
+        """ID постов сводки"""
+        return await db.get_notification_batch(batch_id)
+    
+    async def prune_notification_batches(self):
+        """Удаляет сводки старше NOTIFY_BATCH_RETENTION_HOURS (не чаще раза в час)"""
+        if self._batches_pruned_at is not None and time.monotonic() - self._batches_pruned_at < 3600:
+            return
+        self._batches_pruned_at = time.monotonic()
+        try:
+            removed = await db.prune_notification_batches(config.NOTIFY_BATCH_RETENTION_HOURS)
+            if removed:
+                logger.info(f"Удалено старых сводок уведомлений: {removed}")
+        except Exception as e:
+            logger.error(f"Ошибка очистки сводок уведомлений: {e}")
+    
+    def build_notification_summary(self, batch_id: int, total: int, page_drafts: List[Dict],
+                                   page: int) -> tuple:
+        """Текст и клавиатура одной страницы сводки новых постов"""
+        from keyboards import get_notification_summary_keyboard
+        
+        page_size = max(1, config.NOTIFY_SUMMARY_PAGE_SIZE)
+        total_pages = max(1, math.ceil(total / page_size))
+        page_drafts = page_drafts[:page_size]
+        
+        text = f"🗂 <b>Найдено новых постов: {total}</b>\n"
+        text += f"📄 Страница {page}/{total_pages}\n\n"
+        for draft in page_drafts:
+            source_emoji = "📡" if draft.get('source_type') == 'rss' else "💬"
+            # Превью без разметки: обрезанный HTML может оказаться невалидным
+            preview = html.unescape(re.sub(r'<[^>]+>', '', draft.get('original_text') or ''))
+            preview = ' '.join(preview.split())
+            if len(preview) > 150:
+                preview = preview[:150] + '...'
+            keywords = ', '.join(self._draft_keywords(draft)[:5])
+            text += f"<b>#{draft['id']}</b> {source_emoji} {html.escape(draft.get('source_name') or 'Неизвестно')}\n"
+            text += f"🔍 {html.escape(keywords)}\n"
+            text += f"<i>{html.escape(preview)}</i>\n\n"
+        
+        markup = get_notification_summary_keyboard(
+            batch_id, [draft['id'] for draft in page_drafts], page, total_pages
+        )
+        return text, markup
 
     async def analyze_channel(self, source_type: str, source_url: str, messages: List[dict]) -> dict:
         """Анализирует канал и собирает статистику"""
@@ -596,12 +1296,7 @@ class ContentMonitor:
         return stats
 
     def _find_matching_keywords(self, text: str) -> List[str]:
-        matched = []
-        text_lower = text.lower()
-        for keyword in self.keywords:
-            if self._keyword_matches(text_lower, keyword.lower()):
-                matched.append(keyword)
-        return matched
+        return self._keyword_matcher.find_all(text)
 
     async def process_telegram_messages(self, channel: str, messages: List[dict]) -> List[dict]:
         new_drafts = []
@@ -1,23 +1,463 @@
 import aiosqlite
 import asyncio
-from typing import List, Dict, Optional
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import List, Dict, Optional, Set, Tuple
 import json
+import logging
+import re
+import time
 from datetime import datetime
 import os
 
+from config import config
+from bloom_filter import ScalableBloomFilter
+
+logger = logging.getLogger(__name__)
+
 # Очищаем переменные окружения от прокси на уровне модуля
 proxy_vars = ['HTTP_PROXY', 'HTTPS_PROXY', 'ALL_PROXY', 'NO_PROXY']
 for var in proxy_vars:
     if var in os.environ:
         del os.environ[var]
 
+# Типы источников мониторинга, для которых БД гарантирует уникальность source_url
+MONITORED_SOURCE_TYPES = ('telegram', 'rss', 'tg')
+MONITORED_SOURCE_TYPES_SQL = ', '.join(f"'{t}'" for t in MONITORED_SOURCE_TYPES)
+
+# Счетчики статистики (таблица stat_counters), которые поддерживают триггеры:
+# имя счетчика, таблица, выражение ключа ({row} - NEW/OLD или имя таблицы), колонки ключа
+STAT_COUNTERS = [
+    ('drafts_status', 'content_drafts', "COALESCE({row}.status, '')", 'status'),
+    ('drafts_source_type', 'content_drafts', "{row}.source_type", 'source_type'),
+    ('drafts_source', 'content_drafts', "{row}.source_type || char(31) || {row}.source_name",
+     'source_type, source_name'),
+    ('drafts_day', 'content_drafts', "COALESCE(DATE({row}.created_at), '')", 'created_at'),
+    ('posts_status', 'pending_posts', "COALESCE({row}.status, '')", 'status'),
+    ('published_total', 'published_posts', "''", None),
+    ('published_day', 'published_posts', "COALESCE(DATE({row}.published_at), '')", 'published_at'),
+]
+
+
+def _counter_rebuild_statements() -> List[str]:
+    """Пересчет всех счетчиков по живым таблицам"""
+    return ['DELETE FROM stat_counters'] + [
+        f"INSERT INTO stat_counters (name, key, value) "
+        f"SELECT '{name}', {key.format(row=table)}, COUNT(*) FROM {table} GROUP BY 2"
+        for name, table, key, _ in STAT_COUNTERS
+    ]
+
+
+def _counter_statements() -> List[str]:
+    """Таблица счетчиков, триггеры на вставку, удаление и изменение ключа, начальный пересчет"""
+    statements = ['''
+        CREATE TABLE IF NOT EXISTS stat_counters (
+            name TEXT NOT NULL,
+            key TEXT NOT NULL,
+            value INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (name, key)
+        ) WITHOUT ROWID
+    ''']
+    for name, table, key, columns in STAT_COUNTERS:
+        increment = (f"INSERT INTO stat_counters (name, key, value) VALUES ('{name}', {key.format(row='NEW')}, 1) "
+                     f"ON CONFLICT(name, key) DO UPDATE SET value = value + 1;")
+        decrement = (f"UPDATE stat_counters SET value = value - 1 "
+                     f"WHERE name = '{name}' AND key = {key.format(row='OLD')};")
+        statements.append(f'CREATE TRIGGER IF NOT EXISTS trg_{name}_insert AFTER INSERT ON {table} '
+                          f'BEGIN {increment} END')
+        statements.append(f'CREATE TRIGGER IF NOT EXISTS trg_{name}_delete AFTER DELETE ON {table} '
+                          f'BEGIN {decrement} END')
+        if columns:
+            statements.append(
+                f'CREATE TRIGGER IF NOT EXISTS trg_{name}_update AFTER UPDATE OF {columns} ON {table} '
+                f'WHEN {key.format(row="OLD")} IS NOT {key.format(row="NEW")} '
+                f'BEGIN {decrement} {increment} END'
+            )
+    return statements + _counter_rebuild_statements()
+
+
+# Какой из черновиков-дубликатов оставить: больше - важнее
+DRAFT_STATUS_PRIORITY = {
+    'published': 6, 'approved': 5, 'processed': 4, 'pending': 3, 'new': 2, 'skipped': 1, 'deleted': 0,
+}
+
+
+async def _create_draft_source_index(db):
+    """
+    Уникальный индекс по (source_type, source_url) для черновиков из мониторинга.
+    Тестовые и демо-черновики (source_type = 'test', 'demo' и т.п.) под него не попадают.
+    
+    Дубликаты, появившиеся до введения индекса, объединяются: остается черновик,
+    на который ссылаются публикации, иначе с самым продвинутым статусом, иначе самый ранний.
+    Ссылки остальных переносятся на него, сами они копируются в removed_duplicate_drafts.
+    """
+    cursor = await db.execute(f'''
+        SELECT d.id, d.source_type, d.source_url, d.status,
+               EXISTS (SELECT 1 FROM published_posts p WHERE p.draft_id = d.id) AS referenced
+        FROM content_drafts d
+        JOIN (
+            SELECT source_type, source_url FROM content_drafts
+            WHERE source_type IN ({MONITORED_SOURCE_TYPES_SQL}) AND source_url IS NOT NULL
+            GROUP BY source_type, source_url
+            HAVING COUNT(*) > 1
+        ) dup ON dup.source_type = d.source_type AND dup.source_url = d.source_url
+    ''')
+    groups: Dict[Tuple[str, str], List] = {}
+    for row in await cursor.fetchall():
+        groups.setdefault((row[1], row[2]), []).append(row)
+    
+    removed: List[Tuple[int, int]] = []
+    for rows in groups.values():
+        keep = max(rows, key=lambda r: (r[4], DRAFT_STATUS_PRIORITY.get(r[3], 0), -r[0]))
+        removed.extend((row[0], keep[0]) for row in rows if row[0] != keep[0])
+    
+    if removed:
+        await db.execute('''
+            CREATE TABLE IF NOT EXISTS removed_duplicate_drafts (
+                id INTEGER PRIMARY KEY,
+                kept_id INTEGER NOT NULL,
+                source_type TEXT,
+                source_name TEXT,
+                source_url TEXT,
+                status TEXT,
+                original_text TEXT,
+                created_at TIMESTAMP,
+                removed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        await db.executemany('''
+            INSERT OR REPLACE INTO removed_duplicate_drafts
+            (id, kept_id, source_type, source_name, source_url, status, original_text, created_at)
+            SELECT id, ?, source_type, source_name, source_url, status, original_text, created_at
+            FROM content_drafts WHERE id = ?
+        ''', [(kept_id, draft_id) for draft_id, kept_id in removed])
+        await db.executemany('UPDATE published_posts SET draft_id = ? WHERE draft_id = ?',
+                             [(kept_id, draft_id) for draft_id, kept_id in removed])
+        await db.executemany('UPDATE draft_sources SET draft_id = ? WHERE draft_id = ?',
+                             [(kept_id, draft_id) for draft_id, kept_id in removed])
+        await db.executemany('DELETE FROM content_drafts WHERE id = ?',
+                             [(draft_id,) for draft_id, _ in removed])
+        logger.warning(
+            f"Объединено дубликатов черновиков: {len(removed)} (копии в removed_duplicate_drafts), "
+            f"удалены ID: {', '.join(str(draft_id) for draft_id, _ in removed)}"
+        )
+    
+    await db.execute(f'''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_content_drafts_source
+        ON content_drafts (source_type, source_url)
+        WHERE source_type IN ({MONITORED_SOURCE_TYPES_SQL})
+    ''')
+
+
+# Версионные миграции схемы: (версия, описание, SQL или корутина f(db)). Номер последней
+# примененной хранится в PRAGMA user_version, каждая миграция выполняется один раз, вместе с init_db
+SCHEMA_MIGRATIONS = [
+    (1, "индексы для выборок по статусу и датам", [
+        # get_content_drafts, get_digest_drafts: статус + сортировка по дате без временной сортировки
+        'CREATE INDEX IF NOT EXISTS idx_content_drafts_status_created ON content_drafts (status, created_at)',
+        # get_recent_draft_signatures: окно по дате создания
+        'CREATE INDEX IF NOT EXISTS idx_content_drafts_created ON content_drafts (created_at)',
+        # get_published_posts_stats, get_last_published_posts: диапазоны и сортировка по published_at
+        'CREATE INDEX IF NOT EXISTS idx_published_posts_published ON published_posts (published_at)',
+        # get_action_logs с фильтром по типу и без него
+        'CREATE INDEX IF NOT EXISTS idx_action_logs_type_created ON action_logs (action_type, created_at)',
+        'CREATE INDEX IF NOT EXISTS idx_action_logs_created ON action_logs (created_at)',
+    ]),
+    (2, "индекс для счетчиков по источникам", [
+        # get_dashboard_stats: группировка по типу и имени источника без чтения текстов черновиков
+        'CREATE INDEX IF NOT EXISTS idx_content_drafts_source_name ON content_drafts (source_type, source_name)',
+    ]),
+    (3, "счетчики статистики на триггерах", _counter_statements()),
+    (4, "индекс проверки известных адресов", [
+        # check_content_exists, get_known_sources: частичный уникальный индекс не подходит
+        # для запросов с типом источника в параметре, нужен обычный
+        'CREATE INDEX IF NOT EXISTS idx_content_drafts_type_url ON content_drafts (source_type, source_url)',
+    ]),
+    # Раньше выполнялось при каждом запуске; на базах, где индекс уже есть, дубликатов нет
+    (5, "уникальность источника черновика", _create_draft_source_index),
+    (6, "сводки уведомлений в отдельной таблице", [
+        # Раньше состав сводки писался в settings ключом notify_batch_<id> и не удалялся
+        '''
+        INSERT OR IGNORE INTO notification_batches (id, draft_ids)
+        SELECT CAST(substr(key, 14) AS INTEGER), value FROM settings
+        WHERE key LIKE 'notify\\_batch\\_%' ESCAPE '\\'
+        ''',
+        "DELETE FROM settings WHERE key LIKE 'notify\\_batch\\_%' ESCAPE '\\'",
+    ]),
+]
+
+# --- Запросы горячих путей ---
+# Методы Database и проверка планов (HOT_QUERIES, tests/test_query_plans.py) используют
+# одни и те же строки, поэтому план проверяется именно у того запроса, что выполняется.
+
+DRAFTS_BY_STATUS_SQL = '''
+    SELECT * FROM content_drafts
+    WHERE status = ?
+    ORDER BY created_at DESC
+    LIMIT ?
+'''
+DIGEST_DRAFTS_SQL = '''
+    SELECT * FROM content_drafts
+    WHERE status = 'new'
+    AND created_at > datetime('now', '-24 hours')
+    ORDER BY created_at DESC
+    LIMIT ?
+'''
+RECENT_SIGNATURES_SQL = '''
+    SELECT id, minhash, CAST(strftime('%s', created_at) AS INTEGER) AS created_ts
+    FROM content_drafts
+    WHERE minhash IS NOT NULL AND created_at >= datetime('now', ?)
+    ORDER BY created_at, id
+'''
+DRAFT_SOURCES_SQL = '''
+    SELECT * FROM draft_sources WHERE draft_id = ? ORDER BY id
+'''
+# Счетчик из stat_counters (поиск по первичному ключу)
+COUNTER_SQL = '''
+    SELECT value FROM stat_counters WHERE name = ? AND key = ?
+'''
+# Публикации за окно: параметр - сдвиг для datetime('now', ?), например '-24 hours'
+PUBLISHED_SINCE_SQL = '''
+    SELECT COUNT(*) FROM published_posts
+    WHERE published_at > datetime('now', ?)
+'''
+# IS NOT NULL дает чтение индекса по диапазону вместо обхода (строк без даты не бывает)
+LAST_PUBLISHED_SQL = '''
+    SELECT * FROM published_posts
+    WHERE published_at IS NOT NULL
+    ORDER BY published_at DESC
+    LIMIT ?
+'''
+ACTION_LOGS_BY_TYPE_SQL = '''
+    SELECT * FROM action_logs
+    WHERE action_type = ?
+    ORDER BY created_at DESC
+    LIMIT ?
+'''
+ACTION_LOGS_SQL = '''
+    SELECT * FROM action_logs
+    WHERE created_at IS NOT NULL
+    ORDER BY created_at DESC
+    LIMIT ?
+'''
+# Проверка известных адресов среди черновиков и их дополнительных источников
+CONTENT_EXISTS_SQL = '''
+    SELECT id FROM content_drafts
+    WHERE source_type = ? AND source_url = ?
+    UNION ALL
+    SELECT id FROM draft_sources
+    WHERE source_type = ? AND source_url = ?
+    LIMIT 1
+'''
+# Пачка адресов одного типа источника (параметры: тип, адреса, тип, адреса)
+KNOWN_SOURCES_CHUNK = 400
+
+
+def known_sources_sql(count: int) -> str:
+    """Запрос известных адресов из count штук одного типа источника"""
+    placeholders = ', '.join('?' for _ in range(count))
+    return f'''
+        SELECT source_url FROM content_drafts WHERE source_type = ? AND source_url IN ({placeholders})
+        UNION ALL
+        SELECT source_url FROM draft_sources WHERE source_type = ? AND source_url IN ({placeholders})
+    '''
+
+
+# Горячие запросы для проверки планов: имя, SQL, пример параметров.
+# Ни один не должен читать таблицу целиком (SCAN) или сортировать во временном дереве
+HOT_QUERIES = [
+    ('get_content_drafts', DRAFTS_BY_STATUS_SQL, ('new', 50)),
+    ('get_digest_drafts', DIGEST_DRAFTS_SQL, (5,)),
+    ('get_recent_draft_signatures', RECENT_SIGNATURES_SQL, ('-259200 seconds',)),
+    ('get_draft_sources', DRAFT_SOURCES_SQL, (1,)),
+    ('get_published_posts_stats_total', COUNTER_SQL, ('published_total', '')),
+    ('get_published_posts_stats_window', PUBLISHED_SINCE_SQL, ('-24 hours',)),
+    ('get_last_published_posts', LAST_PUBLISHED_SQL, (10,)),
+    ('get_action_logs', ACTION_LOGS_BY_TYPE_SQL, ('publish', 50)),
+    ('get_action_logs_all', ACTION_LOGS_SQL, (50,)),
+    ('check_content_exists', CONTENT_EXISTS_SQL, ('tg', 'https://t.me/c/1', 'tg', 'https://t.me/c/1')),
+    ('get_known_sources', known_sources_sql(3), ('tg', 'a', 'b', 'c', 'tg', 'a', 'b', 'c')),
+]
+
+# Полнотекстовый поиск (FTS5, внешнее содержимое): таблица, индекс, колонка текста
+SEARCH_INDEXES = [
+    ('content_drafts', 'content_drafts_fts', 'original_text'),
+    ('published_posts', 'published_posts_fts', 'published_text'),
+]
+# Маркеры найденных слов во фрагменте (заменяются на разметку после экранирования)
+SNIPPET_START = '\x02'
+SNIPPET_END = '\x03'
+
+_SEARCH_TOKEN_RE = re.compile(r'"([^"]+)"|(\w+)(\*?)')
+_SEARCH_WORD_RE = re.compile(r'\w+')
+
+
+def _search_terms(query: str) -> List[Tuple[str, bool]]:
+    """Слова и фразы запроса: (текст, префиксный ли поиск). Кавычки - фраза, слово* - префикс"""
+    terms = []
+    for phrase, word, star in _SEARCH_TOKEN_RE.findall(query or ''):
+        if phrase:
+            words = _SEARCH_WORD_RE.findall(phrase)
+            if words:
+                terms.append((' '.join(words), False))
+        elif word:
+            terms.append((word, bool(star)))
+    return terms
+
+
+def _fts_query(terms: List[Tuple[str, bool]]) -> str:
+    """Запрос FTS5 из слов пользователя: каждое слово в кавычках, операторы FTS5 не пропускаются"""
+    return ' '.join(f'"{text}"' + ('*' if prefix else '') for text, prefix in terms)
+
+
+# Соединение открытой транзакции текущей задачи (вложенные записи идут в нее же)
+_current_transaction: ContextVar[Optional[aiosqlite.Connection]] = ContextVar(
+    '_current_transaction', default=None
+)
+
 class Database:
-    def __init__(self, db_path: str = "bot.db"):
+    """
+    Доступ к SQLite через долгоживущий пул соединений:
+    одно соединение на запись (запись сериализуется блокировкой)
+    и несколько соединений на чтение (WAL позволяет читать параллельно с записью).
+    Соединения открываются один раз и закрываются в close().
+    """
+    
+    def __init__(self, db_path: str = "bot.db", read_pool_size: int = None):
         self.db_path = db_path
+        self.read_pool_size = max(1, read_pool_size or config.DB_READ_POOL_SIZE)
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._readers: List[aiosqlite.Connection] = []
+        self._reader_queue: Optional[asyncio.Queue] = None
+        self._write_lock: Optional[asyncio.Lock] = None
+        self._open_lock: Optional[asyncio.Lock] = None
+        # Фильтр Блума уже известных (source_type, source_url): "точно новый" без запроса к БД
+        self.seen_sources = ScalableBloomFilter(config.SEEN_SOURCES_CAPACITY, config.SEEN_SOURCES_ERROR_RATE)
+        self.seen_sources_stats = {'lookups': 0, 'negatives': 0, 'confirmed': 0, 'false_positives': 0}
+        # Кэш таблицы settings: ключ -> (значение или None, время загрузки; None - перечитать)
+        self._settings: Dict[str, Tuple[Optional[str], float]] = {}
+        self._settings_loaded_at: Optional[float] = None
+        self._dirty_settings: Dict[str, str] = {}
+        self._settings_flush_task: Optional[asyncio.Task] = None
+        self.settings_stats = {'hits': 0, 'misses': 0, 'writes': 0, 'flushes': 0}
+        # FTS5 доступен в сборке SQLite (иначе поиск через LIKE)
+        self.fts_enabled = False
+    
+    @property
+    def is_open(self) -> bool:
+        return self._writer is not None
+    
+    async def _connect(self, read_only: bool = False) -> aiosqlite.Connection:
+        """Открывает соединение и применяет настройки производительности"""
+        conn = await aiosqlite.connect(self.db_path)
+        conn.row_factory = aiosqlite.Row
+        await conn.execute('PRAGMA synchronous = NORMAL')
+        await conn.execute(f'PRAGMA cache_size = {-config.DB_CACHE_SIZE_KB}')
+        await conn.execute(f'PRAGMA mmap_size = {config.DB_MMAP_SIZE_MB * 1024 * 1024}')
+        await conn.execute('PRAGMA temp_store = MEMORY')
+        await conn.execute(f'PRAGMA busy_timeout = {config.DB_BUSY_TIMEOUT_MS}')
+        if read_only:
+            await conn.execute('PRAGMA query_only = ON')
+        return conn
+    
+    async def open(self):
+        """Открывает пул соединений (повторный вызов ничего не делает)"""
+        if self._open_lock is None:
+            self._open_lock = asyncio.Lock()
+        async with self._open_lock:
+            if self._writer is not None:
+                return
+            writer = await aiosqlite.connect(self.db_path)
+            # WAL сохраняется в файле БД, достаточно включить один раз
+            await writer.execute('PRAGMA journal_mode = WAL')
+            await writer.close()
+            
+            self._writer = await self._connect()
+            self._readers = [await self._connect(read_only=True) for _ in range(self.read_pool_size)]
+            self._reader_queue = asyncio.Queue()
+            for reader in self._readers:
+                self._reader_queue.put_nowait(reader)
+            self._write_lock = asyncio.Lock()
+            logger.info(f"БД {self.db_path}: открыт пул (1 запись, {self.read_pool_size} чтение)")
+    
+    async def close(self):
+        """Закрывает все соединения пула"""
+        if self._writer is None:
+            return
+        if self._settings_flush_task and not self._settings_flush_task.done():
+            self._settings_flush_task.cancel()
+        await self.flush_settings()
+        async with self._write_lock:
+            writer, self._writer = self._writer, None
+            readers, self._readers = self._readers, []
+            self._reader_queue = None
+            for conn in readers + [writer]:
+                try:
+                    await conn.close()
+                except Exception as e:
+                    logger.error(f"Ошибка закрытия соединения с БД: {e}")
+        logger.info(f"БД {self.db_path}: пул соединений закрыт")
+    
+    @asynccontextmanager
+    async def _read(self):
+        """Соединение для чтения из пула"""
+        transaction_conn = _current_transaction.get()
+        if transaction_conn is not None:
+            # Внутри транзакции читаем тем же соединением, чтобы видеть свои изменения
+            yield transaction_conn
+            return
+        if self._writer is None:
+            await self.open()
+        queue = self._reader_queue
+        conn = await queue.get()
+        try:
+            yield conn
+        finally:
+            queue.put_nowait(conn)
+    
+    @asynccontextmanager
+    async def _write(self):
+        """Соединение для записи: фиксирует изменения при выходе (или входит в открытую транзакцию)"""
+        if _current_transaction.get() is not None:
+            yield _current_transaction.get()
+            return
+        async with self.transaction() as conn:
+            yield conn
+    
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        Группирует несколько операций записи в одну транзакцию:
+        
+            async with db.transaction():
+                await db.update_draft_status(...)
+                await db.log_action(...)
+        
+        Все методы Database, вызванные внутри блока, используют это же соединение.
+        При исключении изменения откатываются.
+        """
+        transaction_conn = _current_transaction.get()
+        if transaction_conn is not None:
+            yield transaction_conn
+            return
+        if self._writer is None:
+            await self.open()
+        async with self._write_lock:
+            conn = self._writer
+            token = _current_transaction.set(conn)
+            try:
+                yield conn
+                await conn.commit()
+            except BaseException:
+                await conn.rollback()
+                raise
+            finally:
+                _current_transaction.reset(token)
         
     async def init_db(self):
         """Инициализация базы данных"""
-        async with aiosqlite.connect(self.db_path) as db:
+        await self.open()
+        async with self._write() as db:
             # Таблица для хранения постов на модерации
             await db.execute('''
                 CREATE TABLE IF NOT EXISTS pending_posts (
@@ -71,9 +511,30 @@ class Database:
                     keywords_matched TEXT,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                     status TEXT DEFAULT 'new',
-                    processed_at TIMESTAMP
+                    processed_at TIMESTAMP,
+                    minhash BLOB
                 )
             ''')
+            await self._add_missing_columns(db, 'content_drafts', {'minhash': 'BLOB'})
+            
+            # Дополнительные источники черновика (репосты той же новости другими каналами)
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS draft_sources (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    draft_id INTEGER NOT NULL,
+                    source_type TEXT NOT NULL,
+                    source_name TEXT NOT NULL,
+                    source_url TEXT,
+                    source_date TIMESTAMP,
+                    similarity REAL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    UNIQUE(source_type, source_url),
+                    FOREIGN KEY (draft_id) REFERENCES content_drafts (id)
+                )
+            ''')
+            await db.execute('''
+                CREATE INDEX IF NOT EXISTS idx_draft_sources_draft ON draft_sources (draft_id)
+            ''')
             
             # Таблица для опубликованных постов
             await db.execute('''
@@ -137,12 +598,393 @@ class Database:
                 )
             ''')
             
-            await db.commit()
+            # Состояние источников мониторинга (контрольные точки опроса)
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS source_state (
+                    source_key TEXT PRIMARY KEY,
+                    source_type TEXT NOT NULL,
+                    source_url TEXT NOT NULL,
+                    last_message_id INTEGER,
+                    last_check TIMESTAMP,
+                    etag TEXT,
+                    last_modified TEXT,
+                    error_count INTEGER DEFAULT 0,
+                    next_due_at TIMESTAMP,
+                    post_rate REAL,
+                    match_yield REAL,
+                    content_hash TEXT,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            # Колонки, добавленные после создания таблицы
+            await self._add_missing_columns(db, 'source_state', {
+                'post_rate': 'REAL',
+                'match_yield': 'REAL',
+                'content_hash': 'TEXT',
+            })
+            
+            # Очередь исходящих сообщений бота (недоставленное переживает перезапуск)
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS outbound_queue (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    chat_id INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    parse_mode TEXT,
+                    reply_markup TEXT,
+                    attempts INTEGER DEFAULT 0,
+                    priority INTEGER DEFAULT 0,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            await self._add_missing_columns(db, 'outbound_queue', {
+                'priority': 'INTEGER DEFAULT 0',
+            })
+            
+            # Догрузка истории каналов: контрольная точка после каждой страницы
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS backfill_jobs (
+                    channel TEXT PRIMARY KEY,
+                    direction TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    cursor_id INTEGER,
+                    high_id INTEGER,
+                    stop_id INTEGER DEFAULT 0,
+                    pages INTEGER DEFAULT 0,
+                    fetched INTEGER DEFAULT 0,
+                    added INTEGER DEFAULT 0,
+                    error_count INTEGER DEFAULT 0,
+                    error TEXT,
+                    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # Состав сводок уведомлений (листание после перезапуска), старые удаляет мониторинг
+            await db.execute('''
+                CREATE TABLE IF NOT EXISTS notification_batches (
+                    id INTEGER PRIMARY KEY,
+                    draft_ids TEXT NOT NULL,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            await db.execute(
+                'CREATE INDEX IF NOT EXISTS idx_notification_batches_created ON notification_batches (created_at)'
+            )
+            
+            await self._apply_schema_migrations(db)
+            await self._migrate_source_state(db)
+            await self._load_seen_sources(db)
+            await self._load_settings(db)
+            await self._create_search_index(db)
+    
+    async def _apply_schema_migrations(self, db):
+        """Применяет миграции SCHEMA_MIGRATIONS новее PRAGMA user_version"""
+        cursor = await db.execute('PRAGMA user_version')
+        current = (await cursor.fetchone())[0]
+        for version, description, statements in SCHEMA_MIGRATIONS:
+            if version <= current:
+                continue
+            if callable(statements):
+                await statements(db)
+            else:
+                for statement in statements:
+                    await db.execute(statement)
+            # user_version пишется в той же транзакции, что и сама миграция
+            await db.execute(f'PRAGMA user_version = {int(version)}')
+            logger.info(f"Схема БД: миграция {version} ({description})")
+        if SCHEMA_MIGRATIONS and SCHEMA_MIGRATIONS[-1][0] > current:
+            await db.execute('ANALYZE')
+    
+    async def explain_hot_queries(self) -> List[Dict]:
+        """
+        Планы горячих запросов (HOT_QUERIES). full_scan - запрос обходит таблицу или индекс целиком,
+        temp_sort - сортирует результат во временном дереве вместо чтения по индексу.
+        """
+        results = []
+        async with self._read() as db:
+            for name, sql, params in HOT_QUERIES:
+                cursor = await db.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = [row[3] for row in await cursor.fetchall()]
+                results.append({
+                    'name': name,
+                    'plan': plan,
+                    'full_scan': any(step.startswith('SCAN ') for step in plan),
+                    'temp_sort': any('TEMP B-TREE' in step for step in plan),
+                })
+        return results
+    
+    async def check_query_plans(self) -> List[str]:
+        """Горячие запросы без индекса (пишется в лог при запуске)"""
+        try:
+            problems = [
+                plan['name'] for plan in await self.explain_hot_queries()
+                if plan['full_scan'] or plan['temp_sort']
+            ]
+        except Exception as e:
+            logger.error(f"Ошибка проверки планов запросов: {e}")
+            return []
+        if problems:
+            logger.warning(f"Запросы без подходящего индекса: {', '.join(problems)}")
+        return problems
+    
+    async def _create_search_index(self, db):
+        """
+        Индексы FTS5 по текстам черновиков и публикаций. Триггеры держат их в согласии
+        с таблицами; при первом создании индекс заполняется из существующих строк.
+        """
+        try:
+            for table, index, column in SEARCH_INDEXES:
+                cursor = await db.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (index,)
+                )
+                exists = await cursor.fetchone() is not None
+                await db.execute(f'''
+                    CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5(
+                        {column}, content='{table}', content_rowid='id',
+                        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+                    )
+                ''')
+                insert = f"INSERT INTO {index} (rowid, {column}) VALUES (NEW.id, NEW.{column});"
+                delete = (f"INSERT INTO {index} ({index}, rowid, {column}) "
+                          f"VALUES ('delete', OLD.id, OLD.{column});")
+                await db.execute(f'CREATE TRIGGER IF NOT EXISTS trg_{index}_insert '
+                                 f'AFTER INSERT ON {table} BEGIN {insert} END')
+                await db.execute(f'CREATE TRIGGER IF NOT EXISTS trg_{index}_delete '
+                                 f'AFTER DELETE ON {table} BEGIN {delete} END')
+                await db.execute(f'CREATE TRIGGER IF NOT EXISTS trg_{index}_update '
+                                 f'AFTER UPDATE OF {column} ON {table} BEGIN {delete} {insert} END')
+                if not exists:
+                    await db.execute(f"INSERT INTO {index} ({index}) VALUES ('rebuild')")
+                    logger.info(f"Поиск: построен индекс {index}")
+            self.fts_enabled = True
+        except aiosqlite.OperationalError as e:
+            # Сборка SQLite без FTS5: поиск работает через LIKE
+            self.fts_enabled = False
+            logger.warning(f"FTS5 недоступен, поиск без индекса: {e}")
+    
+    async def _load_seen_sources(self, db):
+        """Заполняет фильтр Блума адресами всех черновиков и их дополнительных источников"""
+        self.seen_sources.clear()
+        for table in ('content_drafts', 'draft_sources'):
+            async with db.execute(
+                f'SELECT source_type, source_url FROM {table} WHERE source_url IS NOT NULL'
+            ) as cursor:
+                async for source_type, source_url in cursor:
+                    self.seen_sources.add(self._source_key(source_type, source_url))
+        logger.info(f"Фильтр известных источников: {len(self.seen_sources)} адресов, "
+                    f"{self.seen_sources.memory_bytes // 1024} КБ")
+    
+    @staticmethod
+    def _source_key(source_type: str, source_url: str) -> str:
+        return f"{source_type}\x1f{source_url}"
+    
+    def _remember_sources(self, pairs):
+        """Добавляет в фильтр Блума адреса новых записей (при откате транзакции лишний адрес безвреден)"""
+        for source_type, source_url in pairs:
+            if source_url:
+                self.seen_sources.add(self._source_key(source_type, source_url))
+    
+    async def _add_missing_columns(self, db, table: str, columns: Dict[str, str]):
+        """Добавляет в существующую таблицу недостающие колонки (имя -> тип)"""
+        cursor = await db.execute(f'PRAGMA table_info({table})')
+        existing = {row[1] for row in await cursor.fetchall()}
+        for name, column_type in columns.items():
+            if name not in existing:
+                await db.execute(f'ALTER TABLE {table} ADD COLUMN {name} {column_type}')
+                logger.info(f"Таблица {table}: добавлена колонка {name}")
+    
+    async def _migrate_source_state(self, db):
+        """
+        Переносит контрольные точки источников из settings
+        (ключи last_message_id_<источник> и last_check_<источник>) в source_state
+        """
+        cursor = await db.execute('''
+            SELECT key, value FROM settings
+            WHERE key LIKE 'last_message_id_%' OR key LIKE 'last_check_%'
+        ''')
+        rows = await cursor.fetchall()
+        if not rows:
+            return
+        
+        states = {}
+        for key, value in rows:
+            if key.startswith('last_message_id_'):
+                source_key, field = key[len('last_message_id_'):], 'last_message_id'
+            else:
+                source_key, field = key[len('last_check_'):], 'last_check'
+            state = states.setdefault(source_key, self.new_source_state(source_key))
+            if not value:
+                continue
+            if field == 'last_message_id':
+                try:
+                    state[field] = int(value)
+                except ValueError:
+                    continue
+            else:
+                state[field] = value
+        
+        await db.executemany('''
+            INSERT INTO source_state (source_key, source_type, source_url, last_message_id, last_check)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(source_key) DO UPDATE SET
+                last_message_id = COALESCE(source_state.last_message_id, excluded.last_message_id),
+                last_check = COALESCE(source_state.last_check, excluded.last_check)
+        ''', [
+            (s['source_key'], s['source_type'], s['source_url'], s['last_message_id'], s['last_check'])
+            for s in states.values()
+        ])
+        await db.execute('''
+            DELETE FROM settings
+            WHERE key LIKE 'last_message_id_%' OR key LIKE 'last_check_%'
+        ''')
+        logger.info(f"Перенесено состояний источников из settings: {len(states)}")
+    
+    @staticmethod
+    def new_source_state(source_key: str) -> Dict:
+        """Пустое состояние источника по ключу вида tg_@channel / rss_<url>"""
+        source_type, _, source_url = source_key.partition('_')
+        return {
+            'source_key': source_key,
+            'source_type': source_type,
+            'source_url': source_url,
+            'last_message_id': None,
+            'last_check': None,
+            'etag': None,
+            'last_modified': None,
+            'error_count': 0,
+            'next_due_at': None,
+            'post_rate': None,
+            'match_yield': None,
+            'content_hash': None,
+        }
+    
+    async def get_all_source_states(self) -> Dict[str, Dict]:
+        """Загружает состояние всех источников одним запросом"""
+        async with self._read() as db:
+            cursor = await db.execute('SELECT * FROM source_state')
+            rows = await cursor.fetchall()
+            return {row['source_key']: dict(row) for row in rows}
+    
+    async def save_source_states(self, states: List[Dict]):
+        """Сохраняет состояния источников одной пакетной записью"""
+        if not states:
+            return
+        async with self._write() as db:
+            await db.executemany('''
+                INSERT INTO source_state
+                (source_key, source_type, source_url, last_message_id, last_check,
+                 etag, last_modified, error_count, next_due_at, post_rate, match_yield,
+                 content_hash, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(source_key) DO UPDATE SET
+                    last_message_id = excluded.last_message_id,
+                    last_check = excluded.last_check,
+                    etag = excluded.etag,
+                    last_modified = excluded.last_modified,
+                    error_count = excluded.error_count,
+                    next_due_at = excluded.next_due_at,
+                    post_rate = excluded.post_rate,
+                    match_yield = excluded.match_yield,
+                    content_hash = excluded.content_hash,
+                    updated_at = CURRENT_TIMESTAMP
+            ''', [
+                (state['source_key'], state['source_type'], state['source_url'],
+                 state.get('last_message_id'), state.get('last_check'),
+                 state.get('etag'), state.get('last_modified'),
+                 state.get('error_count') or 0, state.get('next_due_at'),
+                 state.get('post_rate'), state.get('match_yield'), state.get('content_hash'))
+                for state in states
+            ])
+    
+    async def get_backfill_jobs(self) -> List[Dict]:
+        """Все задачи догрузки истории"""
+        async with self._read() as db:
+            cursor = await db.execute('SELECT * FROM backfill_jobs ORDER BY started_at')
+            return [dict(row) for row in await cursor.fetchall()]
+    
+    async def save_backfill_job(self, job: Dict):
+        """Сохраняет задачу догрузки (контрольная точка после страницы)"""
+        async with self._write() as db:
+            await db.execute('''
+                INSERT INTO backfill_jobs
+                (channel, direction, status, cursor_id, high_id, stop_id, pages, fetched, added,
+                 error_count, error, started_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP), CURRENT_TIMESTAMP)
+                ON CONFLICT(channel) DO UPDATE SET
+                    direction = excluded.direction,
+                    status = excluded.status,
+                    cursor_id = excluded.cursor_id,
+                    high_id = excluded.high_id,
+                    stop_id = excluded.stop_id,
+                    pages = excluded.pages,
+                    fetched = excluded.fetched,
+                    added = excluded.added,
+                    error_count = excluded.error_count,
+                    error = excluded.error,
+                    started_at = excluded.started_at,
+                    updated_at = CURRENT_TIMESTAMP
+            ''', (job['channel'], job['direction'], job['status'], job.get('cursor_id'), job.get('high_id'),
+                  job.get('stop_id') or 0, job.get('pages', 0), job.get('fetched', 0), job.get('added', 0),
+                  job.get('error_count', 0), job.get('error'), job.get('started_at')))
+    
+    async def add_outbound_messages(self, messages: List[Dict]) -> List[int]:
+        """Сохраняет исходящие сообщения очереди отправки, возвращает их ID"""
+        ids = []
+        async with self._write() as db:
+            for message in messages:
+                cursor = await db.execute('''
+                    INSERT INTO outbound_queue (chat_id, text, parse_mode, reply_markup, attempts, priority)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                ''', (message['chat_id'], message['text'], message.get('parse_mode'),
+                      message.get('reply_markup'), message.get('attempts', 0), int(bool(message.get('priority')))))
+                ids.append(cursor.lastrowid)
+        return ids
+    
+    async def get_outbound_messages(self) -> List[Dict]:
+        """Недоставленные сообщения в порядке постановки в очередь"""
+        async with self._read() as db:
+            cursor = await db.execute('SELECT * FROM outbound_queue ORDER BY id')
+            rows = await cursor.fetchall()
+            return [dict(row) for row in rows]
+    
+    async def delete_outbound_message(self, message_id: int):
+        """Удаляет доставленное (или отброшенное) сообщение из очереди"""
+        async with self._write() as db:
+            await db.execute('DELETE FROM outbound_queue WHERE id = ?', (message_id,))
+    
+    async def update_outbound_attempts(self, message_id: int, attempts: int):
+        """Сохраняет число неудачных попыток отправки"""
+        async with self._write() as db:
+            await db.execute('UPDATE outbound_queue SET attempts = ? WHERE id = ?', (attempts, message_id))
+    
+    async def add_notification_batch(self, draft_ids: List[int]) -> int:
+        """Сохраняет состав сводки уведомлений, возвращает ее ID"""
+        async with self._write() as db:
+            cursor = await db.execute(
+                'INSERT INTO notification_batches (draft_ids) VALUES (?)', (json.dumps(draft_ids),)
+            )
+            return cursor.lastrowid
+    
+    async def get_notification_batch(self, batch_id: int) -> List[int]:
+        """ID постов сводки (пустой список, если сводка не найдена или уже удалена)"""
+        async with self._read() as db:
+            cursor = await db.execute('SELECT draft_ids FROM notification_batches WHERE id = ?', (batch_id,))
+            row = await cursor.fetchone()
+            return json.loads(row[0]) if row else []
+    
+    async def prune_notification_batches(self, retention_hours: float) -> int:
+        """Удаляет сводки старше retention_hours часов, возвращает число удаленных"""
+        async with self._write() as db:
+            cursor = await db.execute(
+                "DELETE FROM notification_batches WHERE created_at < datetime('now', ?)",
+                (f'-{retention_hours} hours',)
+            )
+            return cursor.rowcount
     
     async def get_content_drafts_count(self) -> int:
         """Получает количество черновиков"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._read() as db:
                 cursor = await db.execute('SELECT COUNT(*) FROM content_drafts')
                 result = await cursor.fetchone()
                 return result[0] if result else 0
@@ -150,47 +992,131 @@ class Database:
             logger.error(f"Ошибка подсчета черновиков: {e}")
             return 0
 
+    # --- Кэш настроек ---
+    #
+    # Таблица settings целиком загружается в память в init_db, чтение - поиск в словаре.
+    # Запись сразу меняет кэш, а в SQLite уходит пачкой через SETTINGS_FLUSH_DELAY_MS
+    # (внутри транзакции - сразу, вместе с ней). SETTINGS_CACHE_TTL_SECONDS > 0 заставляет
+    # перечитывать из БД значения, которые могли измениться в обход бота.
+    
+    async def _load_settings(self, db):
+        """Загружает все настройки в кэш"""
+        now = time.monotonic()
+        cursor = await db.execute('SELECT key, value FROM settings')
+        self._settings = {key: (value, now) for key, value in await cursor.fetchall()}
+        self._settings.update({key: (value, now) for key, value in self._dirty_settings.items()})
+        self._settings_loaded_at = now
+        logger.info(f"Кэш настроек: загружено {len(self._settings)} значений")
+    
+    def _settings_fresh(self, loaded_at: Optional[float]) -> bool:
+        if loaded_at is None:
+            return False
+        ttl = config.SETTINGS_CACHE_TTL_SECONDS
+        return ttl <= 0 or time.monotonic() - loaded_at < ttl
+    
     async def get_setting(self, key: str) -> Optional[str]:
         """Получает значение настройки по ключу"""
+        cached = self._settings.get(key)
+        if key in self._dirty_settings or (cached and self._settings_fresh(cached[1])):
+            self.settings_stats['hits'] += 1
+            return cached[0] if cached else None
+        if cached is None and self._settings_fresh(self._settings_loaded_at):
+            # Все настройки загружены при старте - ключа просто нет
+            self.settings_stats['hits'] += 1
+            return None
+        
+        self.settings_stats['misses'] += 1
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self._read() as db:
                 cursor = await db.execute(
                     'SELECT value FROM settings WHERE key = ?',
                     (key,)
                 )
                 result = await cursor.fetchone()
-                return result[0] if result else None
+                value = result[0] if result else None
+                if _current_transaction.get() is None:
+                    self._settings[key] = (value, time.monotonic())
+                return value
         except Exception as e:
             logger.error(f"Ошибка получения настройки {key}: {e}")
             return None
     
     async def set_setting(self, key: str, value: str):
         """Устанавливает значение настройки"""
+        self.settings_stats['writes'] += 1
+        in_transaction = _current_transaction.get() is not None
+        if in_transaction or config.SETTINGS_FLUSH_DELAY_MS <= 0:
+            self._dirty_settings.pop(key, None)
+            # Запись в составе транзакции может откатиться: значение перечитается из БД
+            self._settings[key] = (None, None) if in_transaction else (value, time.monotonic())
+            try:
+                async with self._write() as db:
+                    await db.execute(
+                        'INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
+                        (key, value)
+                    )
+            except Exception as e:
+                self._settings[key] = (None, None)
+                logger.error(f"Ошибка установки настройки {key}: {e}")
+            return
+        
+        self._settings[key] = (value, time.monotonic())
+        self._dirty_settings[key] = value
+        if self._settings_flush_task is None or self._settings_flush_task.done():
+            self._settings_flush_task = asyncio.create_task(self._flush_settings_later())
+    
+    async def _flush_settings_later(self):
+        await asyncio.sleep(config.SETTINGS_FLUSH_DELAY_MS / 1000)
+        await self.flush_settings()
+    
+    async def flush_settings(self):
+        """Записывает накопленные изменения настроек одной транзакцией"""
+        if not self._dirty_settings:
+            return
+        pending, self._dirty_settings = self._dirty_settings, {}
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute(
+            async with self._write() as db:
+                await db.executemany(
                     'INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
-                    (key, value)
+                    list(pending.items())
                 )
-                await db.commit()
+            self.settings_stats['flushes'] += 1
         except Exception as e:
-            logger.error(f"Ошибка установки настройки {key}: {e}")
+            # Не теряем изменения: более новые значения, записанные за это время, важнее
+            for key, value in pending.items():
+                self._dirty_settings.setdefault(key, value)
+            logger.error(f"Ошибка записи настроек ({len(pending)} шт.): {e}")
+    
+    def invalidate_settings(self, key: Optional[str] = None):
+        """Сбрасывает кэш настройки (или всех настроек): следующее чтение пойдет в БД"""
+        if key is None:
+            self._settings = {k: v for k, v in self._settings.items() if k in self._dirty_settings}
+            self._settings_loaded_at = None
+        elif key not in self._dirty_settings:
+            self._settings[key] = (None, None)
+    
+    def get_settings_cache_stats(self) -> Dict:
+        """Счетчики кэша настроек (для /bot_status)"""
+        stats = dict(self.settings_stats)
+        lookups = stats['hits'] + stats['misses']
+        stats['size'] = len(self._settings)
+        stats['pending'] = len(self._dirty_settings)
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
 
     async def add_pending_post(self, original_text: str, rewritten_text: str, 
                               source_url: str = None, source_type: str = None) -> int:
         """Добавляет пост на модерацию"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             cursor = await db.execute('''
                 INSERT INTO pending_posts (original_text, rewritten_text, source_url, source_type)
                 VALUES (?, ?, ?, ?)
             ''', (original_text, rewritten_text, source_url, source_type))
-            await db.commit()
             return cursor.lastrowid
     
     async def get_pending_post(self, post_id: int) -> Optional[Dict]:
         """Получает пост на модерации по ID"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self._read() as db:
             cursor = await db.execute('''
                 SELECT * FROM pending_posts WHERE id = ? AND status = 'pending'
             ''', (post_id,))
@@ -199,8 +1125,7 @@ class Database:
     
     async def get_post_by_id(self, post_id: int) -> Optional[Dict]:
         """Получает пост по ID независимо от статуса"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self._read() as db:
             cursor = await db.execute('''
                 SELECT * FROM pending_posts WHERE id = ?
             ''', (post_id,))
@@ -209,31 +1134,28 @@ class Database:
     
     async def update_post_status(self, post_id: int, status: str):
         """Обновляет статус поста"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             await db.execute('''
                 UPDATE pending_posts SET status = ? WHERE id = ?
             ''', (status, post_id))
-            await db.commit()
     
     async def update_post_text(self, post_id: int, new_text: str):
         """Обновляет текст поста"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             await db.execute('''
                 UPDATE pending_posts SET rewritten_text = ? WHERE id = ?
             ''', (new_text, post_id))
-            await db.commit()
     
     async def add_keyword(self, keyword: str):
         """Добавляет ключевое слово"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             await db.execute('''
                 INSERT OR IGNORE INTO keywords (keyword) VALUES (?)
             ''', (keyword.lower(),))
-            await db.commit()
     
     async def get_keywords(self) -> List[str]:
         """Получает все активные ключевые слова"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._read() as db:
             cursor = await db.execute('''
                 SELECT keyword FROM keywords WHERE is_active = TRUE
             ''')
@@ -245,64 +1167,171 @@ class Database:
                                source_date: str = None, keywords_matched: List[str] = None) -> int:
         """Добавляет черновик контента"""
         keywords_str = ','.join(keywords_matched) if keywords_matched else ''
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             cursor = await db.execute('''
                 INSERT INTO content_drafts 
                 (source_type, source_name, original_text, source_url, source_date, keywords_matched)
                 VALUES (?, ?, ?, ?, ?, ?)
             ''', (source_type, source_name, original_text, source_url, source_date, keywords_str))
-            await db.commit()
+            self._remember_sources([(source_type, source_url)])
             return cursor.lastrowid
     
+    async def add_content_drafts(self, drafts: List[Dict]) -> List[Optional[int]]:
+        """
+        Добавляет пачку черновиков одной транзакцией.
+        Дубликаты (тот же source_type + source_url) отбрасываются индексом БД.
+        Возвращает ID в порядке входного списка, None - для отброшенных дубликатов.
+        """
+        if not drafts:
+            return []
+        ids = []
+        async with self._write() as db:
+            for draft in drafts:
+                keywords = draft.get('keywords_matched')
+                keywords_str = ','.join(keywords) if keywords else ''
+                cursor = await db.execute('''
+                    INSERT OR IGNORE INTO content_drafts 
+                    (source_type, source_name, original_text, source_url, source_date, keywords_matched, minhash)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (draft['source_type'], draft['source_name'], draft['original_text'],
+                      draft.get('source_url'), draft.get('source_date'), keywords_str, draft.get('minhash')))
+                ids.append(cursor.lastrowid if cursor.rowcount else None)
+        self._remember_sources((draft['source_type'], draft.get('source_url')) for draft in drafts)
+        return ids
+    
     async def get_content_drafts(self, status: str = 'new', limit: int = 50) -> List[Dict]:
         """Получает черновики контента по статусу"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute('''
-                SELECT * FROM content_drafts 
-                WHERE status = ? 
-                ORDER BY created_at DESC 
-                LIMIT ?
-            ''', (status, limit))
+        async with self._read() as db:
+            cursor = await db.execute(DRAFTS_BY_STATUS_SQL, (status, limit))
             rows = await cursor.fetchall()
             return [dict(row) for row in rows]
     
     async def update_draft_status(self, draft_id: int, status: str):
         """Обновляет статус черновика"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             await db.execute('''
                 UPDATE content_drafts 
                 SET status = ?, processed_at = CURRENT_TIMESTAMP 
                 WHERE id = ?
             ''', (status, draft_id))
-            await db.commit()
     
     async def get_draft_by_id(self, draft_id: int) -> Optional[Dict]:
         """Получает черновик по ID"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self._read() as db:
             cursor = await db.execute('''
                 SELECT * FROM content_drafts WHERE id = ?
             ''', (draft_id,))
             row = await cursor.fetchone()
             return dict(row) if row else None
     
+    async def get_drafts_by_ids(self, draft_ids: List[int]) -> List[Dict]:
+        """Получает черновики по списку ID (в порядке списка)"""
+        if not draft_ids:
+            return []
+        async with self._read() as db:
+            placeholders = ', '.join('?' for _ in draft_ids)
+            cursor = await db.execute(
+                f'SELECT * FROM content_drafts WHERE id IN ({placeholders})', list(draft_ids)
+            )
+            rows = {row['id']: dict(row) for row in await cursor.fetchall()}
+            return [rows[draft_id] for draft_id in draft_ids if draft_id in rows]
+    
     async def check_content_exists(self, source_type: str, source_url: str) -> bool:
-        """Проверяет, существует ли уже контент с таким URL"""
-        async with aiosqlite.connect(self.db_path) as db:
-            cursor = await db.execute('''
-                SELECT id FROM content_drafts 
-                WHERE source_type = ? AND source_url = ?
-            ''', (source_type, source_url))
+        """
+        Проверяет, существует ли уже контент с таким URL (черновик или дополнительный источник).
+        Точно новые адреса отсекает фильтр Блума, в БД проверяются только возможные совпадения.
+        """
+        self.seen_sources_stats['lookups'] += 1
+        if self._source_key(source_type, source_url) not in self.seen_sources:
+            self.seen_sources_stats['negatives'] += 1
+            return False
+        async with self._read() as db:
+            cursor = await db.execute(CONTENT_EXISTS_SQL, (source_type, source_url, source_type, source_url))
             row = await cursor.fetchone()
-            return row is not None
+        self.seen_sources_stats['confirmed' if row else 'false_positives'] += 1
+        return row is not None
+    
+    async def get_known_sources(self, pairs: List[Tuple[str, str]]) -> Set[Tuple[str, str]]:
+        """
+        Какие из пар (source_type, source_url) уже есть среди черновиков и их источников.
+        В БД одним запросом на пачку уходят только пары, которые фильтр Блума считает возможными.
+        """
+        stats = self.seen_sources_stats
+        maybe = []
+        for source_type, source_url in pairs:
+            stats['lookups'] += 1
+            if source_url and self._source_key(source_type, source_url) in self.seen_sources:
+                maybe.append((source_type, source_url))
+            else:
+                stats['negatives'] += 1
+        if not maybe:
+            return set()
+        
+        # Запрос по типу источника: (source_type = ? AND source_url IN ...) идет по индексу
+        urls_by_type: Dict[str, Set[str]] = {}
+        for source_type, source_url in maybe:
+            urls_by_type.setdefault(source_type, set()).add(source_url)
+        known = set()
+        async with self._read() as db:
+            for source_type, type_urls in urls_by_type.items():
+                type_urls = list(type_urls)
+                for start in range(0, len(type_urls), KNOWN_SOURCES_CHUNK):
+                    chunk = type_urls[start:start + KNOWN_SOURCES_CHUNK]
+                    cursor = await db.execute(
+                        known_sources_sql(len(chunk)), [source_type, *chunk, source_type, *chunk]
+                    )
+                    known.update((source_type, row[0]) for row in await cursor.fetchall())
+        result = {pair for pair in maybe if pair in known}
+        stats['confirmed'] += len(result)
+        stats['false_positives'] += len(maybe) - len(result)
+        return result
+    
+    def get_seen_sources_stats(self) -> Dict:
+        """Размер фильтра Блума, расчетная и наблюдаемая доля ложных срабатываний"""
+        stats = {**self.seen_sources.get_stats(), **self.seen_sources_stats}
+        # Доля новых адресов, которые фильтр не смог отсечь
+        new_keys = stats['negatives'] + stats['false_positives']
+        stats['observed_error_rate'] = stats['false_positives'] / new_keys if new_keys else 0.0
+        return stats
+    
+    async def get_recent_draft_signatures(self, hours: float) -> List[Dict]:
+        """MinHash-сигнатуры черновиков за последние hours часов (для LSH-индекса)"""
+        async with self._read() as db:
+            cursor = await db.execute(RECENT_SIGNATURES_SQL, (f'-{int(hours * 3600)} seconds',))
+            return [dict(row) for row in await cursor.fetchall()]
+    
+    async def add_draft_sources(self, sources: List[Dict]) -> int:
+        """
+        Прикрепляет к черновикам дополнительные источники одной транзакцией.
+        Уже известные (тот же source_type + source_url) пропускаются. Возвращает число добавленных.
+        """
+        if not sources:
+            return 0
+        async with self._write() as db:
+            cursor = await db.executemany('''
+                INSERT OR IGNORE INTO draft_sources
+                (draft_id, source_type, source_name, source_url, source_date, similarity)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', [
+                (s['draft_id'], s['source_type'], s['source_name'], s.get('source_url'),
+                 s.get('source_date'), s.get('similarity'))
+                for s in sources
+            ])
+            self._remember_sources((s['source_type'], s.get('source_url')) for s in sources)
+            return max(cursor.rowcount, 0)
+    
+    async def get_draft_sources(self, draft_id: int) -> List[Dict]:
+        """Дополнительные источники черновика в порядке появления"""
+        async with self._read() as db:
+            cursor = await db.execute(DRAFT_SOURCES_SQL, (draft_id,))
+            return [dict(row) for row in await cursor.fetchall()]
     
     async def add_published_post(self, pending_post_id: int = None, draft_id: int = None,
                                 original_text: str = None, published_text: str = None,
                                 source_url: str = None, source_type: str = None,
                                 channel_id: str = None, message_id: int = None) -> int:
         """Добавляет запись об опубликованном посте"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             cursor = await db.execute('''
                 INSERT INTO published_posts 
                 (pending_post_id, draft_id, original_text, published_text, 
@@ -310,28 +1339,20 @@ class Database:
                 VALUES (?, ?, ?, ?, ?, ?, ?, ?)
             ''', (pending_post_id, draft_id, original_text, published_text,
                   source_url, source_type, channel_id, message_id))
-            await db.commit()
             return cursor.lastrowid
     
     async def get_published_posts_stats(self) -> Dict:
         """Получает статистику опубликованных постов"""
-        async with aiosqlite.connect(self.db_path) as db:
-            # Общее количество
-            cursor = await db.execute('SELECT COUNT(*) FROM published_posts')
-            total = (await cursor.fetchone())[0]
+        async with self._read() as db:
+            # Общее количество - из счетчика, который ведут триггеры
+            cursor = await db.execute(COUNTER_SQL, ('published_total', ''))
+            row = await cursor.fetchone()
+            total = row[0] if row else 0
             
-            # За последние 24 часа
-            cursor = await db.execute('''
-                SELECT COUNT(*) FROM published_posts 
-                WHERE published_at > datetime('now', '-24 hours')
-            ''')
+            # За последние 24 часа и 7 дней - по индексу даты публикации
+            cursor = await db.execute(PUBLISHED_SINCE_SQL, ('-24 hours',))
             last_24h = (await cursor.fetchone())[0]
-            
-            # За последние 7 дней
-            cursor = await db.execute('''
-                SELECT COUNT(*) FROM published_posts 
-                WHERE published_at > datetime('now', '-7 days')
-            ''')
+            cursor = await db.execute(PUBLISHED_SINCE_SQL, ('-7 days',))
             last_7d = (await cursor.fetchone())[0]
             
             return {
@@ -344,94 +1365,188 @@ class Database:
                         target_id: int, details: str = None, old_value: str = None, 
                         new_value: str = None) -> int:
         """Записывает действие в лог"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             cursor = await db.execute('''
                 INSERT INTO action_logs 
                 (user_id, action_type, target_type, target_id, details, old_value, new_value)
                 VALUES (?, ?, ?, ?, ?, ?, ?)
             ''', (user_id, action_type, target_type, target_id, details, old_value, new_value))
-            await db.commit()
             return cursor.lastrowid
     
     async def get_action_logs(self, limit: int = 50, action_type: str = None) -> List[Dict]:
         """Получает логи действий"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            
+        async with self._read() as db:
             if action_type:
-                cursor = await db.execute('''
-                    SELECT * FROM action_logs 
-                    WHERE action_type = ?
-                    ORDER BY created_at DESC 
-                    LIMIT ?
-                ''', (action_type, limit))
+                cursor = await db.execute(ACTION_LOGS_BY_TYPE_SQL, (action_type, limit))
             else:
-                cursor = await db.execute('''
-                    SELECT * FROM action_logs 
-                    ORDER BY created_at DESC 
-                    LIMIT ?
-                ''', (limit,))
-            
+                cursor = await db.execute(ACTION_LOGS_SQL, (limit,))
             rows = await cursor.fetchall()
             return [dict(row) for row in rows]
     
-    async def get_comprehensive_stats(self) -> Dict:
-        """Получает расширенную статистику"""
-        async with aiosqlite.connect(self.db_path) as db:
-            stats = {}
-            
-            # Статистика черновиков
-            cursor = await db.execute('SELECT status, COUNT(*) FROM content_drafts GROUP BY status')
-            drafts_stats = await cursor.fetchall()
-            stats['drafts'] = {status: count for status, count in drafts_stats}
-            
-            # Статистика постов
-            cursor = await db.execute('SELECT status, COUNT(*) FROM pending_posts GROUP BY status')
-            posts_stats = await cursor.fetchall()
-            stats['posts'] = {status: count for status, count in posts_stats}
-            
-            # Статистика публикаций
-            cursor = await db.execute('SELECT COUNT(*) FROM published_posts')
-            published_count = (await cursor.fetchone())[0]
-            stats['published_total'] = published_count
-            
-            # Статистика по дням
+    async def get_dashboard_stats(self, top_sources: int = 10) -> Dict:
+        """
+        Все счетчики для /stats, кнопки статистики, /bot_status и дайджеста одним запросом.
+        Итоги по всей истории берутся из stat_counters (их ведут триггеры), поэтому
+        время не зависит от размера таблиц; окна 24 часа / 7 дней считаются по индексам дат.
+        """
+        async with self._read() as db:
             cursor = await db.execute('''
-                SELECT DATE(published_at) as date, COUNT(*) as count 
-                FROM published_posts 
+                SELECT name, key, value FROM stat_counters
+                WHERE name IN ('drafts_status', 'posts_status', 'drafts_source_type',
+                               'drafts_source', 'published_total')
+                OR (name IN ('drafts_day', 'published_day') AND key >= DATE('now', '-7 days'))
+                UNION ALL
+                SELECT 'new_24h', NULL, COUNT(*) FROM content_drafts
+                WHERE status = 'new' AND created_at > datetime('now', '-24 hours')
+                UNION ALL
+                SELECT 'published_24h', NULL, COUNT(*) FROM published_posts
+                WHERE published_at > datetime('now', '-24 hours')
+                UNION ALL
+                SELECT 'published_7d', NULL, COUNT(*) FROM published_posts
                 WHERE published_at > datetime('now', '-7 days')
-                GROUP BY DATE(published_at)
-                ORDER BY date DESC
             ''')
-            daily_stats = await cursor.fetchall()
-            stats['daily_published'] = {date: count for date, count in daily_stats}
+            rows = await cursor.fetchall()
+        
+        counters: Dict[str, Dict] = {}
+        for name, key, value in rows:
+            counters.setdefault(name, {})[key] = value
+        
+        def counter(name: str) -> Dict:
+            return {key: value for key, value in counters.get(name, {}).items() if value}
+        
+        sources = []
+        for key, count in counter('drafts_source').items():
+            source_type, _, source_name = key.partition('\x1f')
+            sources.append({'source_type': source_type, 'source_name': source_name, 'count': count})
+        sources.sort(key=lambda source: source['count'], reverse=True)
+        
+        drafts = counter('drafts_status')
+        posts = counter('posts_status')
+        return {
+            'drafts': drafts,
+            'drafts_total': sum(drafts.values()),
+            'new_24h': counters.get('new_24h', {}).get(None, 0),
+            'posts': posts,
+            'pending': posts.get('pending', 0),
+            'published': {
+                'total': counters.get('published_total', {}).get('', 0),
+                'last_24h': counters.get('published_24h', {}).get(None, 0),
+                'last_7d': counters.get('published_7d', {}).get(None, 0),
+            },
+            'daily_published': dict(sorted(counter('published_day').items(), reverse=True)),
+            'daily_drafts': dict(sorted(counter('drafts_day').items(), reverse=True)),
+            'sources': counter('drafts_source_type'),
+            'top_sources': sources[:top_sources],
+        }
+    
+    async def rebuild_counters(self) -> Dict:
+        """
+        Пересчитывает stat_counters по живым таблицам и сравнивает со старыми значениями.
+        Возвращает число счетчиков и список расхождений (имя, ключ, было, стало).
+        """
+        async with self._write() as db:
+            before = await self._read_counters(db)
+            for statement in _counter_rebuild_statements():
+                await db.execute(statement)
+            after = await self._read_counters(db)
+        
+        mismatches = [
+            {'name': name, 'key': key, 'stored': before.get((name, key), 0), 'actual': after.get((name, key), 0)}
+            for name, key in sorted(set(before) | set(after))
+            if before.get((name, key), 0) != after.get((name, key), 0)
+        ]
+        if mismatches:
+            logger.warning(f"Счетчики статистики: исправлено расхождений {len(mismatches)}")
+        logger.info(f"Счетчики статистики пересчитаны: {len(after)} значений")
+        return {'counters': len(after), 'mismatches': mismatches}
+    
+    @staticmethod
+    async def _read_counters(db) -> Dict[Tuple[str, str], int]:
+        cursor = await db.execute('SELECT name, key, value FROM stat_counters WHERE value != 0')
+        return {(name, key): value for name, key, value in await cursor.fetchall()}
+    
+    async def search_posts(self, query: str, kind: str = 'all', source: str = None,
+                           since: str = None, until: str = None,
+                           limit: int = 10, offset: int = 0) -> List[Dict]:
+        """
+        Поиск по текстам черновиков (kind='drafts'), публикаций ('published') или всех ('all').
+        
+        • слова запроса ищутся все сразу, слово* - по префиксу, "фраза" - подряд;
+        • результаты по релевантности bm25 (без FTS5 - по дате, через LIKE);
+        • source - тип источника (rss/tg/telegram) или часть имени канала / адреса;
+        • since/until - даты ГГГГ-ММ-ДД включительно.
+        
+        В snippet найденные слова обрамлены SNIPPET_START / SNIPPET_END.
+        """
+        terms = _search_terms(query)
+        if not terms:
+            return []
+        
+        parts = []
+        params: List = []
+        for table, index, column in SEARCH_INDEXES:
+            part_kind = 'drafts' if table == 'content_drafts' else 'published'
+            if kind not in ('all', part_kind):
+                continue
+            if part_kind == 'drafts':
+                source_column, date_column, status = 't.source_name', 't.created_at', 't.status'
+            else:
+                source_column, date_column, status = 't.source_url', 't.published_at', "'published'"
             
-            # Статистика источников
-            cursor = await db.execute('''
-                SELECT source_type, COUNT(*) as count 
-                FROM content_drafts 
-                GROUP BY source_type
-            ''')
-            source_stats = await cursor.fetchall()
-            stats['sources'] = {source: count for source, count in source_stats}
+            conditions = []
+            part_params: List = []
+            if self.fts_enabled:
+                select = (f"snippet({index}, 0, '{SNIPPET_START}', '{SNIPPET_END}', '…', 16) AS snippet, "
+                          f"bm25({index}) AS rank")
+                source_sql = f"FROM {index} JOIN {table} t ON t.id = {index}.rowid"
+                conditions.append(f"{index} MATCH ?")
+                part_params.append(_fts_query(terms))
+            else:
+                select = f"substr(t.{column}, 1, 300) AS snippet, 0 AS rank"
+                source_sql = f"FROM {table} t"
+                for text, _ in terms:
+                    conditions.append(f"t.{column} LIKE ? ESCAPE '\\'")
+                    part_params.append(f"%{self._escape_like(text)}%")
+            if source:
+                conditions.append(f"(t.source_type = ? OR {source_column} LIKE ? ESCAPE '\\')")
+                part_params += [source, f"%{self._escape_like(source)}%"]
+            if since:
+                conditions.append(f"{date_column} >= ?")
+                part_params.append(since)
+            if until:
+                conditions.append(f"{date_column} < date(?, '+1 day')")
+                part_params.append(until)
             
-            return stats
+            parts.append(f'''
+                SELECT '{part_kind}' AS kind, t.id AS id, t.source_type AS source_type,
+                       {source_column} AS source, {date_column} AS date, {status} AS status, {select}
+                {source_sql}
+                WHERE {' AND '.join(conditions)}
+            ''')
+            params += part_params
+        if not parts:
+            return []
+        
+        order = 'rank, date DESC' if self.fts_enabled else 'date DESC'
+        sql = f"{' UNION ALL '.join(parts)} ORDER BY {order} LIMIT ? OFFSET ?"
+        async with self._read() as db:
+            cursor = await db.execute(sql, params + [limit, offset])
+            return [dict(row) for row in await cursor.fetchall()]
+    
+    @staticmethod
+    def _escape_like(text: str) -> str:
+        return text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
     
     async def get_last_published_posts(self, limit: int = 10) -> List[Dict]:
         """Получает последние опубликованные посты"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute('''
-                SELECT * FROM published_posts 
-                ORDER BY published_at DESC 
-                LIMIT ?
-            ''', (limit,))
+        async with self._read() as db:
+            cursor = await db.execute(LAST_PUBLISHED_SQL, (limit,))
             rows = await cursor.fetchall()
             return [dict(row) for row in rows]
     
     async def set_digest_time(self, user_id: int, digest_time: str) -> int:
         """Устанавливает время для ежедневного дайджеста"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             # Удаляем старые настройки
             await db.execute('DELETE FROM digest_settings WHERE user_id = ?', (user_id,))
             
@@ -440,13 +1555,11 @@ class Database:
                 INSERT INTO digest_settings (user_id, digest_time)
                 VALUES (?, ?)
             ''', (user_id, digest_time))
-            await db.commit()
             return cursor.lastrowid
     
     async def get_digest_settings(self, user_id: int) -> Optional[Dict]:
         """Получает настройки дайджеста для пользователя"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self._read() as db:
             cursor = await db.execute('''
                 SELECT * FROM digest_settings WHERE user_id = ? AND is_enabled = TRUE
             ''', (user_id,))
@@ -455,61 +1568,49 @@ class Database:
     
     async def update_digest_last_sent(self, user_id: int):
         """Обновляет время последней отправки дайджеста"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             await db.execute('''
                 UPDATE digest_settings 
                 SET last_sent = CURRENT_TIMESTAMP 
                 WHERE user_id = ?
             ''', (user_id,))
-            await db.commit()
     
     async def get_digest_drafts(self, limit: int = 5) -> List[Dict]:
         """Получает черновики для дайджеста (новые за последние 24 часа)"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
-            cursor = await db.execute('''
-                SELECT * FROM content_drafts 
-                WHERE status = 'new' 
-                AND created_at > datetime('now', '-24 hours')
-                ORDER BY created_at DESC 
-                LIMIT ?
-            ''', (limit,))
+        async with self._read() as db:
+            cursor = await db.execute(DIGEST_DRAFTS_SQL, (limit,))
             rows = await cursor.fetchall()
             return [dict(row) for row in rows]
     
     async def disable_digest(self, user_id: int):
         """Отключает дайджест для пользователя"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             await db.execute('''
                 UPDATE digest_settings 
                 SET is_enabled = FALSE 
                 WHERE user_id = ?
             ''', (user_id,))
-            await db.commit()
 
     async def add_source(self, source_type: str, source_url: str) -> int:
         """Добавляет источник (RSS или TG канал)"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             cursor = await db.execute('''
                 INSERT OR IGNORE INTO sources (source_type, source_url, is_active)
                 VALUES (?, ?, TRUE)
             ''', (source_type, source_url))
-            await db.commit()
             return cursor.lastrowid
 
     async def remove_source(self, source_type: str, source_url: str) -> int:
         """Удаляет (деактивирует) источник"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             cursor = await db.execute('''
                 UPDATE sources SET is_active = FALSE WHERE source_type = ? AND source_url = ?
             ''', (source_type, source_url))
-            await db.commit()
             return cursor.rowcount
 
     async def get_sources(self, source_type: str = None, only_active: bool = True) -> list:
         """Получает список источников (RSS или TG)"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self._read() as db:
             query = 'SELECT * FROM sources WHERE 1=1'
             params = []
             if source_type:
@@ -523,7 +1624,7 @@ class Database:
 
     async def update_channel_stats(self, source_type: str, source_url: str, stats_data: dict):
         """Обновляет статистику канала"""
-        async with aiosqlite.connect(self.db_path) as db:
+        async with self._write() as db:
             # Конвертируем словари в JSON для хранения
             if 'most_used_keywords' in stats_data and isinstance(stats_data['most_used_keywords'], dict):
                 stats_data['most_used_keywords'] = json.dumps(stats_data['most_used_keywords'])
@@ -543,12 +1644,10 @@ class Database:
                 updated_at=CURRENT_TIMESTAMP
             ''', [source_type, source_url] + values)
             
-            await db.commit()
 
     async def get_channel_stats(self, source_type: str = None, source_url: str = None) -> List[Dict]:
         """Получает статистику каналов"""
-        async with aiosqlite.connect(self.db_path) as db:
-            db.row_factory = aiosqlite.Row
+        async with self._read() as db:
             
             query = 'SELECT * FROM channel_stats WHERE 1=1'
             params = []
@@ -25,7 +25,7 @@ from config import config, is_admin
 from database import db
 from keyboards import (get_moderation_keyboard, get_admin_menu_keyboard, get_edit_confirmation_keyboard, 
                        get_drafts_keyboard, get_draft_action_keyboard, get_digest_keyboard, get_digest_navigation_keyboard,
-                       get_new_post_keyboard)
+                       get_new_post_keyboard, get_search_results_keyboard)
 from states import ContentModerationStates, AdminStates
 from scheduler import scheduler
 from aiogram import Bot
@@ -149,6 +149,11 @@ async def cmd_help(message: Message):
 /time_debug - диагностика проблем с временем
 /force_monitor - принудительный мониторинг с сбросом времени
 /check_channel @name - проверка конкретного канала
+/backfill [@channel] - догрузка истории каналов (статус или запуск)
+/stories - сюжеты, которые сейчас подхватывают несколько источников
+/rebuild_counters - пересчитать счетчики статистики и сверить с таблицами
+/search слова - поиск по черновикам и публикациям (слово* - по началу слова, "фраза";
+   фильтры: in:drafts|published source:@канал days:7 since:ГГГГ-ММ-ДД until:ГГГГ-ММ-ДД)
 
 <b>Как работает бот (ручной режим):</b>
 1. Мониторит указанные источники в реальном времени
@@ -541,7 +546,7 @@ async def cmd_stats_detailed(message: Message):
         return
     
     try:
-        stats = await db.get_comprehensive_stats()
+        stats = await db.get_dashboard_stats()
         
         text = f"📊 <b>Детальная статистика</b>\n\n"
         
@@ -550,7 +555,9 @@ async def cmd_stats_detailed(message: Message):
         drafts = stats.get('drafts', {})
         text += f"• Новые: {drafts.get('new', 0)}\n"
         text += f"• Обработанные: {drafts.get('processed', 0)}\n"
-        text += f"• Удаленные: {drafts.get('deleted', 0)}\n\n"
+        text += f"• Удаленные: {drafts.get('deleted', 0)}\n"
+        text += f"• Пропущенные: {drafts.get('skipped', 0)}\n"
+        text += f"• Новых за 24 часа: {stats['new_24h']}\n\n"
         
         # Статистика постов
         text += f"📝 <b>Посты на модерации:</b>\n"
@@ -562,7 +569,9 @@ async def cmd_stats_detailed(message: Message):
         
         # Общая статистика публикаций
         text += f"📰 <b>Публикации:</b>\n"
-        text += f"• Всего опубликовано: {stats.get('published_total', 0)}\n\n"
+        published = stats['published']
+        text += f"• Всего опубликовано: {published.get('total', 0)}\n"
+        text += f"• За 24 часа: {published.get('last_24h', 0)}, за 7 дней: {published.get('last_7d', 0)}\n\n"
         
         # Статистика по источникам
         text += f"📡 <b>Источники:</b> {len(config.RSS_SOURCES)} RSS + {len(config.TG_CHANNELS)} Telegram\n"
@@ -570,12 +579,23 @@ async def cmd_stats_detailed(message: Message):
         text += f"📰 <b>RSS категории:</b> Официальные, Новостные, Сообщество, Twitter-прокси\n"
         text += f"📡 <b>TG категории:</b> Официальные, Новостные, Аналитические, Специализированные\n"
         
+        # Больше всего черновиков
+        if stats['top_sources']:
+            text += f"\n🏆 <b>Больше всего черновиков:</b>\n"
+            for source in stats['top_sources'][:5]:
+                text += f"• {safe_html_with_emoji(source['source_name'])}: {source['count']}\n"
+        
         # Статистика по дням
         daily = stats.get('daily_published', {})
         if daily:
             text += f"\n📅 <b>Публикации за неделю:</b>\n"
             for date, count in list(daily.items())[:7]:
                 text += f"• {date}: {count}\n"
+        daily_drafts = stats.get('daily_drafts', {})
+        if daily_drafts:
+            text += f"\n🗓 <b>Черновики за неделю:</b>\n"
+            for date, count in list(daily_drafts.items())[:7]:
+                text += f"• {date}: {count}\n"
         
         await safe_edit_message(message, text, parse_mode="HTML")
         
@@ -583,6 +603,148 @@ async def cmd_stats_detailed(message: Message):
         logger.error(f"Ошибка получения статистики: {e}")
         await safe_edit_message(message, "❌ Ошибка получения статистики", parse_mode="HTML")
 
+@router.message(Command("rebuild_counters"))
+async def cmd_rebuild_counters(message: Message):
+    """Пересчитывает счетчики статистики с нуля и показывает расхождения"""
+    if not is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет прав доступа.")
+        return
+    
+    try:
+        result = await db.rebuild_counters()
+        mismatches = result['mismatches']
+        text = f"🧮 <b>Счетчики статистики пересчитаны</b>\n\n"
+        text += f"• Значений: {result['counters']}\n"
+        if not mismatches:
+            text += "• Расхождений с таблицами нет ✅\n"
+        else:
+            text += f"• Исправлено расхождений: {len(mismatches)}\n\n"
+            for item in mismatches[:20]:
+                key = html_escape.escape(item['key'].replace('\x1f', ' / '))
+                text += f"• {item['name']} [{key}]: было {item['stored']}, стало {item['actual']}\n"
+        
+        await message.answer(text, parse_mode="HTML")
+    except Exception as e:
+        logger.error(f"Ошибка пересчета счетчиков: {e}")
+        await message.answer(f"❌ Ошибка: {e}")
+
+def parse_search_args(args: str) -> dict:
+    """Разбирает аргументы /search: слова запроса и фильтры вида имя:значение"""
+    search = {'query': '', 'kind': 'all', 'source': None, 'since': None, 'until': None}
+    words = []
+    for token in args.split():
+        name, _, value = token.partition(':')
+        name = name.lower()
+        if not value or name not in ('in', 'source', 'days', 'since', 'until'):
+            words.append(token)
+        elif name == 'in':
+            if value not in ('drafts', 'published', 'all'):
+                raise ValueError("in: ожидается drafts, published или all")
+            search['kind'] = value
+        elif name == 'source':
+            search['source'] = value
+        elif name == 'days':
+            since = datetime.now(timezone.utc) - timedelta(days=int(value))
+            search['since'] = since.strftime('%Y-%m-%d')
+        else:
+            search[name] = datetime.strptime(value, '%Y-%m-%d').strftime('%Y-%m-%d')
+    search['query'] = ' '.join(words)
+    return search
+
+async def render_search_page(search: dict, page: int) -> tuple:
+    """Текст и клавиатура одной страницы результатов поиска"""
+    from database import SNIPPET_START, SNIPPET_END
+    
+    page_size = max(1, config.SEARCH_PAGE_SIZE)
+    results = await db.search_posts(
+        search['query'], kind=search['kind'], source=search['source'],
+        since=search['since'], until=search['until'],
+        limit=page_size + 1, offset=(page - 1) * page_size
+    )
+    has_next = len(results) > page_size
+    results = results[:page_size]
+    
+    text = f"🔎 <b>Поиск:</b> {html_escape.escape(search['query'])}"
+    filters = [f"{name}: {search[name]}" for name in ('source', 'since', 'until') if search[name]]
+    if search['kind'] != 'all':
+        filters.insert(0, 'черновики' if search['kind'] == 'drafts' else 'публикации')
+    if filters:
+        text += f"\n<i>{html_escape.escape(', '.join(filters))}</i>"
+    text += f"\nСтраница {page}\n\n"
+    if not results:
+        text += "Ничего не найдено." if page == 1 else "Больше результатов нет."
+    
+    status_icons = {'new': '🆕', 'processed': '✅', 'deleted': '🗑', 'skipped': '⏭', 'published': '📰'}
+    for result in results:
+        snippet = html_escape.escape(' '.join((result['snippet'] or '').split()))
+        snippet = snippet.replace(SNIPPET_START, '<b>').replace(SNIPPET_END, '</b>')
+        label = f"#{result['id']}" if result['kind'] == 'drafts' else f"публикация #{result['id']}"
+        text += (f"{status_icons.get(result['status'], '•')} <b>{label}</b> "
+                 f"{html_escape.escape(result['source'] or result['source_type'] or '')}, "
+                 f"{(result['date'] or '')[:16]}\n{snippet}\n\n")
+    
+    draft_ids = [result['id'] for result in results if result['kind'] == 'drafts']
+    return text, get_search_results_keyboard(draft_ids, page, has_next)
+
+@router.message(Command("search"))
+async def cmd_search(message: Message, state: FSMContext):
+    """Полнотекстовый поиск по черновикам и опубликованным постам"""
+    if not is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет прав доступа.")
+        return
+    
+    args = message.text.split(maxsplit=1)
+    if len(args) < 2:
+        await message.answer(
+            "🔎 <b>Поиск по черновикам и публикациям</b>\n\n"
+            "<code>/search подарки</code> - все слова сразу\n"
+            "<code>/search подар*</code> - по началу слова\n"
+            "<code>/search \"новые подарки\"</code> - фраза целиком\n\n"
+            "Фильтры: <code>in:drafts</code>, <code>in:published</code>, <code>source:@канал</code>, "
+            "<code>days:7</code>, <code>since:2024-06-01</code>, <code>until:2024-06-30</code>",
+            parse_mode="HTML"
+        )
+        return
+    
+    try:
+        search = parse_search_args(args[1])
+    except ValueError as e:
+        await message.answer(f"❌ Неверный фильтр: {html_escape.escape(str(e))}")
+        return
+    if not search['query'].strip():
+        await message.answer("❌ Укажите слова для поиска")
+        return
+    
+    try:
+        # Параметры поиска хранятся в FSM: кнопки листания только передают номер страницы
+        await state.update_data(search=search)
+        text, markup = await render_search_page(search, 1)
+        await message.answer(text, parse_mode="HTML", reply_markup=markup)
+    except Exception as e:
+        logger.error(f"Ошибка поиска: {e}")
+        await message.answer(f"❌ Ошибка поиска: {e}")
+
+@router.callback_query(F.data.startswith("search_page_"))
+async def callback_search_page(callback: CallbackQuery, state: FSMContext):
+    """Листание результатов /search"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("❌ Нет прав доступа", show_alert=True)
+        return
+    
+    search = (await state.get_data()).get('search')
+    if not search:
+        await callback.answer("❌ Поиск устарел, повторите /search", show_alert=True)
+        return
+    
+    try:
+        page = max(1, int(callback.data.split("_")[-1]))
+        text, markup = await render_search_page(search, page)
+        await safe_edit_message(callback, text, parse_mode="HTML", reply_markup=markup)
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Ошибка листания поиска: {e}")
+        await callback.answer("❌ Ошибка поиска", show_alert=True)
+
 @router.message(Command("settings"))
 async def cmd_settings(message: Message):
     """Показывает текущие настройки (только для админа)"""
@@ -731,6 +893,7 @@ async def cmd_setdigest(message: Message, state: FSMContext):
                 if 0 <= hours <= 23 and 0 <= minutes <= 59:
                     # Сохраняем настройки
                     await db.set_digest_time(config.ADMIN_ID, time_str)
+                    await scheduler.reschedule("digest")
                     
                     await safe_edit_message(message,
                         f"⏰ <b>Время дайджеста установлено</b>\n\n"
@@ -746,6 +909,7 @@ async def cmd_setdigest(message: Message, state: FSMContext):
         # Проверяем команду отключения
         if time_str.lower() in ['off', 'отключить', 'disable']:
             await db.disable_digest(config.ADMIN_ID)
+            await scheduler.reschedule("digest")
             await safe_edit_message(message,
                 "🔕 <b>Дайджест отключен</b>\n\n"
                 "Автоматическая рассылка остановлена.",
@@ -834,7 +998,13 @@ async def send_daily_digest(bot: Bot, admin_id: int):
         # Формируем дайджест
         text = f"📰 <b>Ежедневный дайджест</b>\n"
         text += f"📅 {datetime.now().strftime('%d.%m.%Y')}\n\n"
-        text += f"Найдено {len(drafts)} новых потенциальных постов:\n\n"
+        stats = await db.get_dashboard_stats()
+        text += f"Найдено {stats['new_24h']} новых потенциальных постов"
+        if stats['new_24h'] > len(drafts):
+            text += f", ниже последние {len(drafts)}"
+        text += ":\n\n"
+        text += (f"📊 Ждут разбора: {stats['drafts'].get('new', 0)}, на модерации: {stats['pending']}, "
+                 f"опубликовано за 24 часа: {stats['published'].get('last_24h', 0)}\n\n")
         
         # Отправляем заголовок дайджеста
         await bot.send_message(
@@ -1614,25 +1784,19 @@ async def callback_stats(callback: CallbackQuery):
         return
     
     try:
-        # Статистика публикаций
-        pub_stats = await db.get_published_posts_stats()
-        
-        # Статистика черновиков
-        drafts_new = await db.get_content_drafts(status='new', limit=1000)
-        drafts_processed = await db.get_content_drafts(status='processed', limit=1000)
-        
-        # Статистика постов на модерации
-        pending_posts = await db.get_content_drafts(status='pending', limit=1000)
+        # Все счетчики одним запросом (без загрузки самих черновиков)
+        stats = await db.get_dashboard_stats()
+        pub_stats = stats['published']
         
         text = f"�� <b>Статистика бота</b>\n\n"
         text += f"📰 <b>Опубликованные посты:</b>\n"
-        text += f"• Всего: {pub_stats['total']}\n"
-        text += f"• За 24 часа: {pub_stats['last_24h']}\n"
-        text += f"• За 7 дней: {pub_stats['last_7d']}\n\n"
+        text += f"• Всего: {pub_stats.get('total', 0)}\n"
+        text += f"• За 24 часа: {pub_stats.get('last_24h', 0)}\n"
+        text += f"• За 7 дней: {pub_stats.get('last_7d', 0)}\n\n"
         text += f"📋 <b>Черновики:</b>\n"
-        text += f"• Новые: {len(drafts_new)}\n"
-        text += f"• Обработанные: {len(drafts_processed)}\n\n"
-        text += f"⏳ <b>На модерации:</b> {len(pending_posts)}\n\n"
+        text += f"• Новые: {stats['drafts'].get('new', 0)}\n"
+        text += f"• Обработанные: {stats['drafts'].get('processed', 0)}\n\n"
+        text += f"⏳ <b>На модерации:</b> {stats['pending']}\n\n"
         text += f"🔄 <b>Мониторинг:</b> Каждые {config.MONITORING_INTERVAL_MINUTES} минут\n"
         text += f"📡 <b>Источники:</b> {len(config.RSS_SOURCES)} RSS + {len(config.TG_CHANNELS)} Telegram\n"
         text += f"🔍 <b>Ключевые слова:</b> {len(config.KEYWORDS)} слов\n"
@@ -1801,6 +1965,9 @@ async def cmd_set_monitoring_interval(message: Message):
     config.RSS_CHECK_INTERVAL_MINUTES = rss_interval
     config.TG_CHECK_INTERVAL_MINUTES = tg_interval
     
+    # Будим планировщик, чтобы следующий цикл считался уже по новому интервалу
+    await scheduler.reschedule("monitoring")
+    
     success_emoji = get_emoji("check")
     rocket_emoji = get_emoji("airplane")
     
@@ -2600,6 +2767,13 @@ async def callback_new_post_details(callback: CallbackQuery):
     if draft.get('source_url'):
         details_text += f"🔗 <b>Ссылка:</b> {safe_html_with_emoji(draft['source_url'])}\n"
     
+    # Репосты той же новости другими каналами
+    extra_sources = await db.get_draft_sources(draft_id)
+    if extra_sources:
+        details_text += f"🔁 <b>Также опубликовано ({len(extra_sources)}):</b>\n"
+        for source in extra_sources[:10]:
+            details_text += f"• {safe_html_with_emoji(source['source_name'])}: {safe_html_with_emoji(source['source_url'] or '')}\n"
+    
     details_text += f"\n📝 <b>Полный текст:</b>\n<i>{safe_html_with_emoji(draft['original_text'])}</i>\n\n"
     
     # Технический анализ
@@ -2642,6 +2816,32 @@ async def callback_new_post_skip(callback: CallbackQuery):
         parse_mode="HTML"
     )
 
+@router.callback_query(F.data.startswith("notify_page_"))
+async def callback_notify_page(callback: CallbackQuery):
+    """Листание сводки новых постов"""
+    if not is_admin(callback.from_user.id):
+        await callback.answer("❌ Нет прав доступа", show_alert=True)
+        return
+    
+    from content_monitor import content_monitor
+    
+    _, _, batch_id, page = callback.data.split("_")
+    batch_id, page = int(batch_id), int(page)
+    
+    draft_ids = await content_monitor.get_notification_batch(batch_id)
+    if not draft_ids:
+        await callback.answer("❌ Сводка не найдена", show_alert=True)
+        return
+    
+    page_size = max(1, config.NOTIFY_SUMMARY_PAGE_SIZE)
+    total_pages = max(1, -(-len(draft_ids) // page_size))
+    page = min(max(1, page), total_pages)
+    page_drafts = await db.get_drafts_by_ids(draft_ids[(page - 1) * page_size:page * page_size])
+    
+    text, markup = content_monitor.build_notification_summary(batch_id, len(draft_ids), page_drafts, page)
+    await safe_edit_message(callback, text, parse_mode="HTML", reply_markup=markup)
+    await callback.answer()
+
 @router.message(Command("test_clean"))
 async def cmd_test_clean(message: Message):
     """Тестирование улучшенной системы очистки текста (только для админа)"""
@@ -2944,7 +3144,12 @@ async def cmd_add_tg(message: Message):
     channel = args[1].strip()
     from database import db
     await db.add_source("tg", channel)
-    await message.answer(f"✅ TG канал добавлен: {channel}")
+    
+    # История канала догружается отдельной задачей с контрольными точками
+    from backfill import backfill_manager
+    await backfill_manager.start_jobs([channel])
+    await scheduler.reschedule("backfill")
+    await message.answer(f"✅ TG канал добавлен: {channel}\n📥 История канала будет догружена в фоне (/backfill)")
 
 @router.message(Command("remove_tg"))
 async def cmd_remove_tg(message: Message):
@@ -3087,20 +3292,22 @@ async def cmd_reset_checks(message: Message):
         
         status_text = "🔄 <b>Сброс проверок</b>\n\n"
         
-        # Сбрасываем время проверки для всех источников
-        for channel in config.TG_CHANNELS:
-            await db.set_setting(f"last_check_tg_{channel}", 
-                               (datetime.now(timezone.utc) - timedelta(hours=48)).isoformat())
-            # Сбрасываем ID сообщений для Telegram
-            await db.set_setting(f"last_message_id_tg_{channel}", "")
-        
-        for rss_url in config.RSS_SOURCES:
-            await db.set_setting(f"last_check_rss_{rss_url}", 
-                               (datetime.now(timezone.utc) - timedelta(hours=48)).isoformat())
+        # Сбрасываем время проверки для всех источников и ID сообщений для Telegram
+        reset_time = datetime.now(timezone.utc) - timedelta(hours=48)
+        await content_monitor.reset_source_states(
+            [f"tg_{channel}" for channel in config.TG_CHANNELS],
+            reset_message_ids=True, last_check=reset_time
+        )
+        from backfill import backfill_manager
+        await backfill_manager.start_jobs(config.TG_CHANNELS)
+        await scheduler.reschedule("backfill")
+        await content_monitor.reset_source_states(
+            [f"rss_{rss_url}" for rss_url in config.RSS_SOURCES], last_check=reset_time
+        )
         
         status_text += f"\n✅ <b>Все проверки сброшены!</b>\n\n"
         status_text += "Теперь бот будет проверять:\n"
-        status_text += "• Telegram: последние 10 сообщений (при первой проверке)\n"
+        status_text += "• Telegram: вся история до даты отсечения (фоновая догрузка, /backfill)\n"
         status_text += "• RSS: последние 48 часов\n\n"
         status_text += "Используйте /force_monitor для запуска проверки"
         
@@ -3131,13 +3338,20 @@ async def cmd_check_times(message: Message):
             last_check = await content_monitor._get_last_check_time(f"tg_{channel}")
             last_check_str = last_check.strftime('%d.%m %H:%M') if last_check else "Нет"
             
-            # ID последнего сообщения
-            last_id = await content_monitor._get_last_message_id(f"tg_{channel}")
-            last_id_str = str(last_id) if last_id else "Нет"
+            # ID последнего сообщения и ошибки подряд
+            state = await content_monitor.get_source_state(f"tg_{channel}")
+            last_id_str = str(state['last_message_id']) if state.get('last_message_id') else "Нет"
             
             status_text += f"• {channel}:\n"
             status_text += f"  ⏰ Время: {last_check_str}\n"
             status_text += f"  🆔 ID: {last_id_str}\n"
+            if state.get('error_count'):
+                status_text += f"  ⚠️ Ошибок подряд: {state['error_count']}\n"
+            if state.get('next_due_at'):
+                next_due = datetime.fromisoformat(state['next_due_at'])
+                status_text += f"  ⏭ Следующая проверка: {next_due.strftime('%d.%m %H:%M')} UTC\n"
+            if state.get('post_rate') is not None:
+                status_text += f"  📈 Постов в сутки: {state['post_rate']:.1f}\n"
         
         # Проверяем RSS
         if config.RSS_SOURCES:
@@ -3197,6 +3411,74 @@ async def cmd_test_notification(message: Message):
         logger.error(f"Ошибка тестирования уведомления: {e}")
         await message.answer(f"❌ Ошибка: {e}")
 
+@router.message(Command("backfill"))
+async def cmd_backfill(message: Message):
+    """Статус догрузки истории каналов; /backfill @channel - догрузить канал заново"""
+    if not is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет прав доступа.")
+        return
+    
+    try:
+        from backfill import backfill_manager
+        
+        args = message.text.split(maxsplit=1)
+        if len(args) > 1:
+            channel = args[1].strip()
+            if not channel.startswith('@'):
+                channel = '@' + channel
+            await backfill_manager.start_jobs([channel])
+            await scheduler.reschedule("backfill")
+            await message.answer(f"📥 Догрузка истории {channel} запланирована")
+            return
+        
+        await backfill_manager.load()
+        jobs = backfill_manager.get_stats()
+        status_names = {'pending': '⏳ ожидает', 'active': '🔄 идет', 'done': '✅ готово', 'error': '❌ ошибка'}
+        text = f"📥 <b>Догрузка истории</b> ({config.BACKFILL_DIRECTION}, {config.BACKFILL_PAGES_PER_MINUTE:g} стр/мин)\n\n"
+        if not jobs:
+            text += "Задач нет. Догрузка запускается по /add_tg, /reset_ids или /backfill @channel\n"
+        for job in jobs[:30]:
+            text += (f"• {job['channel']}: {status_names.get(job['status'], job['status'])}, "
+                     f"стр. {job['pages']}, сообщ. {job['fetched']}, черновиков {job['added']}\n")
+            if job.get('error'):
+                text += f"  ⚠️ {html_escape.escape(job['error'][:100])}\n"
+        
+        await message.answer(text, parse_mode="HTML")
+    except Exception as e:
+        logger.error(f"Ошибка статуса догрузки: {e}")
+        await message.answer(f"❌ Ошибка: {e}")
+
+@router.message(Command("stories"))
+async def cmd_stories(message: Message):
+    """Активные сюжеты: посты разных каналов об одном и том же"""
+    if not is_admin(message.from_user.id):
+        await message.answer("❌ У вас нет прав доступа.")
+        return
+    
+    try:
+        from story_tracker import story_tracker
+        
+        stories = story_tracker.top_stories(10)
+        stats = story_tracker.get_stats()
+        text = f"🗞 <b>Сюжеты за {config.STORY_WINDOW_MINUTES} мин</b>\n\n"
+        if not stories:
+            text += "Пока нет сюжетов, которые подхватили несколько источников.\n"
+        for story in stories:
+            age = max(1, int((datetime.now().timestamp() - story.first_seen) / 60))
+            text += f"{'🔥' if story.alerted else '•'} <b>{len(story.sources)} источн.</b>, {age} мин назад\n"
+            if story.headline:
+                text += f"<i>{safe_html_with_emoji(story.headline[:150])}</i>\n"
+            text += f"📡 {safe_html_with_emoji(', '.join(list(story.sources)[:6]))}\n"
+            if story.draft_ids:
+                text += f"📋 {', '.join(f'#{draft_id}' for draft_id in story.draft_ids[:5])}\n"
+            text += "\n"
+        text += f"Всего сюжетов: {stats['stories']}, из нескольких источников: {stats['multi_source']}, тревог: {stats['alerts']}"
+        
+        await message.answer(text, parse_mode="HTML")
+    except Exception as e:
+        logger.error(f"Ошибка получения сюжетов: {e}")
+        await message.answer(f"❌ Ошибка: {e}")
+
 @router.message(Command("bot_status"))
 async def cmd_bot_status(message: Message):
     """Показывает статус бота и content_monitor"""
@@ -3218,15 +3500,21 @@ async def cmd_bot_status(message: Message):
         # Статус content_monitor
         status_text += f"🔍 <b>Content Monitor:</b>\n"
         status_text += f"• Бот установлен: {'✅' if content_monitor.bot_instance else '❌'}\n"
-        status_text += f"• Telethon клиент: {'✅' if content_monitor.tg_client else '❌'}\n"
-        status_text += f"• HTTP сессия: {'✅' if content_monitor.session else '❌'}\n"
+        tg_connected = bool(content_monitor.tg_client and content_monitor.tg_client.is_connected())
+        session_open = bool(content_monitor.session and not content_monitor.session.closed)
+        status_text += f"• Telethon клиент: {'✅ подключен' if tg_connected else '❌'}\n"
+        status_text += f"• HTTP сессия: {'✅' if session_open else '❌'}\n"
+        status_text += f"• Потоковый режим: {'✅' if content_monitor.streaming else '❌'}\n"
         status_text += f"• Ключевые слова: {len(content_monitor.keywords)}\n\n"
         
         # Статус базы данных
         try:
-            drafts_count = await db.get_content_drafts_count()
+            db_stats = await db.get_dashboard_stats()
             status_text += f"💾 <b>База данных:</b>\n"
-            status_text += f"• Черновиков: {drafts_count}\n"
+            status_text += (f"• Черновиков: {db_stats['drafts_total']} "
+                            f"(новых {db_stats['drafts'].get('new', 0)}, за 24 часа {db_stats['new_24h']})\n")
+            status_text += f"• На модерации: {db_stats['pending']}\n"
+            status_text += f"• Опубликовано за 24 часа: {db_stats['published'].get('last_24h', 0)}\n"
         except Exception as e:
             status_text += f"❌ Ошибка БД: {e}\n"
         
@@ -3239,6 +3527,51 @@ async def cmd_bot_status(message: Message):
             status_text += "• Бот НЕ доступен для уведомлений ❌\n"
             status_text += "• Проверьте инициализацию в main.py\n"
         
+        # Очередь отправки
+        from outbound_queue import outbound_queue
+        queue_stats = outbound_queue.get_stats()
+        status_text += f"\n📬 <b>Очередь отправки:</b> {'✅' if queue_stats['running'] else '❌'}\n"
+        status_text += f"• В очереди: {queue_stats['pending']}\n"
+        status_text += f"• Отправлено: {queue_stats['sent']}, не доставлено: {queue_stats['failed']}\n"
+        status_text += f"• Flood control: {queue_stats['retry_after_hits']}\n"
+        
+        # Event loop и исполнитель мониторинга
+        from ingest_executor import ingest_executor, loop_lag_monitor
+        lag = loop_lag_monitor.get_stats()
+        status_text += f"\n⏱ <b>Event loop:</b>\n"
+        status_text += f"• Исполнитель разбора: {ingest_executor.mode}, задач: {ingest_executor.tasks_done}\n"
+        status_text += (f"• Задержка: сейчас {lag['last_ms']:.1f} мс, средняя {lag['avg_ms']:.1f} мс, "
+                        f"p95 {lag['p95_ms']:.1f} мс, макс {lag['max_ms']:.1f} мс\n")
+        
+        from near_duplicates import near_duplicate_index
+        dup_stats = near_duplicate_index.get_stats()
+        status_text += (f"• Индекс похожих постов: {dup_stats['size']} черновиков, "
+                        f"объединено {dup_stats['hits']} из {dup_stats['lookups']}\n")
+        seen_stats = db.get_seen_sources_stats()
+        status_text += (f"• Фильтр известных адресов: {seen_stats['items']} шт., "
+                        f"{seen_stats['memory_bytes'] / 1024:.0f} КБ, "
+                        f"ложных срабатываний {seen_stats['estimated_error_rate']:.3%} расчетно / "
+                        f"{seen_stats['observed_error_rate']:.3%} наблюдаемо, "
+                        f"без запроса к БД {seen_stats['negatives']} из {seen_stats['lookups']}\n")
+        settings_stats = db.get_settings_cache_stats()
+        status_text += (f"• Кэш настроек: {settings_stats['size']} значений, "
+                        f"попаданий {settings_stats['hit_rate']:.0%} "
+                        f"({settings_stats['hits']}/{settings_stats['hits'] + settings_stats['misses']}), "
+                        f"ждут записи {settings_stats['pending']}\n")
+        
+        # Лимиты запросов к Telegram API
+        from telethon_governor import telethon_governor
+        tg_stats = telethon_governor.get_stats()
+        status_text += f"\n🚦 <b>Лимиты Telegram API:</b>\n"
+        for method, stats in tg_stats['methods'].items():
+            status_text += (f"• {method}: {stats['last_minute']}/{stats['limit_per_minute']:g} в мин "
+                            f"({stats['utilization']:.0%}), ожидание {stats['waited_seconds']:.0f} сек, "
+                            f"FloodWait {stats['flood_waits']}, перенесено {stats['deferred']}\n")
+            if stats['flood_remaining'] > 0:
+                status_text += f"  ⛔ FloodWait еще {stats['flood_remaining']:.0f} сек\n"
+        status_text += (f"• Кэш каналов: {tg_stats['entity_cache_size']}, "
+                        f"попаданий {tg_stats['entity_cache_hits']}\n")
+        
         await message.answer(status_text, parse_mode="HTML")
         
     except Exception as e:
@@ -3290,18 +3623,24 @@ async def cmd_force_monitor(message: Message):
         await message.answer("🔄 <b>Запускаю мониторинг...</b>", parse_mode="HTML")
         
         # Сбрасываем время проверки для всех источников
-        for channel in config.TG_CHANNELS:
-            await db.set_setting(f"last_check_tg_{channel}", 
-                               (datetime.now(timezone.utc) - timedelta(hours=48)).isoformat())
-        
-        for rss_url in config.RSS_SOURCES:
-            await db.set_setting(f"last_check_rss_{rss_url}", 
-                               (datetime.now(timezone.utc) - timedelta(hours=48)).isoformat())
+        reset_time = datetime.now(timezone.utc) - timedelta(hours=48)
+        await content_monitor.reset_source_states(
+            [f"tg_{channel}" for channel in config.TG_CHANNELS]
+            + [f"rss_{rss_url}" for rss_url in config.RSS_SOURCES],
+            last_check=reset_time
+        )
         
         await message.answer("⏰ <b>Время проверки и ID сообщений сброшены</b>", parse_mode="HTML")
         
+        # Остановленные из-за ошибок догрузки истории продолжаются
+        from backfill import backfill_manager
+        resumed = await backfill_manager.resume_failed()
+        if resumed:
+            await scheduler.reschedule("backfill")
+            await message.answer(f"📥 Возобновлена догрузка истории: {resumed} каналов", parse_mode="HTML")
+        
         # Запускаем мониторинг
-        await content_monitor.run_monitoring_cycle()
+        await content_monitor.run_monitoring_cycle(force=True)
         
         await message.answer("✅ <b>Мониторинг завершен!</b>\n\nПроверьте логи для подробной информации.", parse_mode="HTML")
         
@@ -3341,12 +3680,13 @@ async def cmd_check_channel(message: Message):
         
         await message.answer(f"🆔 <b>ID последнего сообщения:</b> {last_message_id}", parse_mode="HTML")
         
-        # Получаем сообщения
-        entity = await content_monitor.tg_client.get_entity(channel)
-        messages = await content_monitor.tg_client.get_messages(
-            entity, 
-            limit=None  # Убираем лимит - получаем все сообщения
-        )
+        # Получаем только новые сообщения (постранично)
+        from telethon_governor import telethon_governor
+        entity = await telethon_governor.get_entity(content_monitor.tg_client, channel)
+        checkpoint = last_message_id if isinstance(last_message_id, int) else None
+        messages = []
+        async for page in content_monitor._iter_new_message_pages(entity, checkpoint):
+            messages.extend(page)
         
         await message.answer(f"📊 <b>Найдено {len(messages)} сообщений</b>", parse_mode="HTML")
         
@@ -3356,26 +3696,26 @@ async def cmd_check_channel(message: Message):
         # Сортируем по ID (новые первыми)
         messages.sort(key=lambda m: m.id, reverse=True)
         
-        for message in messages:
-            if not message.text:
+        for msg in messages:
+            if not msg.text:
                 continue
             
             # Проверяем, новое ли это сообщение
-            if last_message_id != "Нет (первая проверка)" and message.id <= int(last_message_id):
+            if checkpoint is not None and msg.id <= checkpoint:
                 continue
             
             new_messages += 1
             
             # Проверяем ключевые слова
-            matched_keywords = content_monitor.check_keywords(message.text)
+            matched_keywords = content_monitor.check_keywords(msg.text)
             if matched_keywords:
                 matched_messages += 1
                 await message.answer(
                     f"🎯 <b>Найден релевантный пост:</b>\n\n"
-                    f"🆔 ID: {message.id}\n"
-                    f"📅 {message.date}\n"
+                    f"🆔 ID: {msg.id}\n"
+                    f"📅 {msg.date}\n"
                     f"🔍 Ключевые слова: {', '.join(matched_keywords)}\n"
-                    f"📝 {message.text[:200]}...",
+                    f"📝 {msg.text[:200]}...",
                     parse_mode="HTML"
                 )
         
@@ -3445,16 +3785,24 @@ async def cmd_reset_ids(message: Message):
         return
     
     try:
+        from content_monitor import content_monitor
+        
         status_text = "🔄 <b>Сброс ID сообщений</b>\n\n"
         
         # Сбрасываем только ID сообщений для Telegram каналов
+        await content_monitor.reset_source_states(
+            [f"tg_{channel}" for channel in config.TG_CHANNELS], reset_message_ids=True
+        )
+        # История догружается постранично отдельной задачей (переживает перезапуск)
+        from backfill import backfill_manager
+        await backfill_manager.start_jobs(config.TG_CHANNELS)
+        await scheduler.reschedule("backfill")
         for channel in config.TG_CHANNELS:
-            await db.set_setting(f"last_message_id_tg_{channel}", "")
             status_text += f"✅ {channel}: ID сброшен\n"
         
         status_text += f"\n✅ <b>ID сообщений сброшены!</b>\n\n"
         status_text += "Теперь при следующей проверке бот будет:\n"
-        status_text += "• Обрабатывать ВСЕ доступные сообщения\n"
+        status_text += "• Догружать в фоне ВСЕ сообщения до даты отсечения (/backfill)\n"
         status_text += "• Фильтровать только по дате отсечения (27 июля 2025)\n"
         status_text += "• Отправлять уведомления о КАЖДОМ новом посте\n"
         status_text += "• Начать отслеживание с текущего момента\n\n"
@@ -0,0 +1,199 @@
+"""
+Вынос CPU-работы мониторинга (разбор RSS, очистка текста, поиск ключевых слов)
+из event loop в пул потоков или процессов, плюс замер задержек event loop
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+
+import feedparser
+
+from config import config
+from keyword_matcher import KeywordMatcher
+from text_normalizer import clean_text
+
+logger = logging.getLogger(__name__)
+
+
+# --- Функции, выполняемые в пуле (только простые типы на входе и выходе) ---
+
+# Скомпилированные автоматы ключевых слов в рамках процесса-исполнителя
+_matchers: Dict[Tuple[str, ...], KeywordMatcher] = {}
+
+
+def _get_matcher(keywords: Tuple[str, ...]) -> KeywordMatcher:
+    matcher = _matchers.get(keywords)
+    if matcher is None:
+        if len(_matchers) > 8:
+            _matchers.clear()
+        matcher = _matchers[keywords] = KeywordMatcher(keywords)
+    return matcher
+
+
+def _entry_date(entry) -> Optional[datetime]:
+    parsed = entry.get('published_parsed') or entry.get('updated_parsed')
+    if parsed:
+        return datetime(*parsed[:6], tzinfo=timezone.utc)
+    return None
+
+
+def parse_feed(body: bytes, content_type: str, keywords: Tuple[str, ...],
+               since: Optional[str], fresh_since: Optional[str], cutoff: str) -> Dict:
+    """
+    Разбирает ленту и отбирает подходящие записи.
+    since - пропускать записи не новее этого времени (ISO, с буфером),
+    fresh_since - считать записи новее этого времени новыми (для оценки активности),
+    cutoff - дата отсечения старых постов.
+    """
+    feed = feedparser.parse(body, response_headers={'content-type': content_type})
+    matcher = _get_matcher(keywords)
+    since_dt = datetime.fromisoformat(since) if since else None
+    fresh_dt = datetime.fromisoformat(fresh_since) if fresh_since else None
+    cutoff_dt = datetime.fromisoformat(cutoff)
+
+    entries = []
+    fresh = 0
+    for entry in feed.entries:
+        pub_date = _entry_date(entry)
+        if fresh_dt and pub_date and pub_date > fresh_dt:
+            fresh += 1
+        # Пропускаем старые записи и записи старше даты отсечения
+        if pub_date and ((since_dt and pub_date <= since_dt) or pub_date < cutoff_dt):
+            continue
+
+        title = entry.get('title', '')
+        description = entry.get('description', '') or entry.get('summary', '')
+        text = clean_text(f"{title}\n\n{description}")
+        matched = matcher.find_all(text)
+        if matched:
+            entries.append({
+                'title': title,
+                'link': entry.get('link', ''),
+                'pub_date': pub_date.isoformat() if pub_date else None,
+                'text': text,
+                'keywords': matched,
+            })
+
+    return {
+        'title': feed.feed.get('title', ''),
+        'total': len(feed.entries),
+        'fresh': fresh,
+        'entries': entries,
+    }
+
+
+def match_texts(texts: List[str], keywords: Tuple[str, ...]) -> List[List[str]]:
+    """Ключевые слова для каждого текста пачки"""
+    matcher = _get_matcher(keywords)
+    return [matcher.find_all(text) if text else [] for text in texts]
+
+
+# --- Асинхронная сторона ---
+
+class IngestExecutor:
+    """
+    Исполнитель CPU-задач мониторинга.
+    INGEST_EXECUTOR: thread - пул потоков, process - пул процессов (полная изоляция от GIL),
+    none - прямо в event loop (для отладки).
+    """
+
+    def __init__(self, mode: str = None, workers: int = None):
+        self.mode = (mode or config.INGEST_EXECUTOR).lower()
+        self.workers = max(1, workers or config.INGEST_WORKERS)
+        self._pool: Optional[Executor] = None
+        self.tasks_done = 0
+
+    def _get_pool(self) -> Optional[Executor]:
+        if self.mode == 'none':
+            return None
+        if self._pool is None:
+            if self.mode == 'process':
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='ingest')
+            logger.info(f"Исполнитель мониторинга: {self.mode}, воркеров {self.workers}")
+        return self._pool
+
+    async def run(self, func: Callable, *args):
+        """Выполняет функцию модуля в пуле и возвращает результат"""
+        pool = self._get_pool()
+        self.tasks_done += 1
+        if pool is None:
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(pool, partial(func, *args))
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+async def run_with_budget(items: List, handler: Callable, budget_ms: float = None) -> List:
+    """
+    Обрабатывает элементы в event loop синхронным handler, отдавая управление
+    циклу, как только непрерывная работа превысила бюджет INGEST_LOOP_BUDGET_MS.
+    """
+    budget = (budget_ms if budget_ms is not None else config.INGEST_LOOP_BUDGET_MS) / 1000
+    results = []
+    started = time.perf_counter()
+    for item in items:
+        results.append(handler(item))
+        if time.perf_counter() - started >= budget:
+            await asyncio.sleep(0)
+            started = time.perf_counter()
+    return results
+
+
+class LoopLagMonitor:
+    """
+    Замеряет задержку event loop: насколько позже запланированного просыпается
+    короткий sleep. Большие значения означают, что что-то блокирует цикл.
+    """
+
+    def __init__(self, interval: float = None, window: int = 120):
+        self.interval = interval or config.LOOP_LAG_SAMPLE_SECONDS
+        self.samples: deque = deque(maxlen=window)
+        self.max_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def _run(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, time.perf_counter() - started - self.interval)
+            self.samples.append(lag)
+            self.max_lag = max(self.max_lag, lag)
+
+    def get_stats(self) -> Dict:
+        """Задержки в миллисекундах за последнее окно"""
+        if not self.samples:
+            return {'last_ms': 0.0, 'avg_ms': 0.0, 'p95_ms': 0.0, 'max_ms': 0.0}
+        ordered = sorted(self.samples)
+        return {
+            'last_ms': self.samples[-1] * 1000,
+            'avg_ms': sum(ordered) / len(ordered) * 1000,
+            'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+            'max_ms': self.max_lag * 1000,
+        }
+
+
+# Глобальные экземпляры
+ingest_executor = IngestExecutor()
+loop_lag_monitor = LoopLagMonitor()
@@ -131,4 +131,54 @@ def get_new_post_keyboard(draft_id: int):
     ))
     
     builder.adjust(2, 2)
-    return builder.as_markup() 
\ No newline at end of file
+    return builder.as_markup()
+
+def get_notification_summary_keyboard(batch_id: int, draft_ids: list, page: int, total_pages: int):
+    """Клавиатура сводки новых постов: кнопки каждого поста страницы и навигация"""
+    builder = InlineKeyboardBuilder()
+    
+    # Для каждого поста - те же действия, что и в отдельном уведомлении
+    for draft_id in draft_ids:
+        builder.row(
+            InlineKeyboardButton(text=f"📋 #{draft_id}", callback_data=f"new_post_details_{draft_id}"),
+            InlineKeyboardButton(text="📝 Промпт", callback_data=f"new_post_manual_{draft_id}"),
+            InlineKeyboardButton(text="❌", callback_data=f"new_post_skip_{draft_id}")
+        )
+    
+    # Навигация по страницам сводки
+    if total_pages > 1:
+        navigation = []
+        if page > 1:
+            navigation.append(InlineKeyboardButton(
+                text="⬅️ Назад", callback_data=f"notify_page_{batch_id}_{page - 1}"
+            ))
+        navigation.append(InlineKeyboardButton(
+            text=f"{page}/{total_pages}", callback_data=f"notify_page_{batch_id}_{page}"
+        ))
+        if page < total_pages:
+            navigation.append(InlineKeyboardButton(
+                text="Вперед ➡️", callback_data=f"notify_page_{batch_id}_{page + 1}"
+            ))
+        builder.row(*navigation)
+    
+    return builder.as_markup()
+
+def get_search_results_keyboard(draft_ids: list, page: int, has_next: bool):
+    """Клавиатура результатов /search: карточки найденных черновиков и листание"""
+    builder = InlineKeyboardBuilder()
+    
+    if draft_ids:
+        builder.row(*[
+            InlineKeyboardButton(text=f"📋 #{draft_id}", callback_data=f"new_post_details_{draft_id}")
+            for draft_id in draft_ids
+        ])
+    
+    navigation = []
+    if page > 1:
+        navigation.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=f"search_page_{page - 1}"))
+    if has_next:
+        navigation.append(InlineKeyboardButton(text="Вперед ➡️", callback_data=f"search_page_{page + 1}"))
+    if navigation:
+        builder.row(*navigation)
+    
+    return builder.as_markup()
@@ -0,0 +1,130 @@
+"""
+Поиск ключевых слов за один проход по тексту (автомат Ахо-Корасик)
+"""
+
+from typing import Dict, Iterable, List
+
+
+def _is_word_char(char: str) -> bool:
+    """Символ слова в смысле регулярного выражения \\w"""
+    return char.isalnum() or char == '_'
+
+
+class KeywordMatcher:
+    """
+    Компилирует набор ключевых слов в автомат и находит все совпадения
+    за один проход по тексту, независимо от количества ключевых слов.
+
+    Правила совпадения те же, что и раньше в ContentMonitor._keyword_matches:
+    • фразы (с пробелом) ищутся как подстрока;
+    • слова от 5 символов ищутся как подстрока;
+    • короткие слова должны совпадать с целым словом текста.
+    Сравнение регистронезависимое, поэтому варианты "TON", "Ton", "ton"
+    превращаются в один шаблон.
+    """
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords: List[str] = list(keywords)
+
+        # Уникальные шаблоны в нижнем регистре
+        self._patterns: List[str] = []
+        self._whole_word: List[bool] = []
+        self._keyword_pattern: List[int] = []
+        pattern_ids: Dict[str, int] = {}
+
+        for keyword in self.keywords:
+            pattern = keyword.lower()
+            if pattern not in pattern_ids:
+                pattern_ids[pattern] = len(self._patterns)
+                self._patterns.append(pattern)
+                self._whole_word.append(' ' not in pattern and len(pattern) < 5)
+            self._keyword_pattern.append(pattern_ids[pattern])
+
+        self._build()
+
+    def _build(self):
+        """Строит бор с суффиксными ссылками"""
+        self._goto: List[Dict[str, int]] = [{}]
+        self._output: List[List[int]] = [[]]
+
+        for pattern_id, pattern in enumerate(self._patterns):
+            if not pattern:
+                continue
+            # Короткое слово с не-словесными символами никогда не совпадет с целым словом
+            if self._whole_word[pattern_id] and not all(_is_word_char(c) for c in pattern):
+                continue
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._output.append([])
+                state = next_state
+            self._output[state].append(pattern_id)
+
+        # Суффиксные ссылки обходом в ширину
+        self._fail: List[int] = [0] * len(self._goto)
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            state = queue[head]
+            head += 1
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                candidate = self._goto[fail].get(char, 0)
+                self._fail[next_state] = candidate if candidate != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def _scan(self, text: str, first_only: bool = False) -> set:
+        """Возвращает множество ID найденных шаблонов"""
+        found = set()
+        if not text or len(self._goto) == 1:
+            return found
+
+        text = text.lower()
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        whole_word = self._whole_word
+        patterns = self._patterns
+        text_len = len(text)
+        state = 0
+
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if not output[state]:
+                continue
+            for pattern_id in output[state]:
+                if pattern_id in found:
+                    continue
+                if whole_word[pattern_id]:
+                    start = position - len(patterns[pattern_id]) + 1
+                    if start > 0 and _is_word_char(text[start - 1]):
+                        continue
+                    if position + 1 < text_len and _is_word_char(text[position + 1]):
+                        continue
+                found.add(pattern_id)
+                if first_only:
+                    return found
+        return found
+
+    def find_all(self, text: str) -> List[str]:
+        """Возвращает найденные ключевые слова в порядке исходного списка"""
+        found = self._scan(text)
+        if not found:
+            return []
+        return [
+            keyword for keyword, pattern_id in zip(self.keywords, self._keyword_pattern)
+            if pattern_id in found
+        ]
+
+    def contains_any(self, text: str) -> bool:
+        """Есть ли в тексте хотя бы одно ключевое слово"""
+        return bool(self._scan(text, first_only=True))
@@ -11,6 +11,9 @@ from config import config
 from database import db
 from handlers import router
 from scheduler import scheduler
+from content_monitor import content_monitor
+from outbound_queue import outbound_queue
+from ingest_executor import ingest_executor, loop_lag_monitor
 
 # Глобальная переменная для доступа к боту из планировщика
 bot_instance = None
@@ -25,6 +28,18 @@ logger = logging.getLogger(__name__)
 # Гарантированно очищаем окружение от прокси
 ensure_no_proxy_environment()
 
+async def shutdown():
+    """Корректная остановка: планировщик и долгоживущие соединения"""
+    try:
+        await scheduler.stop()
+        await content_monitor.close()
+        await outbound_queue.stop()
+        await loop_lag_monitor.stop()
+        ingest_executor.shutdown()
+        await db.close()
+    except Exception as e:
+        logger.error(f"Ошибка при остановке: {e}")
+
 async def main():
     """Основная функция запуска бота"""
     try:
@@ -35,6 +50,10 @@ async def main():
         # Инициализируем базу данных
         await db.init_db()
         logger.info("База данных инициализирована")
+        await db.check_query_plans()
+        
+        # Замер задержек event loop (видно в /bot_status)
+        loop_lag_monitor.start()
         
         # Создаем бот и диспетчер
         global bot_instance
@@ -73,6 +92,9 @@ async def main():
         except Exception as e:
             logger.warning(f"Не удалось отправить уведомление админу: {e}")
         
+        # Очередь отправки: доставляет и сообщения, не отправленные до перезапуска
+        await outbound_queue.start(bot)
+        
         # Запускаем планировщик с передачей экземпляра бота
         await scheduler.start(bot_instance)
         
@@ -82,6 +104,8 @@ async def main():
     except Exception as e:
         logger.error(f"Ошибка при запуске бота: {e}")
         raise
+    finally:
+        await shutdown()
 
 if __name__ == "__main__":
     try:
@@ -0,0 +1,173 @@
+"""
+Поиск почти одинаковых постов: MinHash-сигнатуры текстов и LSH-индекс
+по черновикам за последние часы (репосты одной новости разными каналами)
+"""
+
+import random
+import re
+import struct
+import time
+import zlib
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional, Set, Tuple
+
+from config import config
+
+# Параметры сигнатуры: NUM_PERM хэшей, LSH - BANDS полос по ROWS значений.
+# Порог срабатывания LSH ~ (1 / BANDS) ** (1 / ROWS) ≈ 0.5
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = 0xFFFFFFFF
+_SIGNATURE_FORMAT = f'<{NUM_PERM}I'
+_BAND_BYTES = ROWS * 4
+
+# Коэффициенты хэш-функций фиксированы: сигнатуры хранятся в БД между перезапусками
+_rng = random.Random(20240601)
+_PERMUTATIONS = [
+    (_rng.randrange(1, _MERSENNE_PRIME), _rng.randrange(0, _MERSENNE_PRIME))
+    for _ in range(NUM_PERM)
+]
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_URL_RE = re.compile(r'https?://\S+|t\.me/\S+|@\w+')
+_WORD_RE = re.compile(r'\w+')
+
+
+def _shingles(text: str) -> Set[int]:
+    """Хэши словесных n-грамм текста (без разметки, ссылок и упоминаний каналов)"""
+    text = _URL_RE.sub(' ', _TAG_RE.sub(' ', text or '').lower())
+    words = _WORD_RE.findall(text)
+    if not words:
+        return set()
+    if len(words) < SHINGLE_SIZE:
+        return {zlib.crc32(' '.join(words).encode())}
+    return {
+        zlib.crc32(' '.join(words[i:i + SHINGLE_SIZE]).encode())
+        for i in range(len(words) - SHINGLE_SIZE + 1)
+    }
+
+
+def minhash_signature(text: str) -> Optional[bytes]:
+    """MinHash-сигнатура текста (NUM_PERM 32-битных значений) или None для пустого текста"""
+    shingles = _shingles(text)
+    if not shingles:
+        return None
+    values = [
+        min((a * x + b) % _MERSENNE_PRIME for x in shingles) & _MAX_HASH
+        for a, b in _PERMUTATIONS
+    ]
+    return struct.pack(_SIGNATURE_FORMAT, *values)
+
+
+def minhash_signatures(texts: List[str]) -> List[Optional[bytes]]:
+    """Сигнатуры пачки текстов (для запуска в исполнителе мониторинга)"""
+    return [minhash_signature(text) for text in texts]
+
+
+def similarity(first: bytes, second: bytes) -> float:
+    """Оценка коэффициента Жаккара по двум сигнатурам"""
+    a = struct.unpack(_SIGNATURE_FORMAT, first)
+    b = struct.unpack(_SIGNATURE_FORMAT, second)
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERM
+
+
+class NearDuplicateIndex:
+    """
+    LSH-индекс сигнатур в памяти за скользящее окно NEAR_DUP_WINDOW_HOURS.
+    Поиск - BANDS обращений к словарю и сравнение с немногими кандидатами,
+    поэтому не зависит от числа черновиков в окне.
+    """
+
+    def __init__(self, threshold: float = None, window_hours: float = None):
+        self.threshold = threshold if threshold is not None else config.NEAR_DUP_THRESHOLD
+        self.window = (window_hours if window_hours is not None else config.NEAR_DUP_WINDOW_HOURS) * 3600
+        self._buckets: Dict[Tuple[int, bytes], Set[Hashable]] = {}
+        self._signatures: Dict[Hashable, bytes] = {}
+        # Ключ -> время добавления в порядке добавления: удаление и переименование за O(1)
+        self._order: 'OrderedDict[Hashable, float]' = OrderedDict()
+        self.lookups = 0
+        self.hits = 0
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    @staticmethod
+    def _bands(signature: bytes):
+        for band in range(BANDS):
+            yield band, signature[band * _BAND_BYTES:(band + 1) * _BAND_BYTES]
+
+    def add(self, key: Hashable, signature: Optional[bytes], added_at: float = None):
+        """Добавляет сигнатуру черновика (added_at - unix-время создания)"""
+        if not signature or key in self._signatures:
+            return
+        added_at = time.time() if added_at is None else added_at
+        self._signatures[key] = signature
+        self._order[key] = added_at
+        for band_key in self._bands(signature):
+            self._buckets.setdefault(band_key, set()).add(key)
+
+    def remove(self, key: Hashable):
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        self._order.pop(key, None)
+        for band_key in self._bands(signature):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def replace_key(self, old_key: Hashable, new_key: Hashable):
+        """Переносит сигнатуру на другой ключ (временный ключ -> ID черновика)"""
+        signature = self._signatures.get(old_key)
+        if signature is None:
+            return
+        added_at = self._order[old_key]
+        self.remove(old_key)
+        self.add(new_key, signature, added_at)
+
+    def _evict(self, now: float):
+        expired_before = now - self.window
+        while self._order:
+            key, added_at = next(iter(self._order.items()))
+            if added_at >= expired_before:
+                break
+            self.remove(key)
+
+    def find(self, signature: Optional[bytes]) -> Optional[Tuple[Hashable, float]]:
+        """(ключ, сходство) самого похожего черновика со сходством не ниже порога"""
+        if not signature:
+            return None
+        self._evict(time.time())
+        self.lookups += 1
+        candidates = set()
+        for band_key in self._bands(signature):
+            bucket = self._buckets.get(band_key)
+            if bucket:
+                candidates.update(bucket)
+        best_key, best_score = None, self.threshold
+        for key in candidates:
+            score = similarity(signature, self._signatures[key])
+            if score >= best_score:
+                best_key, best_score = key, score
+        if best_key is None:
+            return None
+        self.hits += 1
+        return best_key, best_score
+
+    def get_stats(self) -> Dict:
+        return {
+            'size': len(self._signatures),
+            'buckets': len(self._buckets),
+            'lookups': self.lookups,
+            'hits': self.hits,
+        }
+
+
+# Глобальный индекс черновиков
+near_duplicate_index = NearDuplicateIndex()
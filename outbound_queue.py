@@ -0,0 +1,304 @@
+"""
+Очередь исходящих сообщений бота с учетом лимитов Telegram
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from aiogram.exceptions import (
+    TelegramBadRequest, TelegramForbiddenError,
+    TelegramNotFound, TelegramRetryAfter, TelegramUnauthorizedError
+)
+from aiogram.types import InlineKeyboardMarkup
+
+from config import config
+from database import db
+
+logger = logging.getLogger(__name__)
+
+# Ошибки, при которых повторная отправка бессмысленна
+_PERMANENT_ERRORS = (TelegramBadRequest, TelegramForbiddenError, TelegramNotFound, TelegramUnauthorizedError)
+
+
+class TokenBucket:
+    """Ведро токенов: rate токенов в секунду, не больше capacity накопленных"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Сколько секунд ждать до появления токена"""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self._refill()
+        self.tokens -= 1
+
+    def pause(self, seconds: float):
+        """Обнуляет ведро на seconds секунд (ответ retry_after от Telegram)"""
+        self._refill()
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+
+class OutboundQueue:
+    """
+    Асинхронная доставка сообщений: мониторинг только ставит сообщение в очередь
+    и идет дальше, а отдельная задача отправляет их с лимитами на чат и на бота в целом.
+
+    • сообщения одного чата уходят строго по порядку, чаты обслуживаются по кругу;
+    • TelegramRetryAfter приостанавливает чат (или всю отправку) на указанное время;
+    • каждое сообщение хранится в таблице outbound_queue до успешной отправки,
+      поэтому недоставленное (вместе с признаком срочности) переживает перезапуск;
+    • любая ошибка отправки, кроме flood control, считается попыткой: после
+      OUTBOUND_MAX_ATTEMPTS сообщение отбрасывается и не блокирует чат.
+    """
+
+    def __init__(self):
+        self.bot = None
+        self.running = False
+        self._chats: Dict[int, Deque[Dict]] = {}
+        self._chat_buckets: Dict[int, TokenBucket] = {}
+        self._global_bucket = TokenBucket(config.OUTBOUND_GLOBAL_RATE, config.OUTBOUND_GLOBAL_RATE)
+        self._wakeup = asyncio.Event()
+        self._worker: Optional[asyncio.Task] = None
+        self._loaded = False
+        # ID доставленных сообщений, которые не удалось удалить из БД (повтор при следующем удалении)
+        self._undeleted: set = set()
+        self.sent = 0
+        self.failed = 0
+        self.retry_after_hits = 0
+
+    @property
+    def pending(self) -> int:
+        return sum(len(items) for items in self._chats.values())
+
+    async def start(self, bot):
+        """Загружает недоставленные сообщения и запускает отправку"""
+        self.bot = bot
+        if self.running:
+            return
+        await self._load_pending()
+        self.running = True
+        self._worker = asyncio.create_task(self._run())
+        logger.info(f"Очередь отправки запущена, в очереди: {self.pending}")
+
+    async def stop(self):
+        """Останавливает отправку (неотправленное остается в БД)"""
+        self.running = False
+        self._wakeup.set()
+        if self._worker and not self._worker.done():
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+        self._worker = None
+        logger.info(f"Очередь отправки остановлена, не отправлено: {self.pending}")
+
+    async def enqueue(self, chat_id: int, text: str, reply_markup: InlineKeyboardMarkup = None,
+                      parse_mode: str = "HTML", priority: bool = False):
+        """Ставит одно сообщение в очередь"""
+        await self.enqueue_many([{
+            'chat_id': chat_id,
+            'text': text,
+            'reply_markup': reply_markup,
+            'parse_mode': parse_mode,
+        }], priority=priority)
+
+    async def enqueue_many(self, messages: List[Dict], priority: bool = False):
+        """
+        Ставит пачку сообщений в очередь одной записью в БД.
+        priority - сообщения встают в очередь чата перед обычными (после ранее поставленных срочных).
+        """
+        if not messages:
+            return
+        await self._load_pending()
+        items = []
+        for message in messages:
+            markup = message.get('reply_markup')
+            items.append({
+                'chat_id': message['chat_id'],
+                'text': message['text'],
+                'parse_mode': message.get('parse_mode', "HTML"),
+                'reply_markup': markup.model_dump_json(exclude_none=True) if markup else None,
+                'attempts': 0,
+                'priority': priority,
+            })
+        ids = await db.add_outbound_messages(items)
+        for item, item_id in zip(items, ids):
+            item['id'] = item_id
+            self._push(item)
+        self._wakeup.set()
+
+    async def _load_pending(self):
+        """Недоставленные сообщения прошлого запуска (один раз)"""
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            for item in await db.get_outbound_messages():
+                self._push(item)
+        except Exception as e:
+            logger.error(f"Ошибка загрузки очереди отправки: {e}")
+
+    def _push(self, item: Dict):
+        chat_id = item['chat_id']
+        if chat_id not in self._chats:
+            self._chats[chat_id] = deque()
+            self._chat_buckets.setdefault(
+                chat_id, TokenBucket(config.OUTBOUND_CHAT_RATE, config.OUTBOUND_CHAT_BURST)
+            )
+        queue = self._chats[chat_id]
+        if not item.get('priority'):
+            queue.append(item)
+            return
+        position = 0
+        while position < len(queue) and queue[position].get('priority'):
+            position += 1
+        queue.insert(position, item)
+
+    def _next_ready(self):
+        """
+        Выбирает чат, которому можно отправить прямо сейчас.
+        Возвращает (chat_id, 0) или (None, сколько ждать).
+        """
+        global_delay = self._global_bucket.delay()
+        wait = None
+        for chat_id in list(self._chats):
+            if not self._chats[chat_id]:
+                del self._chats[chat_id]
+                continue
+            delay = max(global_delay, self._chat_buckets[chat_id].delay())
+            if delay <= 0:
+                # Чат в конец очереди обхода - справедливость между чатами
+                self._chats[chat_id] = self._chats.pop(chat_id)
+                return chat_id, 0.0
+            wait = delay if wait is None else min(wait, delay)
+        return None, wait
+
+    async def _run(self):
+        while self.running:
+            try:
+                chat_id, wait = self._next_ready()
+                if chat_id is None:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=wait)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                item = self._chats[chat_id][0]
+                self._chat_buckets[chat_id].consume()
+                self._global_bucket.consume()
+                await self._deliver(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ошибка в очереди отправки: {e}")
+                await asyncio.sleep(1)
+
+    async def _deliver(self, item: Dict) -> bool:
+        """
+        Отправляет сообщение. True - сообщение убрано из очереди (доставлено или отброшено).
+        Исключения наружу не выходят: иначе первое сообщение чата повторялось бы бесконечно.
+        """
+        chat_id = item['chat_id']
+        try:
+            markup = None
+            if item.get('reply_markup'):
+                markup = InlineKeyboardMarkup.model_validate_json(item['reply_markup'])
+            await self.bot.send_message(
+                chat_id=chat_id,
+                text=item['text'],
+                parse_mode=item.get('parse_mode') or "HTML",
+                reply_markup=markup
+            )
+        except TelegramRetryAfter as e:
+            # Лимит Telegram: ждем, сколько сказано, сообщение остается первым в очереди чата
+            self.retry_after_hits += 1
+            logger.warning(f"Очередь отправки: flood control для {chat_id}, ждем {e.retry_after} сек")
+            self._chat_buckets[chat_id].pause(e.retry_after)
+            self._global_bucket.pause(e.retry_after)
+            return False
+        except _PERMANENT_ERRORS as e:
+            logger.error(f"Очередь отправки: сообщение для {chat_id} не может быть доставлено: {e}")
+            return await self._drop(item)
+        except Exception as e:
+            # Сетевые ошибки, ошибки API и все прочее (например, испорченная клавиатура)
+            return await self._failed_attempt(item, e)
+        
+        # Доставлено: из очереди в памяти убираем сразу, даже если БД сейчас недоступна
+        self.sent += 1
+        await self._forget(item)
+        return True
+
+    async def _failed_attempt(self, item: Dict, error: Exception) -> bool:
+        chat_id = item['chat_id']
+        item['attempts'] = (item.get('attempts') or 0) + 1
+        if item['attempts'] >= config.OUTBOUND_MAX_ATTEMPTS:
+            logger.error(f"Очередь отправки: {item['attempts']} неудачных попыток для {chat_id}: {error}")
+            return await self._drop(item)
+        delay = min(60, 2 ** item['attempts'])
+        logger.warning(f"Очередь отправки: ошибка для {chat_id} ({error}), повтор через {delay} сек")
+        self._chat_buckets[chat_id].pause(delay)
+        try:
+            await db.update_outbound_attempts(item['id'], item['attempts'])
+        except Exception as e:
+            logger.error(f"Очередь отправки: не удалось сохранить попытки сообщения #{item['id']}: {e}")
+        return False
+
+    async def _drop(self, item: Dict) -> bool:
+        self.failed += 1
+        await self._forget(item)
+        return True
+
+    def _remove(self, item: Dict):
+        queue = self._chats.get(item['chat_id'])
+        if not queue:
+            return
+        # Пока шла отправка, перед сообщением могли встать срочные
+        if queue[0] is item:
+            queue.popleft()
+            return
+        for position, queued in enumerate(queue):
+            if queued is item:
+                del queue[position]
+                return
+
+    async def _forget(self, item: Dict):
+        """Убирает сообщение из очереди в памяти и из БД (ошибка БД не возвращает его в очередь)"""
+        self._remove(item)
+        self._undeleted.add(item['id'])
+        for message_id in list(self._undeleted):
+            try:
+                await db.delete_outbound_message(message_id)
+                self._undeleted.discard(message_id)
+            except Exception as e:
+                logger.error(f"Очередь отправки: не удалось удалить сообщение #{message_id} из БД: {e}")
+                break
+
+    def get_stats(self) -> Dict:
+        """Статистика для /bot_status"""
+        return {
+            'running': self.running,
+            'pending': self.pending,
+            'sent': self.sent,
+            'failed': self.failed,
+            'retry_after_hits': self.retry_after_hits,
+        }
+
+
+# Глобальный экземпляр очереди отправки
+outbound_queue = OutboundQueue()
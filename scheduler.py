@@ -1,10 +1,14 @@
 import asyncio
+import heapq
+import itertools
 import logging
 import os
+import time
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 from content_monitor import content_monitor
+from backfill import backfill_manager
 from config import config
 from database import db
 
@@ -17,11 +21,56 @@ for var in proxy_vars:
         del os.environ[var]
         logger.info(f"Scheduler: удалена переменная окружения: {var}")
 
+# Максимальный сон без пробуждения: страхует от перевода системных часов
+_MAX_SLEEP_SECONDS = 300
+
+
+class ScheduledJob:
+    """
+    Задача планировщика.
+    func - корутина, выполняющая работу;
+    schedule - корутина schedule(job, now), возвращающая timestamp следующего запуска
+    или None, если задача сейчас не запланирована (например, дайджест отключен).
+    """
+    
+    def __init__(self, name: str, func: Callable[[], Awaitable[Any]],
+                 schedule: Callable[['ScheduledJob', float], Awaitable[Optional[float]]]):
+        self.name = name
+        self.func = func
+        self.schedule = schedule
+        self.next_run: Optional[float] = None
+        self.last_run: Optional[float] = None
+        self.last_finished: Optional[float] = None
+        self.running = False
+        # Поколение: записи кучи от старого расписания отбрасываются
+        self.generation = 0
+
+
 class TaskScheduler:
+    """
+    Планировщик по дедлайнам: задачи лежат в min-куче по времени следующего запуска,
+    цикл спит до ближайшего дедлайна и просыпается раньше при изменении расписания
+    (reschedule). В простое не тратит процессор и не обращается к БД.
+    """
+    
     def __init__(self):
         self.running = False
         self.tasks = {}
         self.bot_instance = None
+        self.jobs: Dict[str, ScheduledJob] = {}
+        self._heap: List[Tuple[float, int, int, str]] = []
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._loop_task: Optional[asyncio.Task] = None
+        
+        self.register("monitoring", self._run_monitoring_job, self._monitoring_schedule)
+        self.register("digest", self._run_digest_job, self._digest_schedule)
+        self.register("backfill", backfill_manager.run_batch, self._backfill_schedule)
+    
+    def register(self, name: str, func: Callable[[], Awaitable[Any]],
+                 schedule: Callable[[ScheduledJob, float], Awaitable[Optional[float]]]):
+        """Регистрирует периодическую задачу (время запуска считается при старте)"""
+        self.jobs[name] = ScheduledJob(name, func, schedule)
         
     async def start(self, bot_instance=None):
         """Запуск планировщика"""
@@ -44,68 +93,180 @@ class TaskScheduler:
             content_monitor.set_bot_instance(bot_instance)
             logger.info("Экземпляр бота передан в content_monitor")
         
-        # Запускаем основной цикл планировщика
-        asyncio.create_task(self._scheduler_loop())
+        # Мониторинг стартует сразу, остальные задачи - по своему расписанию
+        for job in self.jobs.values():
+            await self._schedule_job(job, immediate=(job.name == "monitoring"))
         
-        # Запускаем мониторинг контента с настраиваемым интервалом
-        asyncio.create_task(self._monitor_content_loop())
+        self._loop_task = asyncio.create_task(self._scheduler_loop())
     
     async def stop(self):
         """Остановка планировщика"""
         self.running = False
+        self._wakeup.set()
+        tasks = [self._loop_task] + list(self.tasks.values())
+        for task in tasks:
+            if task and not task.done():
+                task.cancel()
+        await asyncio.gather(*(t for t in tasks if t), return_exceptions=True)
+        self.tasks.clear()
+        self._loop_task = None
         logger.info("Планировщик остановлен")
     
+    async def reschedule(self, name: Optional[str] = None):
+        """
+        Пересчитывает расписание задачи (или всех задач) и будит цикл.
+        Вызывается после /setdigest и /interval.
+        """
+        jobs = [self.jobs[name]] if name else list(self.jobs.values())
+        for job in jobs:
+            # Выполняющаяся задача сама перепланируется по завершении
+            if not job.running:
+                await self._schedule_job(job)
+        self._wakeup.set()
+    
+    def get_next_runs(self) -> Dict[str, Optional[datetime]]:
+        """Время следующего запуска задач (для статуса)"""
+        return {
+            name: datetime.fromtimestamp(job.next_run) if job.next_run else None
+            for name, job in self.jobs.items()
+        }
+    
+    async def _schedule_job(self, job: ScheduledJob, immediate: bool = False):
+        """Вычисляет следующий запуск задачи и кладет его в кучу"""
+        job.generation += 1
+        try:
+            job.next_run = time.time() if immediate else await job.schedule(job, time.time())
+        except Exception as e:
+            logger.error(f"Планировщик: ошибка расчета расписания {job.name}: {e}")
+            # Повторим попытку позже, чтобы задача не пропала
+            job.next_run = time.time() + 60
+        if job.next_run is not None:
+            heapq.heappush(self._heap, (job.next_run, next(self._counter), job.generation, job.name))
+            logger.debug(f"Планировщик: {job.name} в {datetime.fromtimestamp(job.next_run):%Y-%m-%d %H:%M:%S}")
+    
     async def _scheduler_loop(self):
-        """Основной цикл планировщика"""
+        """Основной цикл: сон до ближайшего дедлайна, затем запуск созревших задач"""
         while self.running:
             try:
-                current_time = datetime.now()
-                current_time_str = current_time.strftime('%H:%M')
+                # Отбрасываем записи, устаревшие после перепланирования
+                while self._heap:
+                    _, _, generation, name = self._heap[0]
+                    job = self.jobs.get(name)
+                    if job is None or generation != job.generation:
+                        heapq.heappop(self._heap)
+                        continue
+                    break
                 
-                # Проверяем, нужно ли отправить дайджест
-                await self._check_digest_time(current_time_str)
+                timeout = _MAX_SLEEP_SECONDS
+                if self._heap:
+                    timeout = min(timeout, max(0.0, self._heap[0][0] - time.time()))
                 
-                # Здесь можно добавить другие периодические задачи
-                # Например, очистка старых записей, статистика и т.д.
+                if timeout > 0:
+                    self._wakeup.clear()
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=timeout)
+                        # Расписание изменилось - пересчитываем ближайший дедлайн
+                        continue
+                    except asyncio.TimeoutError:
+                        pass
                 
-                # Убираем задержку - проверяем сразу
+                now = time.time()
+                while self._heap and self._heap[0][0] <= now:
+                    _, _, generation, name = heapq.heappop(self._heap)
+                    job = self.jobs.get(name)
+                    if job is None or generation != job.generation or job.running:
+                        continue
+                    job.running = True
+                    job.next_run = None
+                    self.tasks[name] = asyncio.create_task(self._run_job(job))
                 
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.error(f"Ошибка в планировщике: {e}")
                 # При ошибке небольшая пауза
                 await asyncio.sleep(10)
     
-    async def _monitor_content_loop(self):
+    async def _run_job(self, job: ScheduledJob):
+        """Выполняет задачу и планирует ее следующий запуск"""
+        job.last_run = time.time()
+        try:
+            await job.func()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка задачи планировщика {job.name}: {e}")
+        finally:
+            job.last_finished = time.time()
+            job.running = False
+            self.tasks.pop(job.name, None)
+        if self.running:
+            await self._schedule_job(job)
+            self._wakeup.set()
+    
+    async def _monitoring_schedule(self, job: ScheduledJob, now: float) -> Optional[float]:
+        """
+        Мониторинг: не позже чем через MONITORING_INTERVAL_MINUTES после окончания прошлого цикла,
+        а раньше - если подошло время проверки какого-то источника (но не чаще раза в минуту)
+        """
+        interval = config.MONITORING_INTERVAL_MINUTES * 60
+        if job.last_finished is None:
+            return now + interval
+        next_run = job.last_finished + interval
+        source_due = content_monitor.next_due_time()
+        if source_due is not None:
+            next_run = min(next_run, max(source_due, job.last_finished + 60))
+        return max(now, next_run)
+    
+    async def _run_monitoring_job(self):
         """Цикл мониторинга контента"""
-        logger.info("Запуск цикла мониторинга контента")
+        await content_monitor.run_monitoring_cycle()
+    
+    async def _backfill_schedule(self, job: ScheduledJob, now: float) -> Optional[float]:
+        """Догрузка истории: пока есть незавершенные задачи, по мере появления токенов"""
+        return backfill_manager.next_run_time(now)
+    
+    async def _digest_schedule(self, job: ScheduledJob, now: float) -> Optional[float]:
+        """Дайджест: ближайшее наступление digest_time (локальное время), не чаще раза в сутки"""
+        settings = await db.get_digest_settings(config.ADMIN_ID)
+        if not settings:
+            return None
+        hours, minutes = map(int, settings['digest_time'].split(':'))
+        current = datetime.fromtimestamp(now)
+        fire_at = current.replace(hour=hours, minute=minutes, second=0, microsecond=0)
         
-        while self.running:
-            try:
-                # Запускаем мониторинг
-                await content_monitor.run_monitoring_cycle()
-                
-                # Ждем до следующего цикла (оставляем только основную задержку)
-                interval_minutes = config.MONITORING_INTERVAL_MINUTES
-                logger.info(f"Следующий цикл мониторинга через {interval_minutes} минут")
-                await asyncio.sleep(interval_minutes * 60)
-                
-            except Exception as e:
-                logger.error(f"Ошибка в цикле мониторинга: {e}")
-                # При ошибке ждем 5 минут и пробуем снова
-                await asyncio.sleep(5 * 60)
+        already_sent_today = False
+        if settings['last_sent']:
+            last_sent = datetime.fromisoformat(settings['last_sent'])
+            already_sent_today = last_sent.date() == current.date()
+        # Этот запуск уже выполнялся в текущем процессе
+        if job.last_run is not None and fire_at.timestamp() <= job.last_run:
+            already_sent_today = True
+        # Минута отправки уже прошла или дайджест сегодня уже был - переносим на завтра
+        if fire_at + timedelta(minutes=1) <= current or already_sent_today:
+            fire_at += timedelta(days=1)
+        return max(now, fire_at.timestamp())
+    
+    async def _run_digest_job(self):
+        """
+        Отправка ежедневного дайджеста. Минуту отправки выбирает _digest_schedule, здесь
+        проверяется только, что сегодня дайджест еще не уходил: таймер мог сработать
+        с опозданием (за долгим циклом мониторинга), и дайджест дня не должен теряться.
+        """
+        await self._send_digest_once_a_day()
     
     async def run_manual_monitoring(self):
         """Запуск мониторинга вручную"""
         logger.info("Запуск ручного мониторинга")
         try:
-            await content_monitor.run_monitoring_cycle()
+            await content_monitor.run_monitoring_cycle(force=True)
             return True
         except Exception as e:
             logger.error(f"Ошибка ручного мониторинга: {e}")
             return False
     
-    async def _check_digest_time(self, current_time_str: str):
-        """Проверяет, нужно ли отправить дайджест"""
+    async def _send_digest_once_a_day(self):
+        """Отправляет дайджест, если сегодня он еще не отправлялся"""
         try:
             # Получаем настройки дайджеста для админа
             settings = await db.get_digest_settings(config.ADMIN_ID)
@@ -113,10 +274,6 @@ class TaskScheduler:
             if not settings:
                 return
             
-            # Проверяем время
-            if settings['digest_time'] != current_time_str:
-                return
-            
             # Проверяем, не отправляли ли уже сегодня
             if settings['last_sent']:
                 last_sent = datetime.fromisoformat(settings['last_sent'])
@@ -128,10 +285,11 @@ class TaskScheduler:
             
             if self.bot_instance:
                 await send_daily_digest(self.bot_instance, config.ADMIN_ID)
-                logger.info(f"Автоматический дайджест отправлен в {current_time_str}")
+                logger.info(f"Автоматический дайджест отправлен в {datetime.now():%H:%M} "
+                            f"(запланирован на {settings['digest_time']})")
             
         except Exception as e:
-            logger.error(f"Ошибка проверки времени дайджеста: {e}")
+            logger.error(f"Ошибка отправки дайджеста по расписанию: {e}")
     
     async def send_manual_digest(self, bot):
         """Отправка дайджеста вручную"""
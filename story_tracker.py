@@ -0,0 +1,201 @@
+"""
+Группировка сообщений разных каналов в сюжеты и поиск "горячих" сюжетов
+(много источников за короткое время) прямо в потоке мониторинга
+"""
+
+import math
+import re
+import time
+from collections import Counter, deque
+from typing import Deque, Dict, List, Optional, Set, Tuple
+
+from config import config
+
+# Сколько самых характерных слов описывают одно сообщение
+_ITEM_TERMS = 15
+# Минимум общих характерных слов для попадания в сюжет
+_MIN_SHARED_TERMS = 2
+# Вес найденного ключевого слова относительно обычного слова текста
+_KEYWORD_WEIGHT = 2.0
+
+_TAG_RE = re.compile(r'<[^>]+>')
+_URL_RE = re.compile(r'https?://\S+|t\.me/\S+|@\w+')
+_WORD_RE = re.compile(r'\w{4,}')
+
+
+def _terms(text: str, keywords: List[str]) -> Counter:
+    """Частоты слов сообщения (без разметки, ссылок и упоминаний) и найденных ключевых слов"""
+    text = _URL_RE.sub(' ', _TAG_RE.sub(' ', text or '').lower())
+    terms = Counter(word for word in _WORD_RE.findall(text) if not word.isdigit())
+    for keyword in keywords or []:
+        terms[keyword.lower()] += _KEYWORD_WEIGHT
+    return terms
+
+
+def _headline(text: str) -> str:
+    """Первая непустая строка текста без разметки (до 200 символов)"""
+    for line in _TAG_RE.sub('', text or '').splitlines():
+        line = line.strip()
+        if line:
+            return line[:200]
+    return ''
+
+
+class Story:
+    """Сюжет: сообщения разных источников об одном и том же"""
+
+    def __init__(self, story_id: int, now: float):
+        self.id = story_id
+        self.first_seen = now
+        self.last_seen = now
+        self.terms: Counter = Counter()
+        self.keywords: Counter = Counter()
+        self.sources: Dict[str, float] = {}
+        self.draft_ids: List[int] = []
+        self.headline = ''
+        self.mentions = 0
+        self.alerted = False
+
+    def sources_since(self, since: float) -> int:
+        return sum(1 for seen in self.sources.values() if seen >= since)
+
+
+class StoryTracker:
+    """
+    Инкрементальная кластеризация в памяти за скользящее окно STORY_WINDOW_MINUTES.
+
+    • сообщение описывается самыми характерными словами (tf-idf по сообщениям окна)
+      и ключевыми словами из check_keywords;
+    • кандидаты ищутся по обратному индексу слово -> сюжеты, без запросов к БД;
+    • репосты, уже объединенные с черновиком (near_duplicates), сразу попадают в его сюжет;
+    • сюжет поднимает тревогу один раз: при STORY_ALERT_SOURCES разных источниках
+      за окно или STORY_VELOCITY_SOURCES источниках за STORY_VELOCITY_MINUTES.
+    """
+
+    def __init__(self):
+        self.window = config.STORY_WINDOW_MINUTES * 60
+        self.stories: Dict[int, Story] = {}
+        self._term_stories: Dict[str, Set[int]] = {}
+        self._draft_story: Dict[int, int] = {}
+        self._document_freq: Counter = Counter()
+        self._items: Deque[Tuple[float, Tuple[str, ...]]] = deque()
+        self._next_id = 1
+        self._stories_evicted_at = 0.0
+        self.alerts = 0
+
+    def _evict(self, now: float):
+        border = now - self.window
+        while self._items and self._items[0][0] < border:
+            _, terms = self._items.popleft()
+            self._document_freq.subtract(terms)
+            for term in terms:
+                if self._document_freq[term] <= 0:
+                    del self._document_freq[term]
+        # Устаревшие сюжеты ищутся полным проходом, поэтому не чаще раза в минуту
+        if now - self._stories_evicted_at < 60:
+            return
+        self._stories_evicted_at = now
+        for story_id in [sid for sid, story in self.stories.items() if story.last_seen < border]:
+            story = self.stories.pop(story_id)
+            for term in story.terms:
+                stories = self._term_stories.get(term)
+                if stories is not None:
+                    stories.discard(story_id)
+                    if not stories:
+                        del self._term_stories[term]
+            for draft_id in story.draft_ids:
+                self._draft_story.pop(draft_id, None)
+
+    def _idf(self, term: str) -> float:
+        return math.log((len(self._items) + 1) / (self._document_freq.get(term, 0) + 1)) + 1
+
+    def _features(self, terms: Counter) -> Dict[str, float]:
+        """Самые характерные слова сообщения с весами tf-idf"""
+        weighted = {term: count * self._idf(term) for term, count in terms.items()}
+        top = sorted(weighted.items(), key=lambda item: item[1], reverse=True)[:_ITEM_TERMS]
+        return dict(top)
+
+    def _match(self, features: Dict[str, float]) -> Optional[Story]:
+        total = sum(features.values())
+        if not total:
+            return None
+        shared: Dict[int, List[str]] = {}
+        for term in features:
+            for story_id in self._term_stories.get(term, ()):
+                shared.setdefault(story_id, []).append(term)
+        best, best_score = None, config.STORY_SIMILARITY
+        for story_id, terms in shared.items():
+            if len(terms) < _MIN_SHARED_TERMS:
+                continue
+            score = sum(features[term] for term in terms) / total
+            if score >= best_score:
+                best, best_score = self.stories[story_id], score
+        return best
+
+    def observe(self, source_name: str, text: str, keywords: List[str],
+                draft_id: Optional[int] = None, now: float = None) -> Optional[Story]:
+        """
+        Учитывает новое сообщение. draft_id - черновик, которым стало сообщение
+        или к которому оно прикреплено как похожее.
+        Возвращает сюжет, если он только что стал "горячим".
+        """
+        now = time.time() if now is None else now
+        self._evict(now)
+
+        terms = _terms(text, keywords)
+        self._items.append((now, tuple(terms)))
+        self._document_freq.update(terms.keys())
+        features = self._features(terms)
+
+        story = None
+        if draft_id is not None and draft_id in self._draft_story:
+            story = self.stories.get(self._draft_story[draft_id])
+        if story is None:
+            story = self._match(features)
+        if story is None:
+            story = Story(self._next_id, now)
+            self._next_id += 1
+            self.stories[story.id] = story
+
+        if not story.headline:
+            story.headline = _headline(text)
+        story.last_seen = now
+        story.mentions += 1
+        story.sources.setdefault(source_name, now)
+        story.keywords.update(keyword.lower() for keyword in keywords or [])
+        for term, weight in features.items():
+            story.terms[term] += weight
+            self._term_stories.setdefault(term, set()).add(story.id)
+        if draft_id is not None and draft_id not in self._draft_story:
+            self._draft_story[draft_id] = story.id
+            story.draft_ids.append(draft_id)
+
+        if not story.alerted and self._is_hot(story, now):
+            story.alerted = True
+            self.alerts += 1
+            return story
+        return None
+
+    def _is_hot(self, story: Story, now: float) -> bool:
+        if len(story.sources) >= config.STORY_ALERT_SOURCES:
+            return True
+        recent = story.sources_since(now - config.STORY_VELOCITY_MINUTES * 60)
+        return recent >= config.STORY_VELOCITY_SOURCES
+
+    def top_stories(self, limit: int = 10) -> List[Story]:
+        """Активные сюжеты окна: больше источников и свежее - выше"""
+        self._evict(time.time())
+        stories = [story for story in self.stories.values() if len(story.sources) > 1]
+        stories.sort(key=lambda story: (len(story.sources), story.last_seen), reverse=True)
+        return stories[:limit]
+
+    def get_stats(self) -> Dict:
+        return {
+            'stories': len(self.stories),
+            'multi_source': sum(1 for story in self.stories.values() if len(story.sources) > 1),
+            'alerts': self.alerts,
+        }
+
+
+# Глобальный трекер сюжетов
+story_tracker = StoryTracker()
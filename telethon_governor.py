@@ -0,0 +1,161 @@
+"""
+Регулятор запросов Telethon: лимит на каждый метод API, учет FloodWait
+и кэш сущностей каналов
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Tuple
+
+try:
+    from telethon.errors import FloodWaitError
+except ImportError:
+    FloodWaitError = None
+
+from config import config
+from outbound_queue import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class RequestDeferred(Exception):
+    """Запрос не выполнен из-за лимита Telegram: работу нужно перенести на retry_after секунд"""
+
+    def __init__(self, method: str, retry_after: float):
+        super().__init__(f"{method}: лимит, повтор через {retry_after:.0f} сек")
+        self.method = method
+        self.retry_after = retry_after
+
+
+class MethodBudget:
+    """Лимит одного метода API: ведро токенов, время окончания FloodWait и статистика"""
+
+    def __init__(self, name: str, per_minute: float, burst: int):
+        self.name = name
+        self.per_minute = per_minute
+        self.bucket = TokenBucket(per_minute / 60, burst)
+        self.flood_until = 0.0
+        self.calls = 0
+        self.waited = 0.0
+        self.flood_waits = 0
+        self.deferred = 0
+        self._recent: Deque[float] = deque()
+
+    def wait_time(self) -> float:
+        return max(self.flood_until - time.time(), self.bucket.delay())
+
+    def record_call(self):
+        now = time.monotonic()
+        self.calls += 1
+        self._recent.append(now)
+        while self._recent and self._recent[0] < now - 60:
+            self._recent.popleft()
+
+    def calls_last_minute(self) -> int:
+        border = time.monotonic() - 60
+        while self._recent and self._recent[0] < border:
+            self._recent.popleft()
+        return len(self._recent)
+
+
+class TelethonGovernor:
+    """
+    Все запросы мониторинга к Telegram идут через call():
+
+    • у каждого метода свое ведро токенов (TG_*_PER_MINUTE), небольшой запас TG_REQUEST_BURST
+      растягивает запросы равномерно вместо пачек;
+    • короткое ожидание (до TG_MAX_INLINE_WAIT_SECONDS) выполняется на месте,
+      более долгое превращается в RequestDeferred - вызывающий переносит работу;
+    • FloodWaitError останавливает метод на указанное время для всех вызывающих;
+    • сущности каналов кэшируются на TG_ENTITY_CACHE_HOURS (resolve username дорогой).
+    """
+
+    def __init__(self):
+        self.budgets: Dict[str, MethodBudget] = {
+            'get_messages': MethodBudget('get_messages', config.TG_GET_MESSAGES_PER_MINUTE,
+                                         config.TG_REQUEST_BURST),
+            'get_entity': MethodBudget('get_entity', config.TG_GET_ENTITY_PER_MINUTE,
+                                       config.TG_REQUEST_BURST),
+        }
+        self._entities: Dict[str, Tuple[Any, float]] = {}
+        self.entity_hits = 0
+
+    def _budget(self, method: str) -> MethodBudget:
+        budget = self.budgets.get(method)
+        if budget is None:
+            budget = self.budgets[method] = MethodBudget(
+                method, config.TG_REQUESTS_PER_MINUTE, config.TG_REQUEST_BURST
+            )
+        return budget
+
+    async def call(self, method: str, func: Callable[..., Awaitable], *args, **kwargs):
+        """Выполняет запрос с учетом лимита метода"""
+        budget = self._budget(method)
+        retried = False
+        while True:
+            wait = budget.wait_time()
+            while wait > 0:
+                if wait > config.TG_MAX_INLINE_WAIT_SECONDS:
+                    budget.deferred += 1
+                    raise RequestDeferred(method, wait)
+                budget.waited += wait
+                await asyncio.sleep(wait)
+                wait = budget.wait_time()
+
+            budget.bucket.consume()
+            budget.record_call()
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                if FloodWaitError is None or not isinstance(e, FloodWaitError):
+                    raise
+                budget.flood_waits += 1
+                budget.flood_until = max(budget.flood_until, time.time() + e.seconds)
+                budget.bucket.pause(e.seconds)
+                logger.warning(f"Telethon: FloodWait {e.seconds} сек для {method}")
+                if retried or e.seconds > config.TG_MAX_INLINE_WAIT_SECONDS:
+                    budget.deferred += 1
+                    raise RequestDeferred(method, e.seconds)
+                retried = True
+
+    async def get_entity(self, client, peer: str):
+        """Сущность канала из кэша или через лимитированный запрос"""
+        key = peer.lower() if isinstance(peer, str) else peer
+        cached = self._entities.get(key)
+        if cached and cached[1] > time.monotonic():
+            self.entity_hits += 1
+            return cached[0]
+        entity = await self.call('get_entity', client.get_entity, peer)
+        self._entities[key] = (entity, time.monotonic() + config.TG_ENTITY_CACHE_HOURS * 3600)
+        return entity
+
+    async def get_messages(self, client, entity, **kwargs):
+        return await self.call('get_messages', client.get_messages, entity, **kwargs)
+
+    def get_stats(self) -> Dict:
+        """Насколько близко к лимитам каждого метода (для /bot_status)"""
+        methods = {}
+        now = time.time()
+        for name, budget in self.budgets.items():
+            last_minute = budget.calls_last_minute()
+            methods[name] = {
+                'calls': budget.calls,
+                'last_minute': last_minute,
+                'limit_per_minute': budget.per_minute,
+                'utilization': last_minute / budget.per_minute if budget.per_minute else 0.0,
+                'waited_seconds': budget.waited,
+                'flood_waits': budget.flood_waits,
+                'deferred': budget.deferred,
+                'flood_remaining': max(0.0, budget.flood_until - now),
+            }
+        return {
+            'methods': methods,
+            'entity_cache_size': len(self._entities),
+            'entity_cache_hits': self.entity_hits,
+        }
+
+
+# Глобальный регулятор запросов
+telethon_governor = TelethonGovernor()
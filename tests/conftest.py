@@ -0,0 +1,25 @@
+"""Общие фикстуры: временная БД вместо глобальной database.db"""
+
+import sys
+
+import pytest
+
+from database import Database
+
+
+@pytest.fixture
+def temp_db(tmp_path, monkeypatch):
+    """
+    Фабрика временной БД: открывается внутри asyncio.run теста и подставляется
+    во все уже импортированные модули вместо глобального database.db.
+    Закрывать ее должен сам тест (await db.close()).
+    """
+    async def open_db() -> Database:
+        test_db = Database(str(tmp_path / 'test.db'), read_pool_size=1)
+        await test_db.init_db()
+        for name in ('database', 'content_monitor', 'outbound_queue', 'scheduler', 'handlers', 'backfill'):
+            module = sys.modules.get(name)
+            if module is not None and hasattr(module, 'db'):
+                monkeypatch.setattr(module, 'db', test_db)
+        return test_db
+    return open_db
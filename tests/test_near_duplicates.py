@@ -0,0 +1,65 @@
+"""Скользящее окно NearDuplicateIndex при удалении и переименовании ключей"""
+
+from types import SimpleNamespace
+
+import pytest
+
+import near_duplicates
+from near_duplicates import NearDuplicateIndex, minhash_signature
+
+TEXT = 'Центробанк сохранил ключевую ставку на прежнем уровне по итогам заседания совета директоров'
+OTHER = 'Сборная выиграла финал чемпионата мира по хоккею в овертайме со счетом три два'
+HOUR = 3600
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Управляемое время индекса (time.time внутри near_duplicates)"""
+    state = SimpleNamespace(now=1_700_000_000.0)
+    monkeypatch.setattr(near_duplicates, 'time', SimpleNamespace(time=lambda: state.now))
+    return state
+
+
+@pytest.fixture
+def index(clock):
+    return NearDuplicateIndex(threshold=0.5, window_hours=1)
+
+
+def test_find_after_window_expires(index, clock):
+    index.add(1, minhash_signature(TEXT), clock.now - 2 * HOUR)
+    index.add(2, minhash_signature(OTHER), clock.now - 60)
+    assert index.find(minhash_signature(TEXT)) is None
+    assert index.find(minhash_signature(OTHER))[0] == 2
+    assert len(index) == 1
+
+
+def test_find_after_remove(index, clock):
+    index.add(('new', 0), minhash_signature(TEXT))
+    index.remove(('new', 0))
+    assert index.find(minhash_signature(TEXT)) is None
+    assert len(index) == 0
+
+
+def test_removed_key_does_not_evict_reused_key(index, clock):
+    # Временный ключ прошлой пачки был старым и удален, новая пачка снова использует ('new', 0)
+    index.add(('new', 0), minhash_signature(TEXT), clock.now - 2 * HOUR)
+    index.remove(('new', 0))
+    index.add(('new', 0), minhash_signature(TEXT))
+    assert index.find(minhash_signature(TEXT))[0] == ('new', 0)
+    assert len(index) == 1
+
+
+def test_find_after_replace_key(index, clock):
+    index.add(('new', 0), minhash_signature(TEXT), clock.now - 30 * 60)
+    index.replace_key(('new', 0), 42)
+    assert index.find(minhash_signature(TEXT))[0] == 42
+    assert len(index) == 1
+
+    # Переименование сохраняет время добавления: ключ уходит из окна вовремя
+    clock.now += 31 * 60
+    assert index.find(minhash_signature(TEXT)) is None
+    assert len(index) == 0
+
+    # Временного ключа не осталось
+    index.replace_key(('new', 0), 43)
+    assert len(index) == 0
@@ -0,0 +1,173 @@
+"""Сводка новых постов: страницы, листание notify_page_* и хранение состава сводки"""
+
+import asyncio
+from types import SimpleNamespace
+
+import content_monitor as content_monitor_module
+import handlers
+from config import ADMIN_USERS, config
+from content_monitor import ContentMonitor
+from database import Database
+
+
+def _draft(draft_id: int) -> dict:
+    return {
+        'id': draft_id,
+        'source_type': 'telegram',
+        'source_name': '@news',
+        'source_url': f'https://t.me/news/{draft_id}',
+        'original_text': f'<b>ЦБ</b> поднял ставку &amp; курс #{draft_id}',
+        'keywords_matched': ['ставку'],
+    }
+
+
+def _callbacks(markup) -> list:
+    return [[button.callback_data for button in row] for row in markup.inline_keyboard]
+
+
+class FakeCallback:
+    def __init__(self, data: str):
+        self.data = data
+        self.from_user = SimpleNamespace(id=ADMIN_USERS[0])
+        self.edited = []
+        self.answers = []
+        self.message = SimpleNamespace(edit_text=self._edit_text)
+
+    async def _edit_text(self, text, parse_mode=None, reply_markup=None):
+        self.edited.append((text, reply_markup))
+
+    async def answer(self, text=None, show_alert=False):
+        self.answers.append(text)
+
+
+def test_summary_pages(monkeypatch):
+    monkeypatch.setattr(config, 'NOTIFY_SUMMARY_PAGE_SIZE', 5)
+    monitor = ContentMonitor()
+    drafts = [_draft(i) for i in range(1, 13)]
+
+    text, markup = monitor.build_notification_summary(7, 12, drafts[:5], 1)
+    assert 'Найдено новых постов: 12' in text
+    assert 'Страница 1/3' in text
+    assert '<i>ЦБ поднял ставку &amp; курс #1</i>' in text
+    rows = _callbacks(markup)
+    assert [row[0] for row in rows[:-1]] == [f'new_post_details_{i}' for i in range(1, 6)]
+    assert rows[-1] == ['notify_page_7_1', 'notify_page_7_2']
+
+    text, markup = monitor.build_notification_summary(7, 12, drafts[10:], 3)
+    assert 'Страница 3/3' in text
+    rows = _callbacks(markup)
+    assert len(rows) == 3
+    assert rows[-1] == ['notify_page_7_2', 'notify_page_7_3']
+
+    # Одна страница - без навигации
+    _, markup = monitor.build_notification_summary(7, 3, drafts[:3], 1)
+    assert len(_callbacks(markup)) == 3
+
+
+def test_notify_page_callback(temp_db, monkeypatch):
+    monkeypatch.setattr(config, 'NOTIFY_SUMMARY_PAGE_SIZE', 5)
+
+    async def scenario():
+        db = await temp_db()
+        try:
+            draft_ids = await db.add_content_drafts([_draft(i) for i in range(1, 13)])
+            batch_id = await db.add_notification_batch(draft_ids)
+
+            callback = FakeCallback(f'notify_page_{batch_id}_2')
+            await handlers.callback_notify_page(callback)
+            text, markup = callback.edited[-1]
+            assert 'Страница 2/3' in text
+            assert [row[0] for row in _callbacks(markup)[:-1]] == [
+                f'new_post_details_{draft_id}' for draft_id in draft_ids[5:10]
+            ]
+            assert _callbacks(markup)[-1] == [
+                f'notify_page_{batch_id}_1', f'notify_page_{batch_id}_2', f'notify_page_{batch_id}_3'
+            ]
+
+            # Номер страницы за пределами сводки приводится к последней
+            callback = FakeCallback(f'notify_page_{batch_id}_9')
+            await handlers.callback_notify_page(callback)
+            assert 'Страница 3/3' in callback.edited[-1][0]
+
+            callback = FakeCallback('notify_page_999_1')
+            await handlers.callback_notify_page(callback)
+            assert callback.answers == ['❌ Сводка не найдена']
+            assert not callback.edited
+        finally:
+            await db.close()
+
+    asyncio.run(scenario())
+
+
+def test_summary_batch_is_stored_outside_settings(temp_db, monkeypatch):
+    monkeypatch.setattr(config, 'NOTIFY_COALESCE_MIN_DRAFTS', 3)
+    monkeypatch.setattr(config, 'NOTIFY_RELEVANCE_THRESHOLD', 3)
+
+    async def scenario():
+        db = await temp_db()
+        try:
+            sent = []
+
+            async def enqueue_many(messages, priority=False):
+                sent.extend(messages)
+            monkeypatch.setattr(content_monitor_module.outbound_queue, 'enqueue_many', enqueue_many)
+
+            monitor = ContentMonitor()
+            monitor._pending_notifications = [_draft(i) for i in (1, 2, 3)]
+            await monitor.flush_notifications()
+
+            assert len(sent) == len(ADMIN_USERS)
+            async with db.transaction() as conn:
+                cursor = await conn.execute('SELECT id FROM notification_batches')
+                (batch_id,), = await cursor.fetchall()
+                cursor = await conn.execute("SELECT COUNT(*) FROM settings WHERE key LIKE 'notify_batch%'")
+                assert (await cursor.fetchone())[0] == 0
+            assert await monitor.get_notification_batch(batch_id) == [1, 2, 3]
+        finally:
+            await db.close()
+
+    asyncio.run(scenario())
+
+
+def test_old_batches_expire(temp_db):
+    async def scenario():
+        db = await temp_db()
+        try:
+            old_id = await db.add_notification_batch([1, 2, 3])
+            async with db.transaction() as conn:
+                await conn.execute(
+                    "UPDATE notification_batches SET created_at = datetime('now', '-4 days') WHERE id = ?",
+                    (old_id,)
+                )
+            fresh_id = await db.add_notification_batch([4])
+            assert await db.prune_notification_batches(72) == 1
+            assert await db.get_notification_batch(old_id) == []
+            assert await db.get_notification_batch(fresh_id) == [4]
+        finally:
+            await db.close()
+
+    asyncio.run(scenario())
+
+
+def test_migration_moves_batches_out_of_settings(tmp_path):
+    async def scenario():
+        path = str(tmp_path / 'old.db')
+        db = Database(path, read_pool_size=1)
+        await db.init_db()
+        async with db.transaction() as conn:
+            await conn.execute('DELETE FROM notification_batches')
+            await conn.execute("INSERT INTO settings (key, value) VALUES ('notify_batch_1700000000000', '[5, 6]')")
+            await conn.execute("INSERT INTO settings (key, value) VALUES ('notify_batchless', 'x')")
+            await conn.execute('PRAGMA user_version = 5')
+        await db.close()
+
+        db = Database(path, read_pool_size=1)
+        await db.init_db()
+        try:
+            assert await db.get_notification_batch(1700000000000) == [5, 6]
+            assert await db.get_setting('notify_batch_1700000000000') is None
+            assert await db.get_setting('notify_batchless') == 'x'
+        finally:
+            await db.close()
+
+    asyncio.run(scenario())
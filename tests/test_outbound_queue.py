@@ -0,0 +1,116 @@
+"""Очередь отправки: доставленное не повторяется, сбои не блокируют чат, срочность переживает перезапуск"""
+
+import asyncio
+
+from config import config
+from outbound_queue import OutboundQueue
+
+
+class FakeBot:
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.sent = []
+
+    async def send_message(self, chat_id, text, parse_mode=None, reply_markup=None):
+        if self.error:
+            raise self.error
+        self.sent.append((chat_id, text))
+
+
+def test_delivered_message_is_not_resent_when_db_delete_fails(temp_db, monkeypatch):
+    async def scenario():
+        db = await temp_db()
+        try:
+            queue = OutboundQueue()
+            queue.bot = FakeBot()
+            await queue.enqueue(1, 'первое')
+
+            delete = db.delete_outbound_message
+
+            async def broken_delete(message_id):
+                raise OSError('database is locked')
+            monkeypatch.setattr(db, 'delete_outbound_message', broken_delete)
+
+            item = queue._chats[1][0]
+            assert await queue._deliver(item)
+            assert queue.pending == 0
+            assert queue.bot.sent == [(1, 'первое')]
+
+            # Следующее удаление дочищает и то, что не удалось удалить раньше
+            monkeypatch.setattr(db, 'delete_outbound_message', delete)
+            await queue.enqueue(1, 'второе')
+            assert await queue._deliver(queue._chats[1][0])
+            assert queue.bot.sent == [(1, 'первое'), (1, 'второе')]
+            assert await db.get_outbound_messages() == []
+        finally:
+            await db.close()
+
+    asyncio.run(scenario())
+
+
+def test_unexpected_error_counts_attempts_and_drops_item(temp_db, monkeypatch):
+    monkeypatch.setattr(config, 'OUTBOUND_MAX_ATTEMPTS', 3)
+
+    async def scenario():
+        db = await temp_db()
+        try:
+            queue = OutboundQueue()
+            queue.bot = FakeBot(error=ValueError('испорченная клавиатура'))
+            await queue.enqueue(1, 'сообщение')
+            item = queue._chats[1][0]
+
+            assert not await queue._deliver(item)
+            assert not await queue._deliver(item)
+            assert (await db.get_outbound_messages())[0]['attempts'] == 2
+            assert await queue._deliver(item)
+            assert queue.pending == 0
+            assert queue.failed == 1
+            assert await db.get_outbound_messages() == []
+        finally:
+            await db.close()
+
+    asyncio.run(scenario())
+
+
+def test_priority_survives_restart(temp_db):
+    async def scenario():
+        db = await temp_db()
+        try:
+            queue = OutboundQueue()
+            await queue.enqueue(1, 'обычное')
+            await queue.enqueue(1, 'срочное', priority=True)
+
+            restarted = OutboundQueue()
+            await restarted._load_pending()
+            assert [item['text'] for item in restarted._chats[1]] == ['срочное', 'обычное']
+        finally:
+            await db.close()
+
+    asyncio.run(scenario())
+
+
+def test_run_loop_survives_broken_item(temp_db, monkeypatch):
+    monkeypatch.setattr(config, 'OUTBOUND_MAX_ATTEMPTS', 1)
+
+    async def scenario():
+        db = await temp_db()
+        try:
+            queue = OutboundQueue()
+            bot = FakeBot()
+            await queue.enqueue_many([
+                {'chat_id': 1, 'text': 'битое'},
+                {'chat_id': 1, 'text': 'нормальное'},
+            ])
+            # Клавиатура, которую нельзя разобрать
+            queue._chats[1][0]['reply_markup'] = '{'
+            await queue.start(bot)
+            for _ in range(50):
+                if bot.sent:
+                    break
+                await asyncio.sleep(0.05)
+            await queue.stop()
+            assert bot.sent == [(1, 'нормальное')]
+        finally:
+            await db.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,82 @@
+"""
+Планы горячих запросов (EXPLAIN QUERY PLAN): ни один не должен обходить таблицу
+целиком или сортировать результат во временном дереве.
+
+SQL берется из тех же констант database.py, что выполняют методы Database.
+"""
+
+import asyncio
+
+import pytest
+
+from database import Database, HOT_QUERIES, KNOWN_SOURCES_CHUNK, known_sources_sql
+
+
+def _bad_steps(plan):
+    return [step for step in plan if step.startswith('SCAN ') or 'TEMP B-TREE' in step]
+
+
+async def _fill(db: Database):
+    """Несколько тысяч строк и ANALYZE: планировщик выбирает план по статистике, а не по пустым таблицам"""
+    statuses = ['new', 'processed', 'deleted', 'skipped']
+    async with db.transaction() as conn:
+        await conn.executemany('''
+            INSERT INTO content_drafts (source_type, source_name, original_text, source_url, status, minhash)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', [
+            ('tg' if i % 3 else 'rss', f'@channel{i % 50}', f'текст поста {i}',
+             f'https://t.me/channel{i % 50}/{i}', statuses[i % 4], b'\x00' * 256 if i % 2 else None)
+            for i in range(3000)
+        ])
+        await conn.executemany('''
+            INSERT INTO draft_sources (draft_id, source_type, source_name, source_url)
+            VALUES (?, 'tg', '@repost', ?)
+        ''', [(i + 1, f'https://t.me/repost/{i}') for i in range(500)])
+        await conn.executemany('''
+            INSERT INTO published_posts (draft_id, original_text, published_text, channel_id)
+            VALUES (?, 'текст', 'текст', '@target')
+        ''', [(i + 1,) for i in range(1000)])
+        await conn.executemany('''
+            INSERT INTO action_logs (user_id, action_type, target_type, target_id)
+            VALUES (1, ?, 'draft', ?)
+        ''', [(['publish', 'delete', 'edit'][i % 3], i) for i in range(2000)])
+        await conn.execute('ANALYZE')
+
+
+async def _explain(tmp_path, fill: bool):
+    db = Database(str(tmp_path / 'plans.db'), read_pool_size=1)
+    await db.init_db()
+    try:
+        if fill:
+            await _fill(db)
+        plans = {plan['name']: plan['plan'] for plan in await db.explain_hot_queries()}
+        async with db._read() as conn:
+            for count in (1, KNOWN_SOURCES_CHUNK):
+                params = ['tg', *[f'u{i}' for i in range(count)]] * 2
+                cursor = await conn.execute(f'EXPLAIN QUERY PLAN {known_sources_sql(count)}', params)
+                plans[f'get_known_sources[{count}]'] = [row[3] for row in await cursor.fetchall()]
+        return plans
+    finally:
+        await db.close()
+
+
+@pytest.fixture(scope='module', params=[False, True], ids=['empty', 'filled'])
+def plans(request, tmp_path_factory):
+    return asyncio.run(_explain(tmp_path_factory.mktemp('plans'), request.param))
+
+
+HOT_QUERY_NAMES = [name for name, _, _ in HOT_QUERIES] + [
+    'get_known_sources[1]', f'get_known_sources[{KNOWN_SOURCES_CHUNK}]'
+]
+
+
+@pytest.mark.parametrize('name', HOT_QUERY_NAMES)
+def test_hot_query_uses_index(plans, name):
+    plan = plans[name]
+    assert plan, f"{name}: пустой план"
+    assert not _bad_steps(plan), f"{name}: {plan}"
+
+
+def test_dedup_lookups_are_checked():
+    names = {name for name, _, _ in HOT_QUERIES}
+    assert {'check_content_exists', 'get_known_sources'} <= names
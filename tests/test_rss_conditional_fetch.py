@@ -0,0 +1,131 @@
+"""Условная загрузка RSS: 304, совпадающий хэш тела и пустая лента не разбираются повторно"""
+
+import asyncio
+from email.utils import format_datetime
+from datetime import datetime, timezone
+
+import content_monitor as content_monitor_module
+from config import config
+from content_monitor import ContentMonitor
+from ingest_executor import ingest_executor
+
+URL = 'https://example.com/feed.xml'
+SOURCE_KEY = f'rss_{URL}'
+
+
+def _feed(*titles: str) -> bytes:
+    pub_date = format_datetime(datetime.now(timezone.utc))
+    items = ''.join(
+        f'<item><title>{title}</title><link>https://example.com/{i}</link>'
+        f'<pubDate>{pub_date}</pubDate></item>'
+        for i, title in enumerate(titles)
+    )
+    return f'<?xml version="1.0"?><rss version="2.0"><channel><title>Лента</title>{items}</channel></rss>'.encode()
+
+
+class FakeResponse:
+    def __init__(self, status: int, body: bytes = b'', headers: dict = None):
+        self.status = status
+        self.body = body
+        self.headers = {'Content-Type': 'application/rss+xml', **(headers or {})}
+        self.content_length = len(body)
+        self.content = self
+
+    async def iter_chunked(self, size):
+        yield self.body
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeSession:
+    """Сервер ленты: ETag поддерживается, если задан, иначе всегда 200 с телом"""
+
+    def __init__(self, body: bytes, etag: str = None):
+        self.body = body
+        self.etag = etag
+        self.requests = []
+        self.closed = False
+
+    def get(self, url, headers=None):
+        self.requests.append(dict(headers or {}))
+        if self.etag and (headers or {}).get('If-None-Match') == self.etag:
+            return FakeResponse(304)
+        return FakeResponse(200, self.body, {'ETag': self.etag} if self.etag else {})
+
+
+def _run(temp_db, monkeypatch, session: FakeSession, cycles: int, fail_ingest: bool = False):
+    monkeypatch.setattr(ingest_executor, 'mode', 'none')
+    monkeypatch.setattr(config, 'NEAR_DUP_ENABLED', False)
+    monkeypatch.setattr(config, 'STORY_TRACKING_ENABLED', False)
+    parsed = []
+    parse_feed = content_monitor_module.parse_feed
+
+    def counting_parse_feed(*args):
+        parsed.append(args[0])
+        return parse_feed(*args)
+    monkeypatch.setattr(content_monitor_module, 'parse_feed', counting_parse_feed)
+
+    async def scenario():
+        db = await temp_db()
+        try:
+            monitor = ContentMonitor()
+            monitor.keywords = ['ставка']
+            monitor.session = session
+
+            async def notify(draft_id, draft=None):
+                pass
+            monitor._notify_admin_about_new_post = notify
+            if fail_ingest:
+                async def broken_ingest(drafts, live=True):
+                    raise OSError('database is locked')
+                monitor._ingest_drafts = broken_ingest
+
+            await monitor.load_source_states()
+            for _ in range(cycles):
+                await monitor._process_rss_feed(URL)
+                await monitor.flush_source_states()
+            return (await db.get_all_source_states()).get(SOURCE_KEY, {})
+        finally:
+            await db.close()
+
+    return asyncio.run(scenario()), parsed
+
+
+def test_not_modified_feed_is_not_parsed(temp_db, monkeypatch):
+    session = FakeSession(_feed('Ставка ЦБ'), etag='"v1"')
+    state, parsed = _run(temp_db, monkeypatch, session, cycles=2)
+    assert len(parsed) == 1
+    assert session.requests[1]['If-None-Match'] == '"v1"'
+    assert state['etag'] == '"v1"'
+    assert state['last_check']
+
+
+def test_same_body_without_validators_is_not_parsed(temp_db, monkeypatch):
+    session = FakeSession(_feed('Ставка ЦБ'))
+    state, parsed = _run(temp_db, monkeypatch, session, cycles=3)
+    assert len(parsed) == 1
+    assert 'If-None-Match' not in session.requests[1]
+    assert state['content_hash']
+
+
+def test_empty_feed_stores_validators_and_hash(temp_db, monkeypatch):
+    session = FakeSession(_feed(), etag='"empty"')
+    state, parsed = _run(temp_db, monkeypatch, session, cycles=2)
+    assert len(parsed) == 1
+    assert session.requests[1]['If-None-Match'] == '"empty"'
+    assert state['etag'] == '"empty"'
+    assert state['content_hash']
+    assert state['last_check']
+
+
+def test_validators_not_saved_when_processing_fails(temp_db, monkeypatch):
+    session = FakeSession(_feed('Ставка ЦБ'), etag='"v1"')
+    state, parsed = _run(temp_db, monkeypatch, session, cycles=2, fail_ingest=True)
+    # Необработанная лента запрашивается заново без условных заголовков
+    assert len(parsed) == 2
+    assert 'If-None-Match' not in session.requests[1]
+    assert not state.get('etag')
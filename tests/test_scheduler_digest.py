@@ -0,0 +1,57 @@
+"""Дайджест по расписанию: опоздавший таймер все равно отправляет дайджест, но не дважды за день"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import handlers
+from config import config
+from scheduler import TaskScheduler
+
+
+def test_late_digest_timer_still_sends_once(temp_db, monkeypatch):
+    async def scenario():
+        db = await temp_db()
+        try:
+            sent = []
+
+            async def send_daily_digest(bot, admin_id):
+                sent.append(admin_id)
+                await db.update_digest_last_sent(admin_id)
+            monkeypatch.setattr(handlers, 'send_daily_digest', send_daily_digest)
+
+            # Таймер сработал на 3 минуты позже digest_time (например, за долгим мониторингом)
+            digest_time = (datetime.now() - timedelta(minutes=3)).strftime('%H:%M')
+            await db.set_digest_time(config.ADMIN_ID, digest_time)
+
+            scheduler = TaskScheduler()
+            scheduler.bot_instance = object()
+            await scheduler._run_digest_job()
+            assert sent == [config.ADMIN_ID]
+
+            # Повторный запуск в тот же день ничего не отправляет
+            await scheduler._run_digest_job()
+            assert sent == [config.ADMIN_ID]
+        finally:
+            await db.close()
+
+    asyncio.run(scenario())
+
+
+def test_digest_schedule_after_sending_is_tomorrow(temp_db):
+    async def scenario():
+        db = await temp_db()
+        try:
+            now = datetime.now().replace(second=0, microsecond=0)
+            await db.set_digest_time(config.ADMIN_ID, (now + timedelta(minutes=10)).strftime('%H:%M'))
+            scheduler = TaskScheduler()
+            job = scheduler.jobs['digest']
+
+            fire_at = await scheduler._digest_schedule(job, now.timestamp())
+            assert fire_at == (now + timedelta(minutes=10)).timestamp()
+
+            job.last_run = fire_at
+            assert await scheduler._digest_schedule(job, fire_at + 5) == fire_at + 24 * 3600
+        finally:
+            await db.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,72 @@
+"""Счетчики stat_counters: значения триггеров совпадают с пересчетом rebuild_counters()"""
+
+import asyncio
+
+
+def _draft(i: int, source_name: str = '@news') -> dict:
+    return {
+        'source_type': 'telegram' if i % 2 else 'rss',
+        'source_name': source_name,
+        'original_text': f'текст {i}',
+        'source_url': f'https://t.me/news/{i}',
+    }
+
+
+def test_triggers_match_rebuild(temp_db):
+    async def scenario():
+        db = await temp_db()
+        try:
+            ids = await db.add_content_drafts([_draft(i, f'@channel{i % 3}') for i in range(20)])
+            for draft_id in ids[:6]:
+                await db.update_draft_status(draft_id, 'processed')
+            await db.update_draft_status(ids[6], 'deleted')
+            async with db.transaction() as conn:
+                # Смена источника и даты меняет ключи счетчиков
+                await conn.execute("UPDATE content_drafts SET source_name = '@renamed' WHERE id = ?", (ids[7],))
+                await conn.execute("UPDATE content_drafts SET created_at = datetime('now', '-3 days') "
+                                   "WHERE id IN (?, ?)", (ids[8], ids[9]))
+                await conn.execute('DELETE FROM content_drafts WHERE id IN (?, ?, ?)', (ids[10], ids[11], ids[0]))
+
+            post_ids = [await db.add_pending_post(f'текст {i}', f'переписано {i}') for i in range(5)]
+            await db.update_post_status(post_ids[0], 'published')
+            await db.update_post_status(post_ids[1], 'rejected')
+            for i, post_id in enumerate(post_ids[:3]):
+                await db.add_published_post(pending_post_id=post_id, draft_id=ids[i + 1],
+                                            original_text='текст', published_text='текст', channel_id='@target')
+            async with db.transaction() as conn:
+                await conn.execute('DELETE FROM pending_posts WHERE id = ?', (post_ids[4],))
+                await conn.execute("DELETE FROM published_posts WHERE id = (SELECT MIN(id) FROM published_posts)")
+
+            before = await db.get_dashboard_stats()
+            result = await db.rebuild_counters()
+            assert result['mismatches'] == []
+            assert await db.get_dashboard_stats() == before
+
+            assert before['drafts'] == {'new': 11, 'processed': 5, 'deleted': 1}
+            assert before['drafts_total'] == 17
+            assert before['posts'] == {'pending': 2, 'published': 1, 'rejected': 1}
+            assert before['published']['total'] == 2
+            assert sum(before['sources'].values()) == 17
+            assert {'source_type': 'telegram', 'source_name': '@renamed', 'count': 1} in before['top_sources']
+        finally:
+            await db.close()
+
+    asyncio.run(scenario())
+
+
+def test_rebuild_reports_and_fixes_drift(temp_db):
+    async def scenario():
+        db = await temp_db()
+        try:
+            await db.add_content_drafts([_draft(i) for i in range(3)])
+            async with db.transaction() as conn:
+                await conn.execute("UPDATE stat_counters SET value = 99 WHERE name = 'drafts_status' AND key = 'new'")
+            result = await db.rebuild_counters()
+            assert result['mismatches'] == [
+                {'name': 'drafts_status', 'key': 'new', 'stored': 99, 'actual': 3}
+            ]
+            assert (await db.get_dashboard_stats())['drafts'] == {'new': 3}
+        finally:
+            await db.close()
+
+    asyncio.run(scenario())
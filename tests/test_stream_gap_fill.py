@@ -0,0 +1,77 @@
+"""Досбор пропусков потокового режима: событие после разрыва не сдвигает контрольную точку опроса"""
+
+import asyncio
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import content_monitor as content_monitor_module
+from content_monitor import ContentMonitor
+from ingest_executor import ingest_executor
+
+CHANNEL = '@news'
+CHAT_ID = -1001
+TEXT = 'ЦБ снова поднял ставку'
+
+
+def _message(message_id: int):
+    return SimpleNamespace(id=message_id, text=f'{TEXT} #{message_id}', date=datetime.now(timezone.utc))
+
+
+class FakeGovernor:
+    """Канал с сообщениями 1..last_id: отдает их так же, как get_messages(min_id=..., reverse=True)"""
+
+    def __init__(self, last_id: int):
+        self.last_id = last_id
+        self.requests = []
+
+    async def get_entity(self, client, channel):
+        return channel
+
+    async def get_messages(self, client, entity, limit, min_id=0, reverse=False, **kwargs):
+        self.requests.append(min_id)
+        return [_message(i) for i in range(min_id + 1, min(self.last_id, min_id + limit) + 1)]
+
+
+def test_event_after_reconnect_does_not_skip_missed_messages(temp_db, monkeypatch):
+    monkeypatch.setattr(ingest_executor, 'mode', 'none')
+    monkeypatch.setattr(content_monitor_module.config, 'NEAR_DUP_ENABLED', False)
+    monkeypatch.setattr(content_monitor_module.config, 'STORY_TRACKING_ENABLED', False)
+
+    async def scenario():
+        db = await temp_db()
+        try:
+            monitor = ContentMonitor()
+            monitor.keywords = ['ставку']
+            notified = []
+
+            async def notify(draft_id, draft=None):
+                notified.append(draft['source_url'])
+            monitor._notify_admin_about_new_post = notify
+
+            governor = FakeGovernor(last_id=100)
+            monkeypatch.setattr(content_monitor_module, 'telethon_governor', governor)
+
+            # Опрос до разрыва: контрольная точка - сообщение 100
+            await monitor.load_source_states()
+            await monitor._update_last_message_id(f'tg_{CHANNEL}', 100)
+            await monitor.flush_source_states()
+            monitor._stream_channels = {CHAT_ID: CHANNEL}
+
+            # Разрыв (внутреннее переподключение Telethon - без флага досбора):
+            # сообщения 101-105 прошли мимо, первым после восстановления пришло событие 106
+            governor.last_id = 106
+            await monitor._on_new_message(SimpleNamespace(chat_id=CHAT_ID, message=_message(106)))
+            assert (await monitor.get_source_state(f'tg_{CHANNEL}'))['last_message_id'] == 100
+
+            # Досбор опросом забирает пропущенное, событие 106 повторно не разбирается
+            await monitor._process_telegram_channel(CHANNEL)
+            await monitor.flush_source_states()
+
+            assert governor.requests[-1] == 100
+            ids = sorted(int(url.rsplit('/', 1)[1]) for url in notified)
+            assert ids == [101, 102, 103, 104, 105, 106]
+            assert (await db.get_all_source_states())[f'tg_{CHANNEL}']['last_message_id'] == 106
+        finally:
+            await db.close()
+
+    asyncio.run(scenario())
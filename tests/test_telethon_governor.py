@@ -0,0 +1,48 @@
+"""FloodWait Telethon доходит до регулятора и превращается в перенос работы"""
+
+import asyncio
+
+import pytest
+from telethon.errors import FloodWaitError
+
+import content_monitor as content_monitor_module
+from config import config
+from content_monitor import ContentMonitor
+from telethon_governor import RequestDeferred, TelethonGovernor
+
+
+def test_client_does_not_sleep_through_flood_waits(monkeypatch):
+    created = {}
+
+    class FakeClient:
+        def __init__(self, *args, **kwargs):
+            created.update(kwargs)
+
+        async def start(self, phone=None):
+            return self
+
+    monkeypatch.setattr(content_monitor_module, 'TelegramClient', FakeClient)
+    monkeypatch.setattr(config, 'validate_telethon', lambda: None)
+    assert asyncio.run(ContentMonitor().init_telethon())
+    assert created['flood_sleep_threshold'] == 0
+
+
+def test_flood_wait_becomes_request_deferred(monkeypatch):
+    monkeypatch.setattr(config, 'TG_MAX_INLINE_WAIT_SECONDS', 30)
+    governor = TelethonGovernor()
+    calls = []
+
+    class FloodedClient:
+        async def get_messages(self, entity, **kwargs):
+            calls.append(entity)
+            raise FloodWaitError(request=None, capture=45)
+
+    with pytest.raises(RequestDeferred) as deferred:
+        asyncio.run(governor.get_messages(FloodedClient(), 'chan', limit=100))
+    assert deferred.value.retry_after == 45
+    assert len(calls) == 1
+
+    # Метод остановлен для всех вызывающих до конца ожидания - без нового запроса
+    with pytest.raises(RequestDeferred):
+        asyncio.run(governor.get_messages(FloodedClient(), 'chan', limit=100))
+    assert len(calls) == 1
@@ -0,0 +1,46 @@
+"""
+Потоковый нормализатор text_normalizer.clean_text против эталонного корпуса.
+
+Корпус: tests/fixtures/text_normalizer_corpus.json. Поле expected - вывод нормализатора.
+Для случаев, где вывод намеренно отличается от старой реализации на BeautifulSoup,
+в legacy записан старый вывод, а в note - причина отличия.
+"""
+
+import json
+import re
+from pathlib import Path
+
+import pytest
+
+from text_normalizer import clean_text
+
+CORPUS = json.loads(
+    (Path(__file__).parent / 'fixtures' / 'text_normalizer_corpus.json').read_text(encoding='utf-8')
+)
+
+_TELEGRAM_TAG_RE = re.compile(r'</?(?:b|i|u|s|code|pre|blockquote)>|<span class="tg-spoiler">|</span>'
+                              r'|<a href="[^"<>]*">|</a>')
+_ENTITY_RE = re.compile(r'&(?:amp|lt|gt|quot);')
+
+
+@pytest.mark.parametrize('case', CORPUS, ids=[case['name'] for case in CORPUS])
+def test_matches_corpus(case):
+    assert clean_text(case['input']) == case['expected']
+
+
+@pytest.mark.parametrize('case', CORPUS, ids=[case['name'] for case in CORPUS])
+def test_output_is_telegram_safe(case):
+    rest = _ENTITY_RE.sub('', _TELEGRAM_TAG_RE.sub('', case['expected']))
+    assert not set(rest) & set('<>&'), rest
+
+
+@pytest.mark.parametrize('case', [case for case in CORPUS if 'legacy' in case],
+                         ids=[case['name'] for case in CORPUS if 'legacy' in case])
+def test_legacy_differences_are_documented(case):
+    assert case['legacy'] != case['expected']
+    assert case.get('note', '').startswith('Намеренное отличие')
+
+
+def test_corpus_names_are_unique():
+    names = [case['name'] for case in CORPUS]
+    assert len(names) == len(set(names))
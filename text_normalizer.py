@@ -0,0 +1,212 @@
+"""
+Быстрое преобразование Markdown/HTML разметки Telegram в безопасный для Telegram HTML
+"""
+
+import html
+import re
+from typing import List, Optional
+
+# Символы, без которых в тексте нет никакой разметки
+_MARKUP_CHARS = frozenset('[`|*_~<>&')
+
+# Служебные символы из Private Use Area для ссылок и HTML-тегов исходного текста
+_SENTINEL_OPEN = '\ue000'
+_SENTINEL_CLOSE = '\ue001'
+
+_LINK_RE = re.compile(r'\[([^\]]+)\]\(([^)]+)\)')
+_INPUT_TAG_RE = re.compile(r'<(/?)([a-zA-Z][a-zA-Z0-9-]*)(\s[^<>]*)?/?>')
+_HREF_RE = re.compile(r'''href\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))''', re.IGNORECASE)
+_CLASS_RE = re.compile(r'''class\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))''', re.IGNORECASE)
+
+# Markdown Telegram: порядок проходов важен и совпадает со старой реализацией
+_MARKDOWN_PASSES = [
+    (re.compile(r'`([^`]+)`'), r'<code>\1</code>'),
+    (re.compile(r'\|\|([^|]+)\|\|'), r'<span class="tg-spoiler">\1</span>'),
+    (re.compile(r'\*\*([^*]+)\*\*'), r'<b>\1</b>'),
+    (re.compile(r'__([^_]+)__'), r'<i>\1</i>'),
+    (re.compile(r'_([^_]+)_'), r'<i>\1</i>'),
+    (re.compile(r'~~([^~]+)~~'), r'<s>\1</s>'),
+]
+
+# Один токенизатор для потокового прохода: теги из Markdown и теги/ссылки исходного текста
+_TOKEN_RE = re.compile(
+    r'<(/?)(b|i|s|code|span)( class="tg-spoiler")?>'
+    r'|\ue000(\d+)\ue001'
+)
+
+# Поддерживаемые Telegram теги и их канонические имена
+_SUPPORTED_TAGS = {
+    'b': 'b', 'strong': 'b',
+    'i': 'i', 'em': 'i',
+    'u': 'u',
+    's': 's', 'strike': 's', 'del': 's',
+    'code': 'code',
+    'pre': 'pre',
+    'blockquote': 'blockquote',
+}
+
+# Теги без закрывающей пары
+_VOID_TAGS = frozenset([
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input',
+    'link', 'meta', 'param', 'source', 'track', 'wbr',
+])
+
+_ASCII_SPACES = ' \n\t\x0c\r'
+
+_MANY_NEWLINES_RE = re.compile(r'\n{3,}')
+_SPACES_RE = re.compile(r' +')
+_NEWLINE_SPACES_RE = re.compile(r' *\n *')
+
+
+def _escape(text: str) -> str:
+    """Экранирует текст для parse_mode=HTML (существующие сущности сначала раскрываются)"""
+    if '&' in text:
+        text = html.unescape(text)
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
+
+
+def _attr(pattern: re.Pattern, attrs: str) -> str:
+    match = pattern.search(attrs or '')
+    if not match:
+        return ''
+    return next(group for group in match.groups() if group is not None)
+
+
+def _normalize_whitespace(text: str) -> str:
+    text = _MANY_NEWLINES_RE.sub('\n\n', text)
+    text = _SPACES_RE.sub(' ', text)
+    text = _NEWLINE_SPACES_RE.sub('\n', text)
+    return text.strip()
+
+
+def _element_for(closing: bool, name: str, attrs: str):
+    """Описание тега исходного текста: (закрывающий, имя, открывающий тег, закрывающий тег)"""
+    name = name.lower()
+    if closing:
+        return True, name, None, None
+    if name in _SUPPORTED_TAGS:
+        tag = _SUPPORTED_TAGS[name]
+        return False, name, f'<{tag}>', f'</{tag}>'
+    if name == 'a':
+        href = _attr(_HREF_RE, attrs)
+        if href:
+            return False, name, f'<a href="{_escape(href)}">', '</a>'
+    if name == 'span' and 'tg-spoiler' in _attr(_CLASS_RE, attrs).split():
+        return False, name, '<span class="tg-spoiler">', '</span>'
+    return False, name, None, None
+
+
+def _render(markup: str, tags: List[tuple]) -> str:
+    """
+    Один проход по размеченному тексту со стеком открытых элементов.
+    Содержимое поддерживаемого элемента схлопывается в текст - так же,
+    как старая реализация делала через get_text().
+    """
+    out = []
+    stack: List[str] = []
+    capture: Optional[List[str]] = None
+    capture_depth = 0
+    capture_tags = ('', '')
+
+    def flush_capture():
+        open_tag, close_tag = capture_tags
+        out.append(f"{open_tag}{_escape(''.join(capture))}{close_tag}")
+
+    def add_text(text: str):
+        if not text:
+            return
+        # Строка из одних пробельных символов между тегами схлопывается (кроме <pre>)
+        if not text.strip(_ASCII_SPACES) and 'pre' not in stack:
+            text = '\n' if '\n' in text else ' '
+        if capture is not None:
+            capture.append(text)
+        else:
+            out.append(_escape(text))
+
+    position = 0
+    for match in _TOKEN_RE.finditer(markup):
+        add_text(markup[position:match.start()])
+        position = match.end()
+
+        if match.group(4) is not None:
+            closing, name, open_tag, close_tag = tags[int(match.group(4))]
+        else:
+            closing = bool(match.group(1))
+            name = match.group(2)
+            if name != 'span':
+                open_tag, close_tag = f'<{name}>', f'</{name}>'
+            elif match.group(3):
+                open_tag, close_tag = '<span class="tg-spoiler">', '</span>'
+            else:
+                open_tag, close_tag = None, None
+
+        if not closing:
+            if name in _VOID_TAGS:
+                # <br> внутри форматирования текста не дает, снаружи - перенос строки
+                if name == 'br' and capture is None:
+                    out.append('\n')
+                continue
+            stack.append(name)
+            # Неподдерживаемый тег (open_tag = None) выводит только содержимое
+            if capture is None and open_tag:
+                capture = []
+                capture_depth = len(stack)
+                capture_tags = (open_tag, close_tag)
+            continue
+
+        # Закрывающий тег закрывает ближайший одноименный элемент и все вложенные
+        for index in range(len(stack) - 1, -1, -1):
+            if stack[index] == name:
+                break
+        else:
+            continue
+        del stack[index:]
+        if capture is not None and len(stack) < capture_depth:
+            flush_capture()
+            capture = None
+
+    add_text(markup[position:])
+    if capture is not None:
+        flush_capture()
+    return ''.join(out)
+
+
+def clean_text(text: str) -> str:
+    """
+    Преобразует Markdown-форматирование Telegram и HTML в безопасный для Telegram HTML.
+
+    Простой текст без символов разметки не разбирается вовсе - только нормализуются пробелы.
+    Ссылки [текст](url) и поддерживаемые HTML-теги исходного текста заменяются служебными
+    метками, затем Markdown раскрывается теми же правилами, что и раньше, и результат
+    собирается одним потоковым проходом (без построения DOM-дерева).
+    """
+    if not text:
+        return ""
+    if _MARKUP_CHARS.isdisjoint(text):
+        return _normalize_whitespace(text)
+
+    try:
+        tags: List[tuple] = []
+
+        def sentinel(tag: tuple) -> str:
+            tags.append(tag)
+            return f"{_SENTINEL_OPEN}{len(tags) - 1}{_SENTINEL_CLOSE}"
+
+        def save_link(match):
+            url = match.group(2).strip()
+            opening = sentinel((False, 'a', f'<a href="{_escape(url)}">', '</a>'))
+            return f"{opening}{match.group(1)}{sentinel((True, 'a', None, None))}"
+
+        def save_tag(match):
+            return sentinel(_element_for(bool(match.group(1)), match.group(2), match.group(3) or ''))
+
+        if '[' in text:
+            text = _LINK_RE.sub(save_link, text)
+        if '<' in text:
+            text = _INPUT_TAG_RE.sub(save_tag, text)
+        text = text.replace('<', '&lt;').replace('>', '&gt;')
+        for pattern, replacement in _MARKDOWN_PASSES:
+            text = pattern.sub(replacement, text)
+        return _normalize_whitespace(_render(text, tags))
+    except Exception:
+        return _normalize_whitespace(_escape(text))